@@ -1 +1,77 @@
-# logic to send data to 1C (good/bad quality images)
\ No newline at end of file
+# logic to send data to 1C (good/bad quality images)
+"""
+Callback client that pushes finished quality assessments to 1C.
+
+The package name starts with a digit, so import it with
+`importlib.import_module("1c_integration.integration")`.
+"""
+import asyncio
+import hashlib
+import importlib
+from typing import List, Optional
+
+import httpx
+
+_settings = importlib.import_module("1c_integration.setting")
+logger = importlib.import_module("1c_integration.logging").logger
+
+# Status codes worth retrying; other 4xx responses are final
+_RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def batch_idempotency_key(item_keys: List[str]) -> str:
+    """
+    Stable key for a batch: the same set of items always yields the same key,
+    so a retried delivery is recognised by 1C as a duplicate.
+    """
+    return hashlib.sha256("\n".join(sorted(item_keys)).encode("utf-8")).hexdigest()
+
+
+class OneCClient:
+    """
+    Sends batches of results to 1C over one pooled HTTP connection.
+
+    Each item carries its own `idempotency_key`, and the batch is sent with an
+    `Idempotency-Key` header derived from the item keys. Transport errors and
+    retryable status codes are retried with exponential backoff.
+    """
+
+    def __init__(self, base_url: str = _settings.ONE_C_API_URL, token: str = _settings.ONE_C_AUTH_TOKEN,
+                 timeout: float = _settings.ONE_C_TIMEOUT_S, max_retries: int = _settings.ONE_C_MAX_RETRIES,
+                 backoff_s: float = _settings.ONE_C_BACKOFF_S,
+                 max_connections: int = _settings.ONE_C_MAX_CONNECTIONS):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.base_url = base_url
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def send_results(self, items: List[dict], url: Optional[str] = None) -> bool:
+        """
+        POST `{"results": items}` to `url` (defaults to ONE_C_API_URL).
+        Returns True once 1C acknowledged the batch with a 2xx response.
+        """
+        url = url or self.base_url
+        key = batch_idempotency_key([item["idempotency_key"] for item in items])
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self._client.post(url, json={"results": items}, headers={"Idempotency-Key": key})
+                if response.is_success:
+                    logger.info(f"Delivered {len(items)} results to 1C ({url}).")
+                    return True
+                if response.status_code not in _RETRYABLE_STATUS:
+                    logger.error(f"1C rejected batch with status {response.status_code}: {response.text[:200]}")
+                    return False
+                logger.warning(f"1C returned {response.status_code} (attempt {attempt + 1})")
+            except httpx.HTTPError as e:
+                logger.warning(f"1C delivery failed (attempt {attempt + 1}): {e}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff_s * 2 ** attempt)
+        return False
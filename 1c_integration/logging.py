@@ -1 +1,4 @@
-# log integration actions
\ No newline at end of file
+# log integration actions
+import logging
+
+logger = logging.getLogger("1c_integration")
@@ -1 +1,13 @@
-# Configuration for 1C API (URL, authentication)
\ No newline at end of file
+# Configuration for 1C API (URL, authentication)
+import os
+
+from api.config.settings import ONE_C_API_URL
+
+# Bearer token sent to 1C (empty = no Authorization header)
+ONE_C_AUTH_TOKEN = os.getenv("ONE_C_AUTH_TOKEN", "")
+# Per-request timeout and retry policy of the callback client
+ONE_C_TIMEOUT_S = float(os.getenv("ONE_C_TIMEOUT_S", "10"))
+ONE_C_MAX_RETRIES = int(os.getenv("ONE_C_MAX_RETRIES", "3"))
+ONE_C_BACKOFF_S = float(os.getenv("ONE_C_BACKOFF_S", "0.5"))
+# Connection pool of the shared HTTP client
+ONE_C_MAX_CONNECTIONS = int(os.getenv("ONE_C_MAX_CONNECTIONS", "10"))
@@ -1,25 +1,71 @@
-from fastapi import FastAPI
-from api.endpoints import quality_assessment
-from api.models.utils import preload_yolo_model, get_yolo_model
-
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from api.endpoints import quality_assessment, monitoring, jobs
+from api.models.utils import preload_models, get_yolo_model, UploadLimitMiddleware
+from api.models.batching import start_batcher, stop_batcher
+from api.quality.ocr_pool import start_ocr_pool, stop_ocr_pool
+from api.jobs.worker import start_job_runner, stop_job_runner
+from api.models.crop_writer import start_crop_writer, stop_crop_writer
+from api.quality.stages import stop_stage_executors
+from api.cache.phash_index import start_phash_index, stop_phash_index
+from api.monitoring.metrics import REQUEST_SECONDS, start_request_timing, server_timing_header
+from api.monitoring.profiling import maybe_start_profiling, track_request
+
+from api.config.logging import setup_logging
+
+# app.log and console, written by a background thread
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with preload_models(app):
+        await start_batcher()
+        await start_crop_writer()
+        await start_phash_index()
+        await start_ocr_pool()
+        await start_job_runner()
+        try:
+            yield
+        finally:
+            await stop_job_runner()
+            await stop_ocr_pool()
+            await stop_phash_index()
+            await stop_crop_writer()
+            await stop_batcher()
+            stop_stage_executors()
 
-# Initialize FastAPI with a lifespan context for YOLO model
+# Initialize FastAPI with a lifespan context that loads the models
 app = FastAPI(
     title="Document Quality API", 
     version="1.0", 
-    lifespan=preload_yolo_model
+    lifespan=lifespan
 )
 
+# Oversized uploads are refused before Starlette spools them to disk
+app.add_middleware(UploadLimitMiddleware)
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    # Per-stage timings recorded by api.monitoring.metrics.stage() during this request
+    timings = start_request_timing()
+    with track_request():
+        profile = maybe_start_profiling(request.headers)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            if profile is not None:
+                await profile.finish(request.url.path)
+        total = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(total, path=getattr(route, "path", "unmatched"), status=response.status_code)
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.profile_id
+    return response
+
 @app.get("/")
 async def read_root():
     # Use the preloaded model for inference or other tasks
@@ -27,4 +73,6 @@ async def read_root():
     return {"message": "Model loaded successfully!"}
 
 # Include routers here
-app.include_router(quality_assessment.router)
\ No newline at end of file
+app.include_router(quality_assessment.router)
+app.include_router(monitoring.router)
+app.include_router(jobs.router)
\ No newline at end of file
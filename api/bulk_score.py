@@ -0,0 +1,313 @@
+"""
+Offline bulk scoring of image archives.
+
+Usage:
+    python -m api.bulk_score --input path/to/scans --output runs/2024-06
+        [--workers 4] [--chunk-size 1000] [--format jsonl|parquet]
+        [--mode full|tiered] [--ocr-mode full|quality] [--include-text]
+
+    python -m api.bulk_score --rescore runs/2024-06 --output runs/2024-06-rescored
+        [--alpha 1.0] [--beta 0.5] [--gamma 1.0]
+
+`--input` is a directory (walked recursively for images) or a manifest file
+with one path per line. Each image goes through the same detect -> binarize
+-> OCR -> score pipeline as the API, in-process, across a pool of worker
+processes (each with its own YOLO model and PaddleOCR engine). Results are
+written in chunks (`part-00000.jsonl`, ...), one record per image with the
+assessment fields (or `error`), in input order.
+
+Progress is checkpointed after every chunk in `<output>/checkpoint.json`;
+running the same command again resumes after the last complete chunk.
+
+`--rescore` reads the records of an earlier run and recomputes `global_score`
+and `quality_category` from the stored raw metrics (OCR confidence and black
+ratios) with the current scoring formula, or the given weights, without
+decoding any image or running OCR.
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from typing import Iterator, List, Optional
+
+from api.quality.scoring import SCORING_VERSION, calculate_global_score
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+CHECKPOINT = "checkpoint.json"
+
+# Worker processes run the API pipeline without its server-side machinery:
+# inline stages (the pool already provides the parallelism), no near-duplicate
+# index and no crop storage for retraining
+WORKER_ENV = {
+    "STAGE_EXECUTORS_ENABLED": "false",
+    "NEAR_DUP_ENABLED": "false",
+    "CROP_STORE_ENABLED": "false",
+    "INFLIGHT_MEMORY_BUDGET_MB": "0",
+}
+
+
+def list_inputs(source: str) -> List[str]:
+    """Image paths of a directory (recursive, sorted) or of a manifest file."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, names in os.walk(source):
+            paths += [os.path.join(root, n) for n in names if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS]
+        return sorted(paths)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    return [line if os.path.isabs(line) else os.path.join(base, line)
+            for line in lines if line and not line.startswith("#")]
+
+
+def inputs_fingerprint(paths: List[str], options: dict) -> str:
+    """Identifies a run: the input list and the options that change the results."""
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode())
+    for path in paths:
+        digest.update(path.encode() + b"\0")
+    return digest.hexdigest()[:16]
+
+
+# -- worker processes ---------------------------------------------------------
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_options: dict = {}
+
+
+def _init_worker(options: dict):
+    global _loop, _options
+    logging.basicConfig(level=logging.WARNING)
+    _loop = asyncio.new_event_loop()
+    _options = options
+
+
+def _score_file(path: str) -> dict:
+    """Assess one image file; errors are reported in the record, not raised."""
+    from fastapi import HTTPException
+    from api.quality.pipeline import detect_from_bytes, assess_detected_document
+
+    record = {"path": path, "error": None}
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+
+        async def run():
+            detection_result = await detect_from_bytes(content)
+            return await assess_detected_document(
+                detection_result, mode=_options["mode"], ocr_mode=_options["ocr_mode"], use_index=False
+            )
+
+        response = _loop.run_until_complete(run())
+        result = response.model_dump()
+        if not _options["include_text"]:
+            del result["text"]
+        record.update(result)
+        record["scoring_version"] = SCORING_VERSION
+    except HTTPException as e:
+        record["error"] = str(e.detail)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+# -- output ---------------------------------------------------------------------
+
+def write_chunk(records: List[dict], output: str, index: int, fmt: str) -> str:
+    """Write one chunk atomically (temporary file, then rename)."""
+    path = os.path.join(output, f"part-{index:05d}.{fmt}")
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(records), tmp)
+    else:
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+    return path
+
+
+def read_chunks(directory: str) -> Iterator[List[dict]]:
+    """Records of an earlier run, chunk by chunk, in order."""
+    for path in sorted(glob.glob(os.path.join(directory, "part-*.jsonl")) +
+                       glob.glob(os.path.join(directory, "part-*.parquet"))):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            yield pq.read_table(path).to_pylist()
+        else:
+            with open(path, encoding="utf-8") as f:
+                yield [json.loads(line) for line in f if line.strip()]
+
+
+def load_checkpoint(output: str) -> Optional[dict]:
+    path = os.path.join(output, CHECKPOINT)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(output: str, checkpoint: dict):
+    path = os.path.join(output, CHECKPOINT)
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# -- commands -------------------------------------------------------------------
+
+def score(paths: List[str], output: str, workers: int = 2, chunk_size: int = 1000, fmt: str = "jsonl",
+          mode: str = "full", ocr_mode: str = "full", include_text: bool = False) -> dict:
+    """
+    Score `paths` into chunks under `output`, resuming from its checkpoint.
+
+    Args:
+        - paths: Image files, in output order
+        - output: Output directory (chunks and checkpoint)
+        - workers: Worker processes, each with its own models
+        - chunk_size: Records per output chunk (and per checkpoint)
+        - fmt: "jsonl" or "parquet" (needs pyarrow)
+        - mode, ocr_mode: As the API's query parameters
+        - include_text: Keep the OCR text in the records
+
+    Returns:
+        - The final checkpoint (records done, chunks written, errors)
+    """
+    options = {"mode": mode, "ocr_mode": ocr_mode, "include_text": include_text,
+               "chunk_size": chunk_size, "format": fmt}
+    fingerprint = inputs_fingerprint(paths, options)
+    os.makedirs(output, exist_ok=True)
+
+    checkpoint = load_checkpoint(output)
+    if checkpoint is not None and checkpoint["fingerprint"] != fingerprint:
+        raise SystemExit(f"{output} holds a run with other inputs or options; use a new output directory.")
+    if checkpoint is None:
+        checkpoint = {"fingerprint": fingerprint, "total": len(paths), "done": 0, "chunks": 0,
+                      "errors": 0, "scoring_version": SCORING_VERSION}
+    if checkpoint["done"]:
+        logger.info(f"Resuming after {checkpoint['done']} of {len(paths)} images.")
+
+    remaining = paths[checkpoint["done"]:]
+    if not remaining:
+        return checkpoint
+
+    # Spawned workers start from a clean interpreter and inherit WORKER_ENV
+    # before the settings module is imported
+    os.environ.update(WORKER_ENV)
+    ctx = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    records = []
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for record in pool.imap(_score_file, remaining, chunksize=4):
+            records.append(record)
+            if len(records) < chunk_size and checkpoint["done"] + len(records) < len(paths):
+                continue
+            write_chunk(records, output, checkpoint["chunks"], fmt)
+            checkpoint["chunks"] += 1
+            checkpoint["done"] += len(records)
+            checkpoint["errors"] += sum(1 for r in records if r["error"])
+            save_checkpoint(output, checkpoint)
+            rate = (checkpoint["done"] - (len(paths) - len(remaining))) / (time.perf_counter() - start)
+            logger.info(f"{checkpoint['done']}/{len(paths)} images ({rate:.1f}/s), {checkpoint['errors']} errors.")
+            records = []
+    return checkpoint
+
+
+def _percent(value) -> Optional[float]:
+    if isinstance(value, str):
+        return float(value.rstrip("%"))
+    return value
+
+
+def rescore_record(record: dict, weights: dict) -> dict:
+    """
+    Recompute the global score of one stored record from its raw metrics.
+    Records from before the unrounded black ratios existed fall back to the
+    formatted percentages.
+    """
+    if record.get("error"):
+        return record
+    global_black = record.get("global_black_percent")
+    large_black = record.get("large_black_region_percent")
+    if global_black is None:
+        global_black = _percent(record["global_black_ratio"])
+    if large_black is None:
+        large_black = _percent(record["large_black_region_ratio"])
+    global_score, quality_category = calculate_global_score(
+        ocr_conf=record["average_confidence"],
+        global_black_ratio=global_black,
+        large_black_ratio=large_black,
+        **weights
+    )
+    if record.get("evaluation_tier") == "cheap":
+        # The cheap tier only exits on pages that are Poor whatever the OCR says
+        quality_category = "Poor"
+    return {**record, "global_score": global_score, "quality_category": quality_category,
+            "scoring_version": SCORING_VERSION}
+
+
+def rescore(source: str, output: str, weights: dict, fmt: str = "jsonl") -> dict:
+    """Rescore every chunk of an earlier run into `output` (same chunking)."""
+    os.makedirs(output, exist_ok=True)
+    summary = {"records": 0, "changed_category": 0, "chunks": 0, "weights": weights}
+    for index, records in enumerate(read_chunks(source)):
+        rescored = [rescore_record(record, weights) for record in records]
+        summary["records"] += len(rescored)
+        summary["changed_category"] += sum(
+            1 for old, new in zip(records, rescored) if old.get("quality_category") != new.get("quality_category")
+        )
+        write_chunk(rescored, output, index, fmt)
+        summary["chunks"] += 1
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score image archives offline, or rescore an earlier run.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Directory of images or manifest file (one path per line).")
+    source.add_argument("--rescore", help="Output directory of an earlier run to rescore without OCR.")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--mode", choices=["full", "tiered"], default="full")
+    parser.add_argument("--ocr-mode", choices=["full", "quality"], default="full")
+    parser.add_argument("--include-text", action="store_true", help="Keep the OCR text in the records.")
+    parser.add_argument("--alpha", type=float, default=None, help="Rescore: weight of the OCR confidence.")
+    parser.add_argument("--beta", type=float, default=None, help="Rescore: weight of the global black ratio.")
+    parser.add_argument("--gamma", type=float, default=None, help="Rescore: weight of the large black ratio.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("--format parquet needs pyarrow (pip install pyarrow).")
+
+    if args.rescore:
+        weights = {k: v for k, v in (("alpha", args.alpha), ("beta", args.beta), ("gamma", args.gamma)) if v is not None}
+        result = rescore(args.rescore, args.output, weights, args.format)
+    else:
+        paths = list_inputs(args.input)
+        logger.info(f"{len(paths)} images to score with {args.workers} workers.")
+        result = score(paths, args.output, args.workers, args.chunk_size, args.format,
+                       args.mode, args.ocr_mode, args.include_text)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
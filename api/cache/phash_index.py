@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from itertools import combinations
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from api.config.settings import (
+    NEAR_DUP_ENABLED, NEAR_DUP_MAX_DISTANCE, NEAR_DUP_DHASH_MAX_DISTANCE,
+    NEAR_DUP_MAX_ENTRIES, NEAR_DUP_SQLITE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Multi-index hashing: the 64-bit pHash is split into 4 chunks of 16 bits
+_CHUNKS = 4
+_CHUNK_BITS = 64 // _CHUNKS
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def phash(image: np.ndarray) -> int:
+    """
+    64-bit perceptual hash: sign of the 8x8 lowest DCT frequencies of the
+    32x32 downscaled image against their median (DC term excluded).
+    """
+    small = cv2.resize(_to_gray(image), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash: whether each pixel of the 9x8 downscaled image is
+    brighter than its right neighbour.
+    """
+    small = cv2.resize(_to_gray(image), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def image_hashes(image: np.ndarray) -> Tuple[int, int]:
+    """(pHash, dHash) of an image (BGR or grayscale)."""
+    return phash(image), dhash(image)
+
+
+def format_hashes(hashes: Tuple[int, int]) -> str:
+    """Hex form of (pHash, dHash), as reported in responses."""
+    return f"{hashes[0]:016x}{hashes[1]:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _chunks(value: int) -> List[int]:
+    return [(value >> (i * _CHUNK_BITS)) & _CHUNK_MASK for i in range(_CHUNKS)]
+
+
+def _neighbours(chunk: int, radius: int) -> Iterator[int]:
+    """All chunk values within `radius` bits of `chunk`."""
+    yield chunk
+    for r in range(1, radius + 1):
+        for bits in combinations(range(_CHUNK_BITS), r):
+            flipped = chunk
+            for bit in bits:
+                flipped ^= 1 << bit
+            yield flipped
+
+
+class PerceptualIndex:
+    """
+    Near-duplicate index of images by perceptual hash.
+
+    Lookups use multi-index hashing: if two 64-bit pHashes differ in at most
+    `r` bits, at least one of their 4 chunks differs in at most r // 4 bits,
+    so only the buckets of those chunk values are probed and the candidates
+    are verified with the full pHash and dHash distances.
+
+    Entries carry an optional payload (e.g. the assessment JSON) and a
+    variant tag. The index keeps the `max_entries` most recently added or
+    matched entries in memory and, optionally, in a SQLite file so it
+    survives restarts.
+    """
+
+    def __init__(self, max_distance: int = 6, dhash_max_distance: int = 10, max_entries: int = 100000,
+                 sqlite_path: Optional[str] = None):
+        self.max_distance = max_distance
+        self.dhash_max_distance = dhash_max_distance
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(_CHUNKS)]
+        self._lock = Lock()
+        self._db = None
+
+        self.lookups = 0
+        self.matches = 0
+        self.evictions = 0
+
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS phash_index ("
+                "key TEXT PRIMARY KEY, phash TEXT NOT NULL, dhash TEXT NOT NULL, doc_type TEXT, "
+                "variant TEXT, payload TEXT, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, phash, dhash, doc_type, variant, payload, created_at FROM phash_index "
+            "ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, p, d, doc_type, variant, payload, created_at in reversed(rows):
+            self._insert_memory(key, {"phash": int(p, 16), "dhash": int(d, 16), "doc_type": doc_type,
+                                      "variant": variant, "payload": payload, "created_at": created_at})
+        logger.info(f"Loaded {len(rows)} perceptual hashes from disk.")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def _insert_memory(self, key: str, entry: dict):
+        if key in self._entries:
+            self._remove_memory(key)
+        self._entries[key] = entry
+        for i, chunk in enumerate(_chunks(entry["phash"])):
+            self._buckets[i].setdefault(chunk, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove_memory(oldest)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM phash_index WHERE key = ?", (oldest,))
+
+    def _remove_memory(self, key: str):
+        entry = self._entries.pop(key)
+        for i, chunk in enumerate(_chunks(entry["phash"])):
+            bucket = self._buckets[i].get(chunk)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[i][chunk]
+
+    def add(self, key: str, hashes: Tuple[int, int], doc_type: Optional[str] = None,
+            variant: Optional[str] = None, payload: Optional[str] = None):
+        """Add (or replace) an entry under `key`."""
+        entry = {"phash": hashes[0], "dhash": hashes[1], "doc_type": doc_type,
+                 "variant": variant, "payload": payload, "created_at": time.time()}
+        with self._lock:
+            self._insert_memory(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO phash_index (key, phash, dhash, doc_type, variant, payload, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, f"{hashes[0]:016x}", f"{hashes[1]:016x}", doc_type, variant, payload, entry["created_at"]),
+                    )
+                    self._db.commit()
+                except sqlite3.Error:
+                    logger.warning("Failed to persist perceptual hash", exc_info=True)
+
+    def remove(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove_memory(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM phash_index WHERE key = ?", (key,))
+                self._db.commit()
+
+    def find(self, hashes: Tuple[int, int], doc_type: Optional[str] = None,
+             variant: Optional[str] = None) -> Optional[Tuple[str, dict, int]]:
+        """
+        Closest entry within the distance thresholds, optionally restricted
+        to the same doc_type and variant.
+
+        Returns:
+            - (key, entry, pHash distance), or None when nothing is close enough
+        """
+        p, d = hashes
+        radius = self.max_distance // _CHUNKS
+        best = None
+        with self._lock:
+            self.lookups += 1
+            seen = set()
+            for i, chunk in enumerate(_chunks(p)):
+                buckets = self._buckets[i]
+                for value in _neighbours(chunk, radius):
+                    for key in buckets.get(value, ()):
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        entry = self._entries[key]
+                        distance = hamming(p, entry["phash"])
+                        if distance > self.max_distance or hamming(d, entry["dhash"]) > self.dhash_max_distance:
+                            continue
+                        if doc_type is not None and entry["doc_type"] != doc_type:
+                            continue
+                        if variant is not None and entry["variant"] != variant:
+                            continue
+                        if best is None or distance < best[2]:
+                            best = (key, entry, distance)
+            if best is not None:
+                self.matches += 1
+                self._entries.move_to_end(best[0])
+        return best
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "dhash_max_distance": self.dhash_max_distance,
+                "persistent": self._db is not None,
+                "lookups": self.lookups,
+                "matches": self.matches,
+                "evictions": self.evictions,
+            }
+
+
+_index: Optional[PerceptualIndex] = None
+_index_lock = Lock()
+
+
+def get_phash_index() -> Optional[PerceptualIndex]:
+    """
+    Process-wide near-duplicate index of assessed crops, or None when disabled.
+    """
+    global _index
+    if not NEAR_DUP_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = PerceptualIndex(
+                max_distance=NEAR_DUP_MAX_DISTANCE,
+                dhash_max_distance=NEAR_DUP_DHASH_MAX_DISTANCE,
+                max_entries=NEAR_DUP_MAX_ENTRIES,
+                sqlite_path=NEAR_DUP_SQLITE_PATH or None,
+            )
+    return _index
+
+
+async def start_phash_index():
+    """Load the persisted index at startup rather than on the first request."""
+    await asyncio.to_thread(get_phash_index)
+
+
+async def stop_phash_index():
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+            _index = None
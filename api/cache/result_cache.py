@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from api.config.settings import (
+    MODEL_VERSION, METRICS_ENGINE, RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_S, RESULT_CACHE_SQLITE_PATH,
+    RESULT_CACHE_SQLITE_MAX_ENTRIES, RESULT_CACHE_PURGE_INTERVAL_S,
+)
+from api.quality.scoring import SCORING_VERSION
+from api.quality.ocr_profiles import profiles_fingerprint
+from api.schemas.quality import DocumentQualityResponse
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of `DocumentQualityResponse` objects.
+
+    Two tiers:
+        - in-memory LRU, bounded by entry count and total payload size, with TTL
+        - optional SQLite file, so cached results survive restarts, bounded
+          by `sqlite_max_entries` rows; expired and excess rows are purged
+          every `purge_interval_s` from `put`
+
+    Entries are stored as the response JSON, which is also what the size
+    accounting is based on.
+
+    `get` and `put` may hit SQLite: call them from a thread, not the event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_s: float = 3600, sqlite_path: Optional[str] = None,
+                 sqlite_max_entries: int = 100000, purge_interval_s: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.sqlite_max_entries = sqlite_max_entries
+        self.purge_interval_s = purge_interval_s
+        self._next_purge_at = 0.0
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._bytes = 0
+        self._lock = Lock()
+        self._db = None
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_expires ON results (expires_at)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(content: bytes, variant: str = "") -> str:
+        """
+        Hash of the uploaded bytes plus model, scoring, metrics engine and OCR
+        profile versions, so a model, formula or profile change never serves
+        stale results.
+        `variant` separates results of different evaluation options for the
+        same bytes.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{digest}:{MODEL_VERSION}:{SCORING_VERSION}:{METRICS_ENGINE}:{profiles_fingerprint()}:{variant}"
+
+    def _expiry(self) -> float:
+        return time.time() + self.ttl_s if self.ttl_s > 0 else float("inf")
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, payload) = self._entries.popitem(last=False)
+            self._bytes -= len(payload)
+            self.evictions += 1
+
+    def _put_memory(self, key: str, payload: str, expires_at: float):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        self._evict()
+
+    def get(self, key: str) -> Optional[DocumentQualityResponse]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return DocumentQualityResponse.model_validate_json(payload)
+                del self._entries[key]
+                self._bytes -= len(payload)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT payload, expires_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._put_memory(key, row[0], row[1])
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return DocumentQualityResponse.model_validate_json(row[0])
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: DocumentQualityResponse):
+        payload = response.model_dump_json()
+        expires_at = self._expiry()
+        with self._lock:
+            self._put_memory(key, payload, expires_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO results (key, payload, expires_at) VALUES (?, ?, ?)",
+                        (key, payload, expires_at),
+                    )
+                    if time.time() >= self._next_purge_at:
+                        self._purge()
+                    self._db.commit()
+                except sqlite3.Error:
+                    logger.warning("Failed to persist cached result", exc_info=True)
+
+    def _purge(self):
+        # Expired rows, then the soonest-expiring ones beyond the row limit (both use the index)
+        now = time.time()
+        self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.sqlite_max_entries,),
+        )
+        self._next_purge_at = now + self.purge_interval_s
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """
+    Process-wide result cache, or None when caching is disabled.
+    """
+    global _cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                max_entries=RESULT_CACHE_MAX_ENTRIES,
+                max_bytes=RESULT_CACHE_MAX_BYTES,
+                ttl_s=RESULT_CACHE_TTL_S,
+                sqlite_path=RESULT_CACHE_SQLITE_PATH or None,
+                sqlite_max_entries=RESULT_CACHE_SQLITE_MAX_ENTRIES,
+                purge_interval_s=RESULT_CACHE_PURGE_INTERVAL_S,
+            )
+    return _cache
@@ -1 +1,114 @@
-# loging configuration for the api requests
\ No newline at end of file
+# loging configuration for the api requests
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from api.config.settings import LOG_FILE, LOG_LEVEL, LOG_QUEUE_MAX, LOG_VERBOSE_SAMPLE_RATE
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Pass as `extra=VERBOSE` (with %-style arguments, so unsampled payloads are
+# never formatted) for large dumps that are only useful on a sample of calls
+VERBOSE = {"verbose": True}
+
+
+class VerboseSampler(logging.Filter):
+    """Keep records marked `verbose` with probability `rate`; others always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "verbose", False):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the background listener without ever blocking the
+    caller: when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[DroppingQueueHandler] = None
+_fork_hook_registered = False
+
+
+def setup_logging(log_file: str = LOG_FILE, level: str = LOG_LEVEL):
+    """
+    Route the root logger through a bounded queue to a listener thread that
+    owns the file and console handlers, so request handlers never wait on
+    disk I/O. Idempotent; the queue is drained at exit.
+    """
+    global _listener, _handler, _fork_hook_registered
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.addFilter(VerboseSampler(LOG_VERBOSE_SAMPLE_RATE))
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    if not _fork_hook_registered:
+        os.register_at_fork(after_in_child=_restart_in_child)
+        _fork_hook_registered = True
+
+
+def _restart_in_child():
+    """
+    A forked child (api.serve workers) inherits the queue handler but not the
+    listener thread: give it a fresh queue and its own listener over the same
+    handlers. Records still queued in the parent are written by the parent.
+    """
+    global _listener
+    if _listener is None or _handler is None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+    _handler.queue = log_queue
+    _handler.dropped = 0
+    _listener = QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    if _handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
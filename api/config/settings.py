@@ -19,3 +19,175 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(NORMALISED_DIR, exist_ok=True)
 # 1C integration settings (example)
 ONE_C_API_URL = os.getenv("ONE_C_API_URL", "http://localhost:8001/1c")
+
+# Maximum number of files accepted by the batch quality-assessment endpoint
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "32"))
+
+# Micro-batching of concurrent single-image YOLO requests
+MICROBATCH_ENABLED = os.getenv("MICROBATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "8"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+
+# Version tag of the detector weights; part of the result cache key
+MODEL_VERSION = os.getenv("MODEL_VERSION", "yolov8")
+
+# Content-addressed cache of quality-assessment results
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "86400"))
+# Path to a SQLite file for the persistent tier; empty disables it
+RESULT_CACHE_SQLITE_PATH = os.getenv("RESULT_CACHE_SQLITE_PATH", "")
+# Persistent tier: at most this many rows (soonest-expiring dropped first),
+# trimmed together with the expired rows every RESULT_CACHE_PURGE_INTERVAL_S
+RESULT_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+RESULT_CACHE_PURGE_INTERVAL_S = float(os.getenv("RESULT_CACHE_PURGE_INTERVAL_S", "300"))
+
+# Debug/audit mode: persist preprocessed images to NORMALISED_DIR under unique names
+SAVE_INTERMEDIATES = os.getenv("SAVE_INTERMEDIATES", "false").lower() in ("1", "true", "yes")
+
+# OCR worker processes (0 runs PaddleOCR in-process on a thread)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))
+OCR_QUEUE_MAX = int(os.getenv("OCR_QUEUE_MAX", "16"))
+OCR_JOB_TIMEOUT_S = float(os.getenv("OCR_JOB_TIMEOUT_S", "120"))
+OCR_WORKER_STARTUP_TIMEOUT_S = float(os.getenv("OCR_WORKER_STARTUP_TIMEOUT_S", "300"))
+OCR_RETRY_AFTER_S = int(os.getenv("OCR_RETRY_AFTER_S", "5"))
+OCR_USE_GPU = os.getenv("OCR_USE_GPU", "true").lower() in ("1", "true", "yes")
+
+# Evaluation mode: "full" always runs OCR, "tiered" skips OCR when cheap metrics are decisive
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "full")
+# Early-exit thresholds of the cheap tier (a page beyond any of them is clearly unusable)
+EARLY_EXIT_MAX_GLOBAL_BLACK = float(os.getenv("EARLY_EXIT_MAX_GLOBAL_BLACK", "70"))
+EARLY_EXIT_MAX_LARGE_BLACK = float(os.getenv("EARLY_EXIT_MAX_LARGE_BLACK", "50"))
+EARLY_EXIT_MIN_SHARPNESS = float(os.getenv("EARLY_EXIT_MIN_SHARPNESS", "20"))
+EARLY_EXIT_MIN_CONTRAST = float(os.getenv("EARLY_EXIT_MIN_CONTRAST", "15"))
+
+# Cheap image metrics: "full" keeps the original black ratios of the binarized
+# (upscaled) OCR input; "pyramid" computes them on a downscaled level, faster and
+# within 1 point of them (see tests/test_model/test_validation.py). Contrast,
+# noise and skew come from the pyramid level with either engine.
+METRICS_ENGINE = os.getenv("METRICS_ENGINE", "full")
+# Longest side (px) of the pyramid level the metrics are computed on
+METRICS_MAX_SIDE = int(os.getenv("METRICS_MAX_SIDE", "1024"))
+
+# Document detector backend: "torch" (Ultralytics, default) or "onnx" (ONNX Runtime)
+PROJECT_DIR = BASE_DIR.parent
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "torch")
+DETECTOR_WEIGHTS_PATH = os.getenv("DETECTOR_WEIGHTS_PATH", os.path.join(PROJECT_DIR, "model", "weights", "yolov8.pt"))
+DETECTOR_CONF_THRESHOLD = float(os.getenv("DETECTOR_CONF_THRESHOLD", "0.25"))
+DETECTOR_IOU_THRESHOLD = float(os.getenv("DETECTOR_IOU_THRESHOLD", "0.7"))
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", os.path.join(PROJECT_DIR, "model", "weights", "yolov8.onnx"))
+ONNX_PROVIDERS = [p.strip() for p in os.getenv("ONNX_PROVIDERS", "CPUExecutionProvider").split(",") if p.strip()]
+# 0 lets ONNX Runtime pick (one thread per physical core)
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+
+# Uploads: hard size limit and read chunk size (bytes)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Whole request bodies are rejected before parsing above the upload limit plus
+# this much multipart framing (times MAX_BATCH_SIZE for the batch endpoint)
+UPLOAD_MULTIPART_OVERHEAD_BYTES = int(os.getenv("UPLOAD_MULTIPART_OVERHEAD_BYTES", str(64 * 1024)))
+# Reduced-resolution decoding: detection only needs the longest side to cover the
+# 640-px letterbox; the OCR crop is decoded at the smallest reduction that keeps
+# its longest side at or above OCR_CROP_MIN_SIDE (0 always decodes it at full resolution)
+DETECT_DECODE_MIN_SIDE = int(os.getenv("DETECT_DECODE_MIN_SIDE", "640"))
+OCR_CROP_MIN_SIDE = int(os.getenv("OCR_CROP_MIN_SIDE", "1600"))
+
+# Multi-page (PDF/TIFF) documents
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+# Pages rasterized/processed at the same time (bounds peak memory)
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", "4"))
+MAX_PAGES = int(os.getenv("MAX_PAGES", "500"))
+
+# Asynchronous jobs: durable SQLite queue, consumers and callback delivery
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "jobs.sqlite3"))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(BASE_DIR, "job_payloads"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL_S = float(os.getenv("JOB_POLL_INTERVAL_S", "1"))
+# Retries of failed jobs wait JOB_RETRY_BACKOFF_S * 2^(attempt - 1) seconds, at most JOB_RETRY_MAX_BACKOFF_S
+JOB_RETRY_BACKOFF_S = float(os.getenv("JOB_RETRY_BACKOFF_S", "5"))
+JOB_RETRY_MAX_BACKOFF_S = float(os.getenv("JOB_RETRY_MAX_BACKOFF_S", "300"))
+# A running job is leased to its worker process for JOB_LEASE_S seconds, renewed
+# while it runs; jobs whose lease expired (crashed worker) are queued again
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "60"))
+CALLBACK_BATCH_SIZE = int(os.getenv("CALLBACK_BATCH_SIZE", "20"))
+CALLBACK_FLUSH_INTERVAL_S = float(os.getenv("CALLBACK_FLUSH_INTERVAL_S", "2"))
+CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "8"))
+
+# Sampled per-request profiling: fraction of requests profiled (0 disables sampling),
+# profiler ("cprofile" or "tracemalloc") and where reports are written
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+# Allow clients to request a profile with an "X-Profile" header
+PROFILE_ALLOW_HEADER = os.getenv("PROFILE_ALLOW_HEADER", "false").lower() in ("1", "true", "yes")
+
+# Document crops kept for retraining: written by a background thread under
+# content-addressed names, trimmed by age/size/count (0 disables a limit)
+CROP_STORE_ENABLED = os.getenv("CROP_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+CROP_STORE_DIR = os.getenv("CROP_STORE_DIR", os.path.join(BASE_DIR, "static", "cropped_docs"))
+CROP_STORE_QUEUE_MAX = int(os.getenv("CROP_STORE_QUEUE_MAX", "64"))
+CROP_JPEG_QUALITY = int(os.getenv("CROP_JPEG_QUALITY", "90"))
+CROP_RETENTION_MAX_AGE_S = float(os.getenv("CROP_RETENTION_MAX_AGE_S", str(30 * 86400)))
+CROP_RETENTION_MAX_BYTES = int(os.getenv("CROP_RETENTION_MAX_BYTES", str(5 * 1024 ** 3)))
+CROP_RETENTION_MAX_FILES = int(os.getenv("CROP_RETENTION_MAX_FILES", "100000"))
+CROP_RETENTION_INTERVAL_S = float(os.getenv("CROP_RETENTION_INTERVAL_S", "300"))
+
+# Staged pipeline executor: threads per stage (blocking work runs off the event
+# loop) and how many calls may queue for a stage beyond its running threads
+STAGE_EXECUTORS_ENABLED = os.getenv("STAGE_EXECUTORS_ENABLED", "true").lower() in ("1", "true", "yes")
+STAGE_DECODE_THREADS = int(os.getenv("STAGE_DECODE_THREADS", "2"))
+STAGE_DETECT_THREADS = int(os.getenv("STAGE_DETECT_THREADS", "1"))
+STAGE_IMAGE_THREADS = int(os.getenv("STAGE_IMAGE_THREADS", "2"))
+STAGE_QUEUE_MAX = int(os.getenv("STAGE_QUEUE_MAX", "8"))
+# Admission control: estimated memory of in-flight requests (0 disables); requests
+# over budget wait up to ADMISSION_MAX_WAIT_S, then get 503 with Retry-After
+INFLIGHT_MEMORY_BUDGET_MB = int(os.getenv("INFLIGHT_MEMORY_BUDGET_MB", "1024"))
+ADMISSION_MAX_WAIT_S = float(os.getenv("ADMISSION_MAX_WAIT_S", "0.5"))
+ADMISSION_RETRY_AFTER_S = int(os.getenv("ADMISSION_RETRY_AFTER_S", "2"))
+# Batch requests are admitted in chunks of at most this share of the budget
+BATCH_ADMISSION_SHARE = float(os.getenv("BATCH_ADMISSION_SHARE", "0.25"))
+
+# OCR mode: "full" recognizes every line and returns the text, "quality" only
+# estimates the mean confidence from a stratified sample of the detected lines
+OCR_MODE = os.getenv("OCR_MODE", "full")
+OCR_SAMPLE_LINES = int(os.getenv("OCR_SAMPLE_LINES", "24"))
+# Pages with at most this many lines are recognized in full
+OCR_SAMPLE_MIN_LINES = int(os.getenv("OCR_SAMPLE_MIN_LINES", "48"))
+# Widest acceptable confidence-interval half-width (confidence points) before
+# falling back to recognizing the whole page
+OCR_SAMPLE_MAX_CI_HALF_WIDTH = float(os.getenv("OCR_SAMPLE_MAX_CI_HALF_WIDTH", "3.0"))
+OCR_SAMPLE_CONFIDENCE_LEVEL = float(os.getenv("OCR_SAMPLE_CONFIDENCE_LEVEL", "0.95"))
+
+# OCR profiles (upscale, angle classifier, detection limits, recognition batch)
+# keyed by YOLO class name; empty path uses the default profile for every type
+OCR_PROFILES_PATH = os.getenv("OCR_PROFILES_PATH", os.path.join(BASE_DIR, "config", "ocr_profiles.json"))
+
+# Near-duplicate index: perceptual hashes (pHash + dHash) of assessed crops.
+# Within NEAR_DUP_MAX_DISTANCE bits (pHash, of 64) and NEAR_DUP_DHASH_MAX_DISTANCE
+# (dHash) a document is a near-duplicate: "flag" reports the earlier assessment,
+# "reuse" returns it without running OCR. Empty SQLite path keeps it in memory only.
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "true").lower() in ("1", "true", "yes")
+NEAR_DUP_ACTION = os.getenv("NEAR_DUP_ACTION", "flag")
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "6"))
+NEAR_DUP_DHASH_MAX_DISTANCE = int(os.getenv("NEAR_DUP_DHASH_MAX_DISTANCE", "10"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "100000"))
+NEAR_DUP_SQLITE_PATH = os.getenv("NEAR_DUP_SQLITE_PATH", os.path.join(BASE_DIR, "near_duplicates.sqlite3"))
+
+# Responses: default field selection ("full", "lean" or a comma-separated list)
+# and gzip for bodies of at least RESPONSE_GZIP_MIN_BYTES when the client accepts it (0 disables)
+RESPONSE_FIELDS = os.getenv("RESPONSE_FIELDS", "full")
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "2048"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+# Bodies of at least this size are gzipped on a thread instead of the event loop
+RESPONSE_GZIP_THREAD_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_THREAD_MIN_BYTES", str(64 * 1024)))
+
+# Logging: records go through a bounded queue to a background writer thread
+# (dropped, and counted, when it is full); verbose payloads (OCR dumps, text
+# previews) are only logged for a sample of the calls
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+LOG_VERBOSE_SAMPLE_RATE = float(os.getenv("LOG_VERBOSE_SAMPLE_RATE", "0.01"))
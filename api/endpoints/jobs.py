@@ -0,0 +1,59 @@
+import asyncio
+import json
+import logging
+from typing import Literal, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Header
+from fastapi.responses import JSONResponse
+from api.config.settings import EVALUATION_MODE, ONE_C_API_URL
+from api.jobs.worker import get_job_store, get_job_runner
+from api.models.utils import read_upload_limited
+from api.schemas.jobs import JobStatusResponse
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+def _job_response(job: dict) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        attempts=job["attempts"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        callback_status=job["callback_status"],
+        result=json.loads(job["result"]) if job["result"] else None,
+        error=job["error"],
+    )
+
+
+@router.post("/jobs/", response_model=JobStatusResponse, status_code=202)
+async def submit_job(
+    image: UploadFile = File(...),
+    mode: Literal["full", "tiered"] = Query(EVALUATION_MODE, description="'tiered' skips OCR when cheap metrics are decisive."),
+    notify_1c: bool = Query(False, description="Push the result to 1C (ONE_C_API_URL) when the job finishes."),
+    idempotency_key: Optional[str] = Header(None, description="Re-submitting with the same key returns the original job."),
+):
+    """
+    Queue a quality assessment and return immediately; poll GET /jobs/{job_id}
+    or receive the result through the 1C callback.
+    """
+    content = await read_upload_limited(image)
+    # Writes the payload file and the SQLite row: keep it off the event loop
+    job, created = await asyncio.to_thread(
+        get_job_store().submit, content, image.filename, mode,
+        callback_url=ONE_C_API_URL if notify_1c and ONE_C_API_URL else None,
+        idempotency_key=idempotency_key,
+    )
+    runner = get_job_runner()
+    if runner is not None:
+        runner.notify()
+    logger.info(f"Job {job['id']} {'queued' if created else 'already exists'}.")
+    return JSONResponse(status_code=202 if created else 200, content=_job_response(job).model_dump())
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return _job_response(job)
@@ -0,0 +1,162 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from api.monitoring.metrics import render_prometheus, register_gauges
+from api.models.registry import registry
+from api.cache.result_cache import get_result_cache
+from api.models.batching import get_batcher
+from api.quality.ocr_pool import get_ocr_pool
+from api.models.crop_writer import get_crop_writer
+from api.quality.stages import stage_stats, get_memory_budget
+from api.cache.phash_index import get_phash_index
+from api.config.logging import logging_stats
+
+router = APIRouter()
+
+
+def _service_gauges():
+    # Current values are gauges; totals since start are counters (see register_gauges)
+    gauges = []
+    batcher = get_batcher()
+    if batcher is not None:
+        stats = batcher.stats()
+        gauges += [
+            ("dq_batcher_queue_depth", "Images waiting for the next YOLO batch.", stats["queue_depth"]),
+            ("dq_batcher_average_batch_size", "Average YOLO batch size since start.", stats["average_batch_size"]),
+        ]
+    cache = get_result_cache()
+    if cache is not None:
+        stats = cache.stats()
+        gauges += [
+            ("dq_result_cache_hits_total", "Result cache hits since start.", stats["hits"], "counter"),
+            ("dq_result_cache_misses_total", "Result cache misses since start.", stats["misses"], "counter"),
+            ("dq_result_cache_entries", "Entries in the in-memory result cache.", stats["entries"]),
+        ]
+    pool = get_ocr_pool()
+    if pool is not None:
+        stats = pool.stats()
+        gauges += [
+            ("dq_ocr_in_flight", "OCR jobs running or queued in the worker pool.", stats["in_flight"]),
+            ("dq_ocr_rejected_total", "OCR jobs rejected because the queue was full.", stats["rejected"], "counter"),
+            ("dq_ocr_timeouts_total", "OCR jobs that timed out.", stats["timeouts"], "counter"),
+        ]
+    for name, stats in stage_stats().items():
+        gauges += [
+            (f"dq_stage_{name}_active", f"Calls running on the {name} stage threads.", stats["active"]),
+            (f"dq_stage_{name}_waiting", f"Calls waiting for a {name} stage slot.", stats["waiting"]),
+        ]
+    budget = get_memory_budget()
+    if budget is not None:
+        stats = budget.stats()
+        gauges += [
+            ("dq_inflight_memory_bytes", "Estimated memory reserved by in-flight requests.", stats["in_flight_bytes"]),
+            ("dq_admission_rejected_total", "Requests rejected because the memory budget was exhausted.",
+             stats["rejected"], "counter"),
+        ]
+    writer = get_crop_writer()
+    if writer is not None:
+        stats = writer.stats()
+        gauges += [
+            ("dq_crop_store_bytes", "Bytes used by stored document crops.", stats["disk_bytes"]),
+            ("dq_crop_store_files", "Stored document crops.", stats["disk_files"]),
+            ("dq_crop_store_oldest_age_seconds", "Age of the oldest stored crop.", stats["oldest_age_s"]),
+            ("dq_crop_writer_queue_depth", "Crops waiting to be written.", stats["queue_depth"]),
+            ("dq_crop_writer_dropped_total", "Crops dropped because the writer queue was full.",
+             stats["dropped"], "counter"),
+            ("dq_crop_store_evicted_total", "Crops deleted by the retention policy.", stats["evicted"], "counter"),
+        ]
+    index = get_phash_index()
+    if index is not None:
+        stats = index.stats()
+        gauges += [
+            ("dq_near_duplicate_entries", "Perceptual hashes in the near-duplicate index.", stats["entries"]),
+            ("dq_near_duplicate_lookups_total", "Near-duplicate index lookups since start.",
+             stats["lookups"], "counter"),
+            ("dq_near_duplicate_matches_total", "Near-duplicates found since start.", stats["matches"], "counter"),
+        ]
+    stats = logging_stats()
+    gauges += [
+        ("dq_log_queue_depth", "Log records waiting for the background writer.", stats["queued"]),
+        ("dq_log_dropped_total", "Log records dropped because the log queue was full.", stats["dropped"], "counter"),
+    ]
+    return gauges
+
+
+register_gauges(_service_gauges)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of stage/request latency histograms and service gauges."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Ready once every eagerly loaded model is in memory and, when OCR runs in
+    worker processes, the pool is up. Reports load time and memory per model.
+    """
+    pool = get_ocr_pool()
+    ocr_pool_ready = pool is None or pool.running
+    ready = registry.ready() and ocr_pool_ready
+    body = {
+        "status": "ready" if ready else "not ready",
+        "models": registry.status(),
+        "ocr_pool": pool.stats() if pool is not None else None,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+
+@router.get("/stats/batching")
+async def batching_stats():
+    batcher = get_batcher()
+    if batcher is None:
+        return {"running": False}
+    return batcher.stats()
+
+
+@router.get("/stats/cache")
+async def cache_stats():
+    cache = get_result_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@router.get("/stats/ocr")
+async def ocr_pool_stats():
+    pool = get_ocr_pool()
+    if pool is None:
+        return {"running": False}
+    return pool.stats()
+
+
+@router.get("/stats/storage")
+async def storage_stats():
+    writer = get_crop_writer()
+    if writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **writer.stats()}
+
+
+@router.get("/stats/near-duplicates")
+async def near_duplicate_stats():
+    index = get_phash_index()
+    if index is None:
+        return {"enabled": False}
+    return {"enabled": True, **index.stats()}
+
+
+@router.get("/stats/pipeline")
+async def pipeline_stats():
+    budget = get_memory_budget()
+    return {
+        "stages": stage_stats(),
+        "admission": budget.stats() if budget is not None else {"enabled": False},
+        "logging": logging_stats(),
+    }
@@ -1,87 +1,227 @@
+import asyncio
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from api.models.utils import  save_upload_file
-from api.quality.ocr_quality import preprocess_image, assess_binarization_quality, safe_ocr_call
-from api.quality.scoring import calculate_global_score
-from api.schemas.quality import DocumentQualityResponse
-from api.models.yolo_inference import detect_and_crop_document 
-import numpy as np 
-import cv2
+from typing import List, Literal
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from api.cache.result_cache import get_result_cache
+from api.monitoring.metrics import stage
+from api.config.settings import MAX_BATCH_SIZE, OCR_WORKERS, EVALUATION_MODE, OCR_MODE, RESPONSE_FIELDS
+from api.models.utils import  read_upload_limited
+from api.quality.pipeline import decode_for_detection, crop_from_bytes, assess_detected_document, image_size
+from api.quality.stages import run_in_stage, admit, admission_chunks, estimate_request_bytes
+from api.models.batching import locate_document
+from api.quality.multipage import open_document_stream
+from api.schemas.quality import DocumentQualityResponse, BatchItemResult, BatchQualityResponse
+from api.models.yolo_inference import locate_documents
+from api.endpoints.responses import parse_fields, quality_response, batch_response
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+
+def _cache_variant(mode: str, ocr_mode: str) -> str:
+    # Full OCR keeps the plain mode as variant, so existing cache entries stay valid
+    return mode if ocr_mode == "full" else f"{mode}:{ocr_mode}-ocr"
+
+
 @router.post("/quality-assessment/", response_model=DocumentQualityResponse)
-async def quality_assessment(image: UploadFile = File(...)):
+async def quality_assessment(
+    request: Request,
+    image: UploadFile = File(...),
+    use_cache: bool = Query(True, description="Set to false to bypass the result cache and the near-duplicate index."),
+    mode: Literal["full", "tiered"] = Query(EVALUATION_MODE, description="'tiered' skips OCR when cheap metrics are decisive."),
+    ocr_mode: Literal["full", "quality"] = Query(OCR_MODE, description="'quality' samples text lines to estimate OCR confidence and returns no text."),
+    fields: str = Query(RESPONSE_FIELDS, description="'full', 'lean' (numeric metrics, no text) or a comma-separated list of response fields."),
+):
     logger.info(f"Received image of type: {type(image)}")
+    selected = parse_fields(fields)
+    accept_encoding = request.headers.get("accept-encoding", "")
 
     try:
-        file_like_object = await save_upload_file(image)
+        with stage("upload"):
+            content = await read_upload_limited(image)
+
+        cache = get_result_cache() if use_cache else None
+        cache_key = None
+        if cache:
+            with stage("cache"):
+                cache_key = cache.make_key(content, variant=_cache_variant(mode, ocr_mode))
+                cached = await asyncio.to_thread(cache.get, cache_key)
+            if cached is not None:
+                logger.info("Returning cached quality assessment.")
+                return await quality_response(cached, selected, accept_encoding)
+
+        # Reserve the request's estimated peak memory before decoding anything
+        async with admit(estimate_request_bytes(image_size(content), len(content))):
+            # Decode image using OpenCV, at the reduced resolution detection needs
+            img, full_size = await run_in_stage("decode", decode_for_detection, content)
 
-        # Decode image using OpenCV
-        file_like_object.seek(0)
-        img = cv2.imdecode(np.frombuffer(file_like_object.read(), np.uint8), cv2.IMREAD_COLOR)
-        if img is None:
-            raise ValueError("Failed to load image from memory.")
+            logger.info("Image successfully loaded and decoded.")
 
-        logger.info("Image successfully loaded and decoded.")
+            # YOLO detection
+            try:
+                location = await locate_document(img)
+            except Exception as e:
+                logger.error("Document detection failed", exc_info=True)
+                raise HTTPException(status_code=422, detail=f"Document detection failed: {str(e)}")
 
-        # YOLO detection and cropping
+            # Crop decoded at the resolution OCR needs
+            detection_result = await run_in_stage("decode", crop_from_bytes, content, location, img, full_size)
+            del img
+
+            response = await assess_detected_document(
+                detection_result, mode=mode, ocr_mode=ocr_mode, use_index=use_cache
+            )
+        if cache:
+            await asyncio.to_thread(cache.put, cache_key, response)
+        return await quality_response(response, selected, accept_encoding)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unhandled error in quality assessment", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+def _error_detail(exc: Exception) -> str:
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return str(exc)
+
+
+@router.post("/quality-assessment/batch/", response_model=BatchQualityResponse)
+async def quality_assessment_batch(
+    request: Request,
+    images: List[UploadFile] = File(...),
+    use_cache: bool = Query(True, description="Set to false to bypass the result cache and the near-duplicate index."),
+    mode: Literal["full", "tiered"] = Query(EVALUATION_MODE, description="'tiered' skips OCR when cheap metrics are decisive."),
+    ocr_mode: Literal["full", "quality"] = Query(OCR_MODE, description="'quality' samples text lines to estimate OCR confidence and returns no text."),
+    fields: str = Query(RESPONSE_FIELDS, description="'full', 'lean' (numeric metrics, no text) or a comma-separated list of response fields."),
+):
+    """
+    Assess several documents at once. The images are admitted against the
+    memory budget in chunks, and the images of a chunk share a single YOLO
+    forward pass; results (or per-item errors) are returned in input order.
+    """
+    if len(images) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Too many files in batch (max {MAX_BATCH_SIZE}).")
+    logger.info(f"Received batch of {len(images)} images.")
+    selected = parse_fields(fields)
+    accept_encoding = request.headers.get("accept-encoding", "")
+
+    items = [BatchItemResult(index=i, filename=image.filename) for i, image in enumerate(images)]
+
+    cache = get_result_cache() if use_cache else None
+    cache_keys = {}
+
+    # Read every upload, answering from the cache where possible
+    contents, decoded, full_sizes = {}, {}, {}
+    for i, image in enumerate(images):
         try:
-            detection_result = detect_and_crop_document(img)
-            cropped = detection_result["cropped_asnumpy"]
-            cropped_path = detection_result["cropped_path"]
-            doc_type = detection_result["doc_type"]
-            confidence = detection_result["confidence"]
-            logger.info(f"YOLO detected doc_type={doc_type} with confidence={confidence}")
-            logger.info(f"Cropped image saved to: {cropped_path}")
+            with stage("upload"):
+                content = await read_upload_limited(image)
+            if cache:
+                with stage("cache"):
+                    cache_keys[i] = cache.make_key(content, variant=_cache_variant(mode, ocr_mode))
+                    cached = await asyncio.to_thread(cache.get, cache_keys[i])
+                if cached is not None:
+                    items[i].result = cached
+                    continue
+            contents[i] = content
         except Exception as e:
-            logger.error("Document detection failed", exc_info=True)
-            raise HTTPException(status_code=422, detail=f"Document detection failed: {str(e)}")
-
-        # Preprocess image
-        processed_path, binary_img = preprocess_image(cropped)
-        logger.info("Image successfully preprocessed.")
-
-        # Binarization quality
-        global_black_ratio, large_black_ratio = assess_binarization_quality(binary_img)
-        binarization_quality = (
-            f"High large-black region ratio ({large_black_ratio:.2f}%), potential quality issues."
-            if large_black_ratio > 20 else
-            f"Low large-black region ratio ({large_black_ratio:.2f}%), image quality acceptable."
-        )
-
-        # OCR quality (using PaddleOCR)
+            logger.warning(f"Batch item {i} could not be read: {e}")
+            items[i].error = _error_detail(e)
+    if not contents:
+        return await batch_response(BatchQualityResponse(items=items), selected, accept_encoding)
+
+    # Decode at reduced resolution, remembering which ones failed
+    async def decode_item(i):
         try:
-            text, average_conf, ocr_quality = await safe_ocr_call(processed_path, lang="ru")
-            logger.info(f"OCR processing complete, average confidence: {average_conf:.2f}")
+            decoded[i], full_sizes[i] = await run_in_stage("decode", decode_for_detection, contents[i])
         except Exception as e:
-            logger.error("OCR processing failed", exc_info=True)
-            raise HTTPException(status_code=500, detail="OCR processing failed.")
-
-        # Global score
-        global_score, quality_category = calculate_global_score(
-            ocr_conf=average_conf,
-            global_black_ratio=global_black_ratio,
-            large_black_ratio=large_black_ratio
-        )
-
-        logger.info(f"Global score calculated: {global_score}")
-
-        return DocumentQualityResponse(
-            doc_type=doc_type,
-            confidence=confidence,
-            text=text,
-            average_confidence=average_conf,
-            ocr_quality_assessment=ocr_quality,
-            global_black_ratio=f"{global_black_ratio:.2f}%",
-            large_black_region_ratio=f"{large_black_ratio:.2f}%",
-            binarization_quality=binarization_quality,
-            global_score=global_score,
-            quality_category=quality_category
-        )
+            logger.warning(f"Batch item {i} could not be decoded: {e}")
+            items[i].error = _error_detail(e)
+            contents.pop(i)
 
-    except Exception as e:
-        logger.error("Unhandled error in quality assessment", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+    # Keep at most one item per OCR worker in flight so a large batch doesn't fill the OCR queue
+    ocr_slots = asyncio.Semaphore(max(1, OCR_WORKERS))
+
+    async def assess_item(i, location):
+        if isinstance(location, Exception):
+            items[i].error = f"Document detection failed: {location}"
+            return
+        try:
+            detection_result = await run_in_stage(
+                "decode", crop_from_bytes, contents.pop(i), location, decoded.pop(i), full_sizes[i]
+            )
+            async with ocr_slots:
+                items[i].result = await assess_detected_document(
+                    detection_result, mode=mode, ocr_mode=ocr_mode, use_index=use_cache
+                )
+            if cache:
+                await asyncio.to_thread(cache.put, cache_keys[i], items[i].result)
+        except Exception as e:
+            logger.error(f"Quality assessment failed for batch item {i}", exc_info=True)
+            items[i].error = _error_detail(e)
+
+    async def assess_chunk(chunk):
+        await asyncio.gather(*(decode_item(i) for i in chunk))
+
+        # Single batched YOLO pass over the decodable images of the chunk
+        indices = [i for i in chunk if i in decoded]
+        if not indices:
+            return
+        try:
+            locations = await run_in_stage("detect", locate_documents, [decoded[i] for i in indices])
+        except Exception as e:
+            logger.error("Batched document detection failed", exc_info=True)
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+        # OCR of the items overlaps across the OCR worker pool
+        await asyncio.gather(*(assess_item(i, loc) for i, loc in zip(indices, locations)))
+
+    # Admitted chunk by chunk, so a large batch never needs its whole estimate
+    # at once; a busy server rejects the batch up front, or the rest of it
+    # once some chunks are done
+    estimates = {i: estimate_request_bytes(image_size(c), len(c)) for i, c in contents.items()}
+    chunks = admission_chunks(estimates)
+    for n, chunk in enumerate(chunks):
+        try:
+            async with admit(sum(estimates[i] for i in chunk)):
+                await assess_chunk(chunk)
+        except HTTPException as e:
+            if e.status_code != 503 or n == 0:
+                raise
+            for i in (i for rest in chunks[n:] for i in rest):
+                items[i].error = _error_detail(e)
+            break
+
+    return await batch_response(BatchQualityResponse(items=items), selected, accept_encoding)
+
+
+@router.post("/quality-assessment/document/")
+async def quality_assessment_document(
+    document: UploadFile = File(...),
+    mode: Literal["full", "tiered"] = Query(EVALUATION_MODE, description="'tiered' skips OCR when cheap metrics are decisive."),
+    ocr_mode: Literal["full", "quality"] = Query(OCR_MODE, description="'quality' samples text lines to estimate OCR confidence and returns no text."),
+    fields: str = Query(RESPONSE_FIELDS, description="'full', 'lean' (numeric metrics, no text) or a comma-separated list of response fields."),
+):
+    """
+    Assess every page of a multi-page PDF/TIFF (or a single image). Pages are
+    processed in parallel and streamed back as NDJSON as soon as each one is
+    done: one {"type": "page", ...} line per page, then a
+    {"type": "document", ...} line with the aggregate score. Documents longer
+    than MAX_PAGES are assessed on their first MAX_PAGES pages only, and the
+    document line then says `"truncated": true` next to `total_pages`.
+
+    The document reserves the memory of its largest concurrently processed
+    pages in the in-flight budget, like single images do.
+    """
+    selected = parse_fields(fields)
+    content = await read_upload_limited(document)
+    logger.info(f"Received document '{document.filename}' ({len(content)} bytes).")
+    # Admitted against the memory budget (503) before the response starts
+    stream, release = await open_document_stream(content, mode=mode, ocr_mode=ocr_mode, fields=selected)
+    return StreamingResponse(stream, media_type="application/x-ndjson", background=BackgroundTask(release))
@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+from typing import Optional, Set, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from api.config.settings import RESPONSE_GZIP_MIN_BYTES, RESPONSE_GZIP_LEVEL, RESPONSE_GZIP_THREAD_MIN_BYTES
+from api.monitoring.metrics import stage
+from api.schemas.quality import DocumentQualityResponse
+
+# "lean": numbers and labels only; no OCR text and no pre-formatted strings
+FIELD_PRESETS = {
+    "lean": {
+        "doc_type", "confidence", "average_confidence", "global_black_percent", "large_black_region_percent",
+        "global_score", "quality_category", "evaluation_tier", "sharpness", "contrast", "noise", "skew_angle",
+        "ocr_confidence_interval", "near_duplicate_of", "near_duplicate_distance",
+    },
+}
+
+
+def parse_fields(spec: Optional[str]) -> Optional[Set[str]]:
+    """
+    Response fields requested by `spec`: "full" (or empty) for all of them,
+    a preset name, or a comma-separated list of field names.
+
+    Returns:
+        - The set of field names, or None for all fields
+    """
+    if not spec or spec == "full":
+        return None
+    if spec in FIELD_PRESETS:
+        return FIELD_PRESETS[spec]
+    fields = {name.strip() for name in spec.split(",") if name.strip()}
+    unknown = fields - set(DocumentQualityResponse.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown response fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or covered by
+    "*") with a non-zero q-value, so "gzip;q=0" refuses it.
+    """
+    qualities = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip():
+            qualities[coding.strip()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+
+def _encode(model: BaseModel, include, exclude_none: bool, accept_encoding: str) -> Tuple[bytes, dict, bool]:
+    # JSON body, headers and whether the body should be gzipped
+    headers = {}
+    body = model.model_dump_json(include=include, exclude_none=exclude_none).encode("utf-8")
+    compress = bool(RESPONSE_GZIP_MIN_BYTES) and len(body) >= RESPONSE_GZIP_MIN_BYTES and accepts_gzip(accept_encoding)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    if RESPONSE_GZIP_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+    return body, headers, compress
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+
+
+def model_response(model: BaseModel, include=None, exclude_none: bool = False,
+                   accept_encoding: str = "") -> Response:
+    """
+    Serialize a response model straight to JSON bytes with pydantic's
+    serializer, instead of FastAPI's jsonable_encoder and response_model
+    re-validation. Bodies of at least RESPONSE_GZIP_MIN_BYTES (long OCR
+    texts, batches) are gzipped when the client accepts it.
+
+    Everything runs on the calling thread; endpoints use `async_model_response`.
+    """
+    with stage("serialize"):
+        body, headers, compress = _encode(model, include, exclude_none, accept_encoding)
+        if compress:
+            body = _gzip(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def async_model_response(model: BaseModel, include=None, exclude_none: bool = False,
+                               accept_encoding: str = "") -> Response:
+    """
+    `model_response` for the event loop: bodies of at least
+    RESPONSE_GZIP_THREAD_MIN_BYTES (e.g. large batches) are gzipped on a
+    thread, so compressing them doesn't hold up other requests.
+    """
+    with stage("serialize"):
+        body, headers, compress = _encode(model, include, exclude_none, accept_encoding)
+        if compress:
+            if len(body) >= RESPONSE_GZIP_THREAD_MIN_BYTES:
+                body = await asyncio.to_thread(_gzip, body)
+            else:
+                body = _gzip(body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def quality_response(result: DocumentQualityResponse, fields: Optional[Set[str]],
+                           accept_encoding: str = "") -> Response:
+    """A single assessment restricted to `fields`; selected responses also omit null fields."""
+    return await async_model_response(result, include=fields, exclude_none=fields is not None,
+                                      accept_encoding=accept_encoding)
+
+
+async def batch_response(batch: BaseModel, fields: Optional[Set[str]], accept_encoding: str = "") -> Response:
+    if fields is None:
+        return await async_model_response(batch, accept_encoding=accept_encoding)
+    include = {"items": {"__all__": {"index": True, "filename": True, "error": True, "result": fields}}}
+    return await async_model_response(batch, include=include, exclude_none=True, accept_encoding=accept_encoding)
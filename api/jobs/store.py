@@ -0,0 +1,217 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from threading import Lock
+from typing import List, Optional, Tuple
+
+# Job lifecycle
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Callback delivery state
+CALLBACK_NONE = "none"
+CALLBACK_PENDING = "pending"
+CALLBACK_DELIVERED = "delivered"
+CALLBACK_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    filename TEXT,
+    payload_path TEXT,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    owner INTEGER,
+    lease_expires_at REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    callback_status TEXT NOT NULL,
+    callback_attempts INTEGER NOT NULL DEFAULT 0,
+    next_callback_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_callback ON jobs (callback_status, next_callback_at);
+"""
+
+
+class JobStore:
+    """
+    Durable job queue on a local SQLite file.
+
+    Upload bytes are kept as files under `payload_dir` and removed once the
+    job is finished; the database only holds metadata and results. Every
+    state change is committed, so queued and finished-but-undelivered jobs
+    survive a restart.
+    """
+
+    def __init__(self, db_path: str, payload_dir: str):
+        self.payload_dir = payload_dir
+        os.makedirs(payload_dir, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = Lock()
+
+    def close(self):
+        self._db.close()
+
+    def submit(self, content: bytes, filename: Optional[str], mode: str, callback_url: Optional[str],
+               idempotency_key: Optional[str] = None) -> Tuple[dict, bool]:
+        """
+        Queue a new job. Returns (job, created); when `idempotency_key` was
+        already used, the existing job is returned with created=False.
+        """
+        with self._lock:
+            if idempotency_key:
+                existing = self._db.execute(
+                    "SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()
+                if existing is not None:
+                    return dict(existing), False
+
+            job_id = uuid.uuid4().hex
+            payload_path = os.path.join(self.payload_dir, f"{job_id}.bin")
+            with open(payload_path, "wb") as f:
+                f.write(content)
+
+            now = time.time()
+            self._db.execute(
+                "INSERT INTO jobs (id, idempotency_key, status, mode, filename, payload_path, callback_url, "
+                "created_at, updated_at, callback_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, idempotency_key, QUEUED, mode, filename, payload_path, callback_url,
+                 now, now, CALLBACK_NONE),
+            )
+            return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim_next(self, owner: int, lease_s: float) -> Optional[dict]:
+        """
+        Atomically move the oldest queued job whose retry delay has passed to
+        `running` and return it, leased to `owner` (the worker's pid) for
+        `lease_s` seconds.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND next_attempt_at <= ? ORDER BY created_at LIMIT 1",
+                    (QUEUED, time.time()),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, owner = ?, "
+                    "lease_expires_at = ? WHERE id = ?",
+                    (RUNNING, now, owner, now + lease_s, row["id"]),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return self.get(row["id"])
+
+    def read_payload(self, job: dict) -> bytes:
+        with open(job["payload_path"], "rb") as f:
+            return f.read()
+
+    def _finish(self, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        with self._lock:
+            job = self.get(job_id)
+            callback_status = CALLBACK_PENDING if job["callback_url"] else CALLBACK_NONE
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, callback_status = ?, "
+                "payload_path = NULL WHERE id = ?",
+                (status, result, error, time.time(), callback_status, job_id),
+            )
+        if job["payload_path"] and os.path.exists(job["payload_path"]):
+            os.remove(job["payload_path"])
+
+    def complete(self, job_id: str, result: dict):
+        self._finish(job_id, DONE, json.dumps(result, ensure_ascii=False), None)
+
+    def fail(self, job_id: str, error: str, retry: bool, delay_s: float = 0):
+        """
+        Record a failed attempt; with `retry` the job is queued again, to be
+        claimed no earlier than `delay_s` seconds from now.
+        """
+        if retry:
+            with self._lock:
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ?, next_attempt_at = ? WHERE id = ?",
+                    (QUEUED, error, now, now + delay_s, job_id),
+                )
+        else:
+            self._finish(job_id, FAILED, None, error)
+
+    def renew_leases(self, owner: int, lease_s: float) -> int:
+        """
+        Extend the lease of every job `owner` is still running.
+        """
+        with self._lock:
+            return self._db.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE status = ? AND owner = ?",
+                (time.time() + lease_s, RUNNING, owner),
+            ).rowcount
+
+    def requeue_running(self, owner: int, expired_only: bool = False) -> int:
+        """
+        Put jobs left `running` back in the queue: those whose lease expired
+        (crashed worker) and, unless `expired_only`, those of `owner`
+        (stopped or restarted worker). Jobs that other live workers sharing
+        the database are running keep their lease.
+        """
+        with self._lock:
+            now = time.time()
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, owner = NULL "
+                "WHERE status = ? AND (owner = ? OR lease_expires_at <= ?)",
+                (QUEUED, now, RUNNING, None if expired_only else owner, now),
+            ).rowcount
+
+    def due_callbacks(self, limit: int) -> List[dict]:
+        rows = self._db.execute(
+            "SELECT * FROM jobs WHERE callback_status = ? AND next_callback_at <= ? "
+            "ORDER BY updated_at LIMIT ?",
+            (CALLBACK_PENDING, time.time(), limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def mark_callbacks_delivered(self, job_ids: List[str]):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET callback_status = ?, callback_attempts = callback_attempts + 1 WHERE id = ?",
+                [(CALLBACK_DELIVERED, job_id) for job_id in job_ids],
+            )
+
+    def reschedule_callbacks(self, job_ids: List[str], delay_s: float, max_attempts: int):
+        """
+        Record a failed delivery; jobs that used up `max_attempts` are marked failed.
+        """
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET callback_attempts = callback_attempts + 1, next_callback_at = ?, "
+                "callback_status = CASE WHEN callback_attempts + 1 >= ? THEN ? ELSE callback_status END "
+                "WHERE id = ?",
+                [(time.time() + delay_s, max_attempts, CALLBACK_FAILED, job_id) for job_id in job_ids],
+            )
+
+    def counts(self) -> dict:
+        rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
@@ -0,0 +1,177 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import HTTPException
+
+from api.config.settings import (
+    JOBS_DB_PATH, JOBS_DIR, JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL_S,
+    JOB_RETRY_BACKOFF_S, JOB_RETRY_MAX_BACKOFF_S, JOB_LEASE_S,
+    CALLBACK_BATCH_SIZE, CALLBACK_FLUSH_INTERVAL_S, CALLBACK_MAX_ATTEMPTS,
+)
+from api.jobs.store import JobStore
+from api.quality.pipeline import detect_from_bytes, assess_detected_document, image_size
+from api.quality.stages import admit, estimate_request_bytes
+
+logger = logging.getLogger(__name__)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    # Busy OCR pool / internal failures are worth another attempt; bad input is not
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return not isinstance(exc, ValueError)
+
+
+class JobRunner:
+    """
+    Consumes the durable job queue with `num_workers` coroutines that reuse
+    the regular quality pipeline, and delivers finished results to their
+    callback URLs in batches.
+
+    Claimed jobs are leased to this process (its pid), so several server
+    processes can share one queue without re-queueing each other's jobs.
+    """
+
+    def __init__(self, store: JobStore, num_workers: int, client=None):
+        self.store = store
+        self.num_workers = num_workers
+        self.client = client
+        self.owner = os.getpid()
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def notify(self):
+        """Wake the workers right away after a submission."""
+        self._wakeup.set()
+
+    async def start(self):
+        requeued = await asyncio.to_thread(self.store.requeue_running, self.owner)
+        if requeued:
+            logger.info(f"Re-queued {requeued} jobs interrupted by the previous shutdown.")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.num_workers)]
+        self._tasks.append(asyncio.create_task(self._keep_leases()))
+        if self.client is not None:
+            self._tasks.append(asyncio.create_task(self._deliver_callbacks()))
+        logger.info(f"Job runner started with {self.num_workers} workers.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.client is not None:
+            await self.client.aclose()
+        # Anything cut off mid-run is picked up again (by a sibling or on next start)
+        await asyncio.to_thread(self.store.requeue_running, self.owner)
+
+    async def _wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def run_job(self, job: dict):
+        try:
+            content = await asyncio.to_thread(self.store.read_payload, job)
+            # Same memory admission as the synchronous endpoint; a 503 is retried
+            async with admit(estimate_request_bytes(image_size(content), len(content))):
+                detection_result = await detect_from_bytes(content)
+                response = await assess_detected_document(detection_result, mode=job["mode"])
+            await asyncio.to_thread(self.store.complete, job["id"], response.model_dump())
+            logger.info(f"Job {job['id']} done.")
+        except Exception as e:
+            detail = str(e.detail) if isinstance(e, HTTPException) else str(e)
+            retry = _is_retryable(e) and job["attempts"] < JOB_MAX_ATTEMPTS
+            # Back off so an outage doesn't use up the attempts within milliseconds
+            delay = min(JOB_RETRY_BACKOFF_S * 2 ** (job["attempts"] - 1), JOB_RETRY_MAX_BACKOFF_S)
+            logger.warning(f"Job {job['id']} failed (attempt {job['attempts']}, "
+                           f"retry={f'in {delay:.0f}s' if retry else False}): {detail}")
+            await asyncio.to_thread(self.store.fail, job["id"], detail, retry=retry, delay_s=delay)
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next, self.owner, JOB_LEASE_S)
+            if job is None:
+                await self._wait(JOB_POLL_INTERVAL_S)
+                continue
+            await self.run_job(job)
+
+    async def _keep_leases(self):
+        # Renew our own leases well before they expire; take over crashed workers' jobs
+        while True:
+            await asyncio.sleep(JOB_LEASE_S / 3)
+            await asyncio.to_thread(self.store.renew_leases, self.owner, JOB_LEASE_S)
+            requeued = await asyncio.to_thread(self.store.requeue_running, self.owner, expired_only=True)
+            if requeued:
+                logger.info(f"Re-queued {requeued} jobs whose worker stopped renewing its lease.")
+                self.notify()
+
+    async def _deliver_callbacks(self):
+        while True:
+            due = self.store.due_callbacks(CALLBACK_BATCH_SIZE * 10)
+            if not due:
+                await asyncio.sleep(CALLBACK_FLUSH_INTERVAL_S)
+                continue
+
+            by_url = defaultdict(list)
+            for job in due:
+                by_url[job["callback_url"]].append(job)
+
+            for url, jobs in by_url.items():
+                for start in range(0, len(jobs), CALLBACK_BATCH_SIZE):
+                    batch = jobs[start:start + CALLBACK_BATCH_SIZE]
+                    items = [callback_item(job) for job in batch]
+                    ids = [job["id"] for job in batch]
+                    if await self.client.send_results(items, url):
+                        self.store.mark_callbacks_delivered(ids)
+                    else:
+                        attempts = max(job["callback_attempts"] for job in batch)
+                        self.store.reschedule_callbacks(ids, CALLBACK_FLUSH_INTERVAL_S * 2 ** attempts,
+                                                        CALLBACK_MAX_ATTEMPTS)
+
+
+def callback_item(job: dict) -> dict:
+    """Payload pushed to 1C for one finished job."""
+    return {
+        "job_id": job["id"],
+        "idempotency_key": job["idempotency_key"] or job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "result": json.loads(job["result"]) if job["result"] else None,
+        "error": job["error"],
+    }
+
+
+_store: Optional[JobStore] = None
+_runner: Optional[JobRunner] = None
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore(JOBS_DB_PATH, JOBS_DIR)
+    return _store
+
+
+def get_job_runner() -> Optional[JobRunner]:
+    return _runner
+
+
+async def start_job_runner():
+    global _runner
+    if JOB_WORKERS <= 0:
+        return
+    integration = importlib.import_module("1c_integration.integration")
+    _runner = JobRunner(get_job_store(), JOB_WORKERS, client=integration.OneCClient())
+    await _runner.start()
+
+
+async def stop_job_runner():
+    if _runner is not None:
+        await _runner.stop()
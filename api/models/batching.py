@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+
+from api.config.settings import MICROBATCH_ENABLED, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS
+from api.models.yolo_inference import locate_documents
+from api.monitoring.metrics import stage
+from api.quality.stages import run_in_stage
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-image detection requests and runs them as one
+    batched YOLO forward pass.
+
+    A batch is dispatched as soon as `max_batch_size` requests are waiting or
+    `max_wait_ms` has passed since the first request of the batch arrived.
+    Each awaiting coroutine gets back its own result (or exception).
+    """
+
+    def __init__(self, infer_fn: Callable[[List[np.ndarray]], List[Union[dict, Exception]]],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0, latency_window: int = 1000):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Stats
+        self._batch_sizes = Counter()
+        self._submitted = 0
+        self._max_queue_depth = 0
+        self._queue_waits = deque(maxlen=latency_window)
+        self._inference_times = deque(maxlen=latency_window)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait_ms={self.max_wait * 1000:.1f})")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # Fail whatever is still waiting so no caller hangs forever
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped."))
+        self._task = None
+        logger.info("Micro-batcher stopped.")
+
+    async def submit(self, image: np.ndarray) -> dict:
+        """
+        Queue one image for the next batch and wait for its own result.
+        """
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, time.perf_counter()))
+        self._submitted += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+
+        result = await future
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _collect_batch(self, batch: list):
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = []
+                await self._collect_batch(batch)
+                dispatched_at = time.perf_counter()
+                for _, _, submitted_at in batch:
+                    self._queue_waits.append(dispatched_at - submitted_at)
+                self._batch_sizes[len(batch)] += 1
+
+                try:
+                    with stage("yolo_batch"):
+                        results = await run_in_stage("detect", self.infer_fn, [image for image, _, _ in batch])
+                except Exception as e:
+                    logger.error("Batched inference failed", exc_info=True)
+                    results = [e] * len(batch)
+                self._inference_times.append(time.perf_counter() - dispatched_at)
+
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Micro-batcher stopped."))
+            raise
+
+    def stats(self) -> dict:
+        """
+        Queue-depth, batch-size and latency stats for tuning the batching window.
+        """
+        batches = sum(self._batch_sizes.values())
+        items = sum(size * count for size, count in self._batch_sizes.items())
+        waits = sorted(self._queue_waits)
+        inference = sorted(self._inference_times)
+
+        def percentile(values, q):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "submitted": self._submitted,
+            "batches": batches,
+            "average_batch_size": items / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "queue_wait_ms": {"p50": percentile(waits, 0.5), "p99": percentile(waits, 0.99)},
+            "inference_ms": {"p50": percentile(inference, 0.5), "p99": percentile(inference, 0.99)},
+        }
+
+
+# Process-wide scheduler in front of the YOLO model
+_batcher: Optional[MicroBatcher] = None
+
+
+async def start_batcher():
+    global _batcher
+    if not MICROBATCH_ENABLED:
+        return
+    if _batcher is None:
+        _batcher = MicroBatcher(locate_documents, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS)
+    await _batcher.start()
+
+
+async def stop_batcher():
+    if _batcher is not None:
+        await _batcher.stop()
+
+
+def get_batcher() -> Optional[MicroBatcher]:
+    return _batcher
+
+
+async def locate_document(image: np.ndarray) -> dict:
+    """
+    Locate the document in one image, going through the micro-batcher when it runs.
+    """
+    with stage("detect"):
+        if _batcher is not None and _batcher.running:
+            return await _batcher.submit(image)
+        location = (await run_in_stage("detect", locate_documents, [image]))[0]
+    if isinstance(location, Exception):
+        raise location
+    return location
+
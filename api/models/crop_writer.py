@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from api.config.settings import (
+    CROP_STORE_ENABLED, CROP_STORE_DIR, CROP_STORE_QUEUE_MAX, CROP_JPEG_QUALITY,
+    CROP_RETENTION_MAX_AGE_S, CROP_RETENTION_MAX_BYTES, CROP_RETENTION_MAX_FILES,
+    CROP_RETENTION_INTERVAL_S,
+)
+from retraining.storage_management import RetentionPolicy, enforce_retention
+
+logger = logging.getLogger(__name__)
+
+
+def crop_name(cropped: np.ndarray) -> str:
+    """
+    Content-addressed file name of a crop: identical pixels, same name.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(cropped.shape).encode())
+    digest.update(memoryview(np.ascontiguousarray(cropped)).cast("B"))
+    return f"{digest.hexdigest()}.jpg"
+
+
+class CropWriter:
+    """
+    Persists document crops from a background thread.
+
+    The request path only enqueues the crop; hashing, JPEG encoding and the
+    write happen on the writer thread. The queue is bounded: when it is full
+    the crop is dropped (and counted) rather than slowing requests down.
+    Crops are stored under a hash of their pixels, so a crop seen again is
+    not re-encoded, only its mtime is refreshed for retention. The retention
+    policy is applied every `retention_interval_s`.
+
+    Callers must not modify a crop after submitting it.
+    """
+
+    def __init__(self, directory: str, queue_max: int = 64, jpeg_quality: int = 90,
+                 policy: Optional[RetentionPolicy] = None, retention_interval_s: float = 300):
+        self.directory = directory
+        self.jpeg_quality = jpeg_quality
+        self.policy = policy or RetentionPolicy()
+        self.retention_interval_s = retention_interval_s
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.errors = 0
+        self.evicted = 0
+        self._usage = {"files": 0, "bytes": 0, "oldest_age_s": 0.0}
+        self._last_retention = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._apply_retention()
+        self._thread = threading.Thread(target=self._run, name="crop-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Write what is already queued, then stop the thread."""
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, cropped: np.ndarray) -> bool:
+        """
+        Queue a crop for storage. Returns False when it was dropped.
+        """
+        try:
+            self._queue.put_nowait(cropped)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _run(self):
+        while True:
+            timeout = max(0.0, self._last_retention + self.retention_interval_s - time.monotonic())
+            try:
+                cropped = self._queue.get(timeout=timeout if self.policy.enabled else None)
+            except queue.Empty:
+                self._apply_retention()
+                continue
+            if cropped is None:
+                return
+            try:
+                self._write(cropped)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                logger.warning("Failed to store document crop", exc_info=True)
+
+    def _write(self, cropped: np.ndarray):
+        path = os.path.join(self.directory, crop_name(cropped))
+        if os.path.exists(path):
+            os.utime(path)
+            with self._lock:
+                self.deduplicated += 1
+            return
+
+        ok, buffer = cv2.imencode(".jpg", cropped, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        # Write to a temporary name first, so readers never see a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer.tobytes())
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.written += 1
+            self._usage["files"] += 1
+            self._usage["bytes"] += buffer.nbytes
+
+    def _apply_retention(self):
+        self._last_retention = time.monotonic()
+        try:
+            result = enforce_retention(self.directory, self.policy)
+        except Exception:
+            logger.warning("Failed to apply crop retention", exc_info=True)
+            return
+        with self._lock:
+            self.evicted += result["removed_files"]
+            self._usage = {key: result[key] for key in ("files", "bytes", "oldest_age_s")}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "directory": self.directory,
+                "queue_depth": self._queue.qsize(),
+                "written": self.written,
+                "deduplicated": self.deduplicated,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "evicted": self.evicted,
+                # Disk usage as of the last retention pass plus the files written since
+                "disk_files": self._usage["files"],
+                "disk_bytes": self._usage["bytes"],
+                "oldest_age_s": self._usage["oldest_age_s"],
+                "retention": {
+                    "max_age_s": self.policy.max_age_s,
+                    "max_bytes": self.policy.max_bytes,
+                    "max_files": self.policy.max_files,
+                },
+            }
+
+
+_writer: Optional[CropWriter] = None
+
+
+async def start_crop_writer():
+    global _writer
+    if not CROP_STORE_ENABLED:
+        return
+    if _writer is None:
+        policy = RetentionPolicy(max_age_s=CROP_RETENTION_MAX_AGE_S,
+                                 max_bytes=CROP_RETENTION_MAX_BYTES,
+                                 max_files=CROP_RETENTION_MAX_FILES)
+        _writer = CropWriter(CROP_STORE_DIR, CROP_STORE_QUEUE_MAX, CROP_JPEG_QUALITY,
+                             policy, CROP_RETENTION_INTERVAL_S)
+    # The first retention pass scans the directory; keep it off the event loop
+    await asyncio.to_thread(_writer.start)
+
+
+async def stop_crop_writer():
+    if _writer is not None:
+        await asyncio.to_thread(_writer.stop)
+
+
+def get_crop_writer() -> Optional[CropWriter]:
+    return _writer
+
+
+def store_crop(cropped: np.ndarray) -> bool:
+    """
+    Hand a crop to the background writer. No-op (False) when crop storage is
+    disabled or the writer isn't running (e.g. offline scripts).
+    """
+    if _writer is None or not _writer.running:
+        return False
+    return _writer.submit(cropped)
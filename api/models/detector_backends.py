@@ -0,0 +1,150 @@
+import ast
+import logging
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+import torch
+
+from api.config.settings import (
+    DETECTOR_BACKEND, DETECTOR_WEIGHTS_PATH, ONNX_MODEL_PATH, ONNX_PROVIDERS,
+    ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, DETECTOR_CONF_THRESHOLD, DETECTOR_IOU_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def to_tensor(batch: np.ndarray) -> torch.Tensor:
+    """NxHxWx3 uint8 letterboxed batch -> Nx3xHxW float tensor in [0, 1]."""
+    return torch.from_numpy(batch).permute(0, 3, 1, 2).float().div(255.0).to(device)
+
+
+class TorchDetector:
+    """
+    Ultralytics PyTorch model (default backend).
+    """
+    name = "torch"
+
+    def __init__(self, weights_path: str = DETECTOR_WEIGHTS_PATH):
+        from ultralytics import YOLO
+
+        self.model = YOLO(weights_path).to(device)
+        self.model.fuse()  # (optional) for faster inference if supported
+        self.names: Dict[int, str] = self.model.names
+
+    def predict(self, batch: np.ndarray) -> List[np.ndarray]:
+        """
+        Args:
+            - batch: NxHxWx3 uint8 letterboxed images
+
+        Returns:
+            One Kx6 array per image ([x1, y1, x2, y2, conf, cls] in letterbox
+            coordinates), sorted by descending confidence.
+        """
+        results = self.model(to_tensor(batch), conf=DETECTOR_CONF_THRESHOLD,
+                             iou=DETECTOR_IOU_THRESHOLD, verbose=False)
+        return [
+            r.boxes.data.cpu().numpy() if r.boxes is not None else np.zeros((0, 6), np.float32)
+            for r in results
+        ]
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy NMS; returns kept indices in descending score order."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess_yolov8(output: np.ndarray, conf_threshold: float, iou_threshold: float,
+                       max_det: int = 300) -> List[np.ndarray]:
+    """
+    Decode raw YOLOv8 ONNX output (N x (4 + num_classes) x anchors, boxes as
+    cx, cy, w, h) into per-image Kx6 detections, with per-class NMS as in
+    Ultralytics.
+    """
+    detections = []
+    for pred in output.transpose(0, 2, 1):
+        class_scores = pred[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+        mask = conf > conf_threshold
+        if not mask.any():
+            detections.append(np.zeros((0, 6), np.float32))
+            continue
+        cx, cy, w, h = pred[mask, :4].T
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        conf, cls = conf[mask], cls[mask]
+        # Offset boxes per class so NMS never suppresses across classes
+        keep = _nms(boxes + cls[:, None] * 7680.0, conf, iou_threshold)[:max_det]
+        detections.append(np.concatenate(
+            [boxes[keep], conf[keep, None], cls[keep, None].astype(np.float32)], axis=1
+        ).astype(np.float32))
+    return detections
+
+
+class OnnxDetector:
+    """
+    YOLOv8 exported to ONNX (optionally INT8-quantized), run with ONNX Runtime.
+    Execution providers come from ONNX_PROVIDERS, e.g. "OpenVINOExecutionProvider,CPUExecutionProvider".
+    """
+    name = "onnx"
+
+    def __init__(self, onnx_path: str = ONNX_MODEL_PATH, providers: Sequence[str] = ONNX_PROVIDERS,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS, inter_op_threads: int = ONNX_INTER_OP_THREADS):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"ONNX model not found at: {onnx_path} (run model/utils/export_onnx.py)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            options.inter_op_num_threads = inter_op_threads
+
+        available = ort.get_available_providers()
+        providers = [p for p in providers if p in available] or ["CPUExecutionProvider"]
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Ultralytics stores the class names in the model metadata
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        logger.info(f"ONNX detector loaded from {onnx_path} with providers {self.session.get_providers()}")
+
+    def predict(self, batch: np.ndarray) -> List[np.ndarray]:
+        """Same contract as `TorchDetector.predict`."""
+        inputs = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+        output = self.session.run(None, {self.input_name: inputs})[0]
+        return postprocess_yolov8(output, DETECTOR_CONF_THRESHOLD, DETECTOR_IOU_THRESHOLD)
+
+
+def load_detector(backend: str = DETECTOR_BACKEND):
+    """
+    Load the configured detector backend, falling back to PyTorch when the
+    ONNX backend cannot be loaded.
+    """
+    if backend == "onnx":
+        try:
+            return OnnxDetector()
+        except Exception:
+            logger.error("Failed to load ONNX detector, falling back to PyTorch.", exc_info=True)
+    elif backend != "torch":
+        logger.warning(f"Unknown detector backend '{backend}', using PyTorch.")
+    return TorchDetector()
@@ -1,17 +1,23 @@
 import cv2
 import torch
-import numpy as np 
+import numpy as np
+from typing import List, Tuple
 
-# DEVICE 
+# DEVICE
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 
 # PREPROCESSING FUNCTION
 
-def preprocess_image(image: np.ndarray, target_size: int = 640):
+def letterbox(image: np.ndarray, target_size: int = 640) -> Tuple[np.ndarray, float, int, int]:
     """
-    Resize + pad image while keeping track of scaling and padding,
-    so we can map predictions back to original image coordinates.
+    Resize + pad image to a square canvas of `target_size` pixels.
+
+    Returns:
+        - Padded image (HxWxC, uint8)
+        - Scale applied to the original image
+        - Left padding
+        - Top padding
     """
     h, w = image.shape[:2]
     scale = target_size / max(h, w)
@@ -26,6 +32,35 @@ def preprocess_image(image: np.ndarray, target_size: int = 640):
 
     padded = cv2.copyMakeBorder(resized, top, bottom, left, right,
                                 borderType=cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, scale, left, top
+
+
+def preprocess_image(image: np.ndarray, target_size: int = 640):
+    """
+    Resize + pad image while keeping track of scaling and padding,
+    so we can map predictions back to original image coordinates.
+    """
+    padded, scale, left, top = letterbox(image, target_size)
 
     tensor = torch.from_numpy(padded).permute(2, 0, 1).float().div(255.0).unsqueeze(0)
-    return tensor.to(device), scale, left, top
\ No newline at end of file
+    return tensor.to(device), scale, left, top
+
+
+def letterbox_batch(images: List[np.ndarray], target_size: int = 640) -> Tuple[np.ndarray, List[Tuple[float, int, int]]]:
+    """
+    Letterbox several images into a single NxHxWx3 uint8 array.
+
+    Each image keeps its own scale and padding so predictions can be mapped
+    back to the coordinates of the image they came from.
+
+    Returns:
+        - Batched array
+        - List of (scale, pad_left, pad_top) tuples, one per input image
+    """
+    batch = np.empty((len(images), target_size, target_size, 3), dtype=np.uint8)
+    letterbox_params = []
+    for i, image in enumerate(images):
+        batch[i], scale, left, top = letterbox(image, target_size)
+        letterbox_params.append((scale, left, top))
+    return batch, letterbox_params
+
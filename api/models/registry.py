@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    """Resident set size of the current process (0 if it cannot be read)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]], eager: bool):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.eager = eager
+        self.instance = None
+        self.warmed_up = False
+        self.lock = Lock()
+        self.load_time_s: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.instance is not None,
+            "warmed_up": self.warmed_up,
+            "eager": self.eager,
+            "load_time_s": self.load_time_s,
+            "memory_mb": self.memory_bytes / (1024 * 1024) if self.memory_bytes is not None else None,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Loads every model exactly once per process, either at lifespan startup
+    (`load_all`) or lazily on first `get`, and runs its warm-up inference.
+
+    A failed load is recorded and retried on the next `get`/`load_all`
+    instead of being cached, so a transient startup failure isn't fatal.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 warmup: Optional[Callable[[Any], None]] = None, eager: bool = True):
+        """
+        Args:
+            - name: Key used by `get`
+            - loader: Creates the model instance
+            - warmup: Optional dummy inference run once after loading
+            - eager: Whether `load_all` (lifespan startup) loads it and readiness waits for it
+        """
+        if name not in self._entries:
+            self._entries[name] = _ModelEntry(name, loader, warmup, eager)
+
+    def get(self, name: str, warmup: bool = True) -> Any:
+        entry = self._entries[name]
+        if entry.instance is not None and (entry.warmed_up or not warmup):
+            return entry.instance
+        with entry.lock:
+            if entry.instance is None:
+                self._load(entry, warmup)
+            elif warmup and not entry.warmed_up:
+                self._warmup(entry)
+        return entry.instance
+
+    def _warmup(self, entry: _ModelEntry):
+        if entry.warmup is not None:
+            entry.warmup(entry.instance)
+        entry.warmed_up = True
+
+    def _load(self, entry: _ModelEntry, warmup: bool):
+        logger.info(f"Loading model '{entry.name}'...")
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            instance = entry.loader()
+            if warmup and entry.warmup is not None:
+                entry.warmup(instance)
+        except Exception as e:
+            entry.error = f"{type(e).__name__}: {e}"
+            logger.error(f"Failed to load model '{entry.name}'", exc_info=True)
+            raise
+        entry.load_time_s = time.perf_counter() - start
+        entry.memory_bytes = max(0, _rss_bytes() - rss_before)
+        entry.error = None
+        entry.warmed_up = warmup
+        entry.instance = instance
+        logger.info(f"Model '{entry.name}' loaded in {entry.load_time_s:.2f}s "
+                    f"(+{entry.memory_bytes / (1024 * 1024):.1f} MB RSS)")
+
+    def load_all(self, warmup: bool = True) -> bool:
+        """
+        Load every eager model; returns True when all of them are loaded.
+
+        `warmup=False` only loads the weights. This is used before forking
+        workers, because inference in the parent would start thread pools
+        that don't survive a fork. Warm-up then runs in each worker.
+        """
+        for entry in self._entries.values():
+            if entry.eager:
+                try:
+                    self.get(entry.name, warmup=warmup)
+                except Exception:
+                    pass
+        return self.ready()
+
+    def instances(self) -> Dict[str, Any]:
+        return {name: e.instance for name, e in self._entries.items() if e.instance is not None}
+
+    def ready(self) -> bool:
+        return all(e.instance is not None for e in self._entries.values() if e.eager)
+
+    def status(self) -> dict:
+        return {name: entry.status() for name, entry in self._entries.items()}
+
+
+registry = ModelRegistry()
@@ -1,12 +1,14 @@
 import os
 import uuid
 import logging
-from fastapi import UploadFile
-from ultralytics import YOLO
-from threading import Lock
+from fastapi import UploadFile, HTTPException
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from io import BytesIO
+from api.models.registry import registry
+from fastapi.responses import JSONResponse
+from api.config.settings import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, UPLOAD_MULTIPART_OVERHEAD_BYTES, MAX_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -21,22 +23,12 @@ async def save_upload_file(file: UploadFile, destination: str) -> str:
         buffer.write(content)
     return destination
 
-# Singleton YOLO loader
-_model = None
-_lock = Lock()
-base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-model_path = os.path.join(base_dir, "model", "weights", "yolov8.pt")
-
-# Lifespan event handler for FastAPI
+# Lifespan event handler for FastAPI: load every registered model once, with warm-up
 @asynccontextmanager
-async def preload_yolo_model(app: FastAPI):
-    global _model
-    with _lock:
-        if _model is None:
-            if not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found at: {model_path}")
-            print("Loading YOLO model...")
-            _model = YOLO(model_path)  # Load YOLO model here
+async def preload_models(app: FastAPI):
+    if not await asyncio.to_thread(registry.load_all):
+        # Not fatal: readiness stays false and models are retried on first use
+        logger.error(f"Some models failed to load at startup: {registry.status()}")
     try:
         yield
     finally:
@@ -44,9 +36,7 @@ async def preload_yolo_model(app: FastAPI):
         pass
 
 def get_yolo_model():
-    if _model is None:
-        raise RuntimeError("Model not loaded. Make sure to call preload_yolo_model() at startup.")
-    return _model
+    return registry.get("detector")
 
 
 async def save_upload_file(file: UploadFile, destination: str = None) -> BytesIO:
@@ -60,3 +50,76 @@ async def save_upload_file(file: UploadFile, destination: str = None) -> BytesIO
             buffer.write(content)
 
     return file_like_object  # Returning in-memory object instead of a file path
+
+
+
+async def read_upload_limited(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES,
+                              chunk_size: int = UPLOAD_CHUNK_SIZE) -> bytes:
+    """
+    Read an upload chunk by chunk, rejecting it with 413 as soon as it
+    exceeds `max_bytes`, and join the chunks once.
+
+    The returned bytes are used as-is by the decoders (np.frombuffer,
+    hashlib) and shared, not copied, by BytesIO (image_size), so the upload
+    is never copied again.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes.")
+
+    chunks, size = [], 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes.")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def request_body_limit(path: str) -> int:
+    """Largest request body accepted on `path`: one upload, or a full batch of them."""
+    per_file = MAX_UPLOAD_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES
+    return per_file * MAX_BATCH_SIZE if path.rstrip("/").endswith("/batch") else per_file
+
+
+class UploadLimitMiddleware:
+    """
+    Enforce the upload limit on the raw request body, before FastAPI parses
+    it: Starlette spools a whole multipart body to a temporary file before
+    the handler (and read_upload_limited) runs.
+
+    A Content-Length above the limit is answered with 413 without reading the
+    body; bodies without one (chunked) are counted as they arrive and the
+    parsing is aborted with 413 once they exceed it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = request_body_limit(scope["path"])
+        detail = f"Request body exceeds {limit} bytes."
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing and turned into the 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
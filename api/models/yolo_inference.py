@@ -1,17 +1,24 @@
-import os
-from uuid import uuid4
+from typing import List, Union
 
-import cv2
 import numpy as np
 import torch
 import torchvision.ops as ops
-from ultralytics import YOLO
-from api.models.preprocess import preprocess_image
+from api.models.preprocess import letterbox_batch
+from api.models.detector_backends import load_detector
+from api.models.registry import registry
+from api.models.crop_writer import store_crop
 
-# DEVICE & MODEL LOADING
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = YOLO("./model/weights/yolov8.pt").to(device)
-model.fuse()  # (optional) for faster inference if supported
+# MODEL LOADING (backend picked by DETECTOR_BACKEND, PyTorch by default).
+# The registry loads it once, at lifespan startup or on first use.
+
+def _warmup_detector(detector):
+    detector.predict(np.zeros((1, 640, 640, 3), dtype=np.uint8))
+
+registry.register("detector", load_detector, warmup=_warmup_detector)
+
+
+def get_detector():
+    return registry.get("detector")
 
 # PATCH torchvision.ops.nms FOR CUDA → CPU FALLBACK
 
@@ -28,30 +35,22 @@ ops.nms = nms_with_fallback
 
 # MAIN DETECTION & CROP FUNCTION
 
-SAVE_DIR = "api/static/cropped_docs"
-os.makedirs(SAVE_DIR, exist_ok=True)
 
-def detect_and_crop_document(image: np.ndarray, debug: bool = False) -> dict:
+
+def _locate_from_detections(detections: np.ndarray, image: np.ndarray, scale: float, pad_left: int, pad_top: int) -> dict:
     """
-    Run YOLO inference, correct bounding box, crop, save, and return metadata.
+    Take the highest-confidence box of a single image's detections and map it
+    back to the coordinates of `image` using its letterbox scale and padding.
     """
-    tensor_image, scale, pad_left, pad_top = preprocess_image(image)
-    if debug:
-        print(f"[DEBUG] Input tensor shape: {tensor_image.shape}, device: {tensor_image.device}")
-
-    # Inference
-    results = model(tensor_image)[0]
-
     # No detections?
-    if results.boxes is None or len(results.boxes) == 0:
+    if detections is None or len(detections) == 0:
         raise ValueError("No document detected.")
 
     # Highest-confidence box
-    best = results.boxes[0]
-    x1, y1, x2, y2 = best.xyxy[0].cpu().numpy()
-    conf = float(best.conf[0].cpu().item())
-    cls_id = int(best.cls[0].cpu().item())
-    doc_type = model.names.get(cls_id, str(cls_id))
+    x1, y1, x2, y2, conf, cls_id = detections[0]
+    conf = float(conf)
+    cls_id = int(cls_id)
+    doc_type = get_detector().names.get(cls_id, str(cls_id))
 
     # Adjust box coordinates back to original image space
     x1 = (x1 - pad_left) / scale
@@ -63,25 +62,63 @@ def detect_and_crop_document(image: np.ndarray, debug: bool = False) -> dict:
     x1, y1 = max(0, int(round(x1))), max(0, int(round(y1)))
     x2, y2 = min(w, int(round(x2))), min(h, int(round(y2)))
 
-    if debug:
-        print(f"[DEBUG] Detected '{doc_type}' with confidence {conf:.2f}")
-        print(f"[DEBUG] Box on original image: ({x1}, {y1}), ({x2}, {y2})")
+    return {
+        "doc_type": doc_type,
+        "confidence": conf,
+        "box": (x1, y1, x2, y2),
+    }
 
-    # Crop original image
-    cropped = image[y1:y2, x1:x2]
 
-    # Save crop
-    filename = f"{uuid4().hex}.jpg"
-    save_path = os.path.join(SAVE_DIR, filename)
-    cv2.imwrite(save_path, cropped)
+def locate_documents(images: List[np.ndarray]) -> List[Union[dict, Exception]]:
+    """
+    Letterbox all images into one batch and run a single YOLO forward pass.
+
+    Returns one entry per input image, in input order: either a location dict
+    (doc_type, confidence, box in original image coordinates) or the
+    exception raised while handling that image.
+    """
+    if not images:
+        return []
+
+    batch, letterbox_params = letterbox_batch(images)
+    results = get_detector().predict(batch)
+
+    locations = []
+    for image, detections, (scale, pad_left, pad_top) in zip(images, results, letterbox_params):
+        try:
+            locations.append(_locate_from_detections(detections, image, scale, pad_left, pad_top))
+        except Exception as e:
+            locations.append(e)
+    return locations
+
+
+def build_detection_result(location: dict, cropped: np.ndarray, debug: bool = False) -> dict:
+    """
+    Queue an already cropped document for storage (background crop writer)
+    and return the detection metadata.
+    """
+    stored = store_crop(cropped)
 
     if debug:
-        print(f"[DEBUG] Cropped image saved at: {save_path}")
+        print(f"[DEBUG] Cropped image {'queued for storage' if stored else 'not stored'}")
 
     return {
-        "doc_type": doc_type,
+        "doc_type": location["doc_type"],
         "cropped_asnumpy" : cropped,
-        "confidence": conf,
-        "cropped_path": save_path
+        "confidence": location["confidence"],
+    }
+
+
+def crop_document(image: np.ndarray, location: dict, debug: bool = False) -> dict:
+    """
+    Crop the located document out of the original image, save it and return metadata.
+    """
+    x1, y1, x2, y2 = location["box"]
+    if debug:
+        print(f"[DEBUG] Detected '{location['doc_type']}' with confidence {location['confidence']:.2f}")
+        print(f"[DEBUG] Box on original image: ({x1}, {y1}), ({x2}, {y2})")
+
+    # Crop original image
+    cropped = image[y1:y2, x1:x2]
+    return build_detection_result(location, cropped, debug=debug)
 
-    }
\ No newline at end of file
@@ -0,0 +1,155 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds (covers fast CPU stages up to long OCR runs)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus exposition format.
+    Observing is a bisect plus two additions under a lock.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+_metrics: List = []
+# Callables returning [(name, documentation, value), ...] for values read at scrape
+# time; a 4th element "counter" marks a monotonic total (name ending in _total)
+_gauge_collectors: List[Callable[[], List[tuple]]] = []
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_gauges(collector: Callable[[], List[tuple]]):
+    _gauge_collectors.append(collector)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _gauge_collectors:
+        try:
+            gauges = collector()
+        except Exception:
+            continue
+        for name, documentation, value, *kind in gauges:
+            kind = kind[0] if kind else "gauge"
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {value}"])
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(Histogram(
+    "dq_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",)))
+STAGE_ERRORS = register(Counter(
+    "dq_stage_errors_total", "Pipeline stages that raised an exception.", ("stage",)))
+REQUEST_SECONDS = register(Histogram(
+    "dq_request_duration_seconds", "End-to-end HTTP request latency.", ("path", "status")))
+
+# Per-request stage timings, collected for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a pipeline stage: recorded in the stage histogram and, inside an
+    HTTP request, added to that request's Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_stage(name: str, elapsed: float):
+    """Record `elapsed` seconds for a stage timed elsewhere (e.g. a queue wait)."""
+    STAGE_SECONDS.observe(elapsed, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
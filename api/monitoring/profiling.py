@@ -0,0 +1,116 @@
+import asyncio
+import cProfile
+import logging
+import os
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from threading import Lock
+from typing import Optional
+from uuid import uuid4
+
+from api.config.settings import PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_DIR, PROFILE_ALLOW_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Only one request is profiled at a time: both profilers are process-wide
+_busy = Lock()
+
+# Requests currently being handled (see `track_request`) and the running session
+_in_flight = 0
+_current: Optional["_Session"] = None
+
+
+class _Session:
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.profile_id = uuid4().hex[:12]
+        # Most requests in flight at once while profiling (1: this one only)
+        self.max_in_flight = _in_flight
+        self._profiler = None
+        if mode == "tracemalloc":
+            tracemalloc.start(25)
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    async def finish(self, path: str) -> str:
+        """
+        Stop profiling and write the report from a thread (the snapshot and
+        the stats dump are slow); returns its file path.
+        """
+        global _current
+        _current = None
+        if self._profiler is not None:
+            # Must be stopped on the thread that started it
+            self._profiler.disable()
+        if self.max_in_flight > 1:
+            logger.warning(f"Profile {self.profile_id} also covers other requests "
+                           f"({self.max_in_flight} were in flight at once).")
+        return await asyncio.to_thread(self._write, path)
+
+    def _write(self, path: str) -> str:
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{int(time.time())}_{path.strip('/').replace('/', '_') or 'root'}_{self.profile_id}"
+            if self.mode == "tracemalloc":
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                out = os.path.join(PROFILE_DIR, f"{name}.txt")
+                with open(out, "w") as f:
+                    f.write(f"peak traced memory: {peak / (1024 * 1024):.2f} MB\n")
+                    for stat in snapshot.statistics("lineno")[:30]:
+                        f.write(f"{stat}\n")
+            else:
+                out = os.path.join(PROFILE_DIR, f"{name}.prof")
+                self._profiler.dump_stats(out)
+            logger.info(f"Request profile written to {out}")
+            return out
+        finally:
+            _busy.release()
+
+
+@contextmanager
+def track_request():
+    """Count the request as in flight while the block runs."""
+    global _in_flight
+    _in_flight += 1
+    session = _current
+    if session is not None:
+        session.max_in_flight = max(session.max_in_flight, _in_flight)
+    try:
+        yield
+    finally:
+        _in_flight -= 1
+
+
+def maybe_start_profiling(headers) -> Optional[_Session]:
+    """
+    Start profiling this request when it is sampled (PROFILE_SAMPLE_RATE) or
+    explicitly asked for with an `X-Profile: cprofile|tracemalloc` header
+    (if PROFILE_ALLOW_HEADER). Returns None when the request isn't profiled.
+
+    Both profilers are loop-wide, not per request: cProfile records every
+    coroutine on the event-loop thread and tracemalloc every allocation in
+    the process. Sampled profiles therefore only start while this is the
+    only request in flight (inside `track_request`); a report that still
+    overlapped other requests is logged as such. Work in executor threads
+    and worker processes shows up as time spent waiting.
+    """
+    requested = headers.get("x-profile") if PROFILE_ALLOW_HEADER else None
+    if not requested and (PROFILE_SAMPLE_RATE <= 0 or _in_flight > 1
+                          or random.random() >= PROFILE_SAMPLE_RATE):
+        return None
+    if not _busy.acquire(blocking=False):
+        return None
+    mode = requested if requested in ("cprofile", "tracemalloc") else PROFILE_MODE
+    global _current
+    try:
+        _current = _Session(mode)
+        return _current
+    except Exception:
+        _busy.release()
+        logger.warning("Failed to start request profiling", exc_info=True)
+        return None
@@ -0,0 +1,168 @@
+import cv2
+import numpy as np
+from typing import Optional
+
+from api.config.settings import METRICS_MAX_SIDE
+
+# Fraction of the page a black component must cover to count as a "large" region
+LARGE_REGION_FRACTION = 0.01
+
+# Laplacian-like kernel used by Immerkær's fast noise variance estimator
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+
+def pyramid_level(gray: np.ndarray, max_side: Optional[int] = METRICS_MAX_SIDE) -> np.ndarray:
+    """
+    Halve the image with `cv2.pyrDown` until its longest side is at most
+    `max_side` pixels. `max_side` of None/0 keeps the full resolution.
+    """
+    if not max_side:
+        return gray
+    level = gray
+    while max(level.shape[:2]) > max_side:
+        level = cv2.pyrDown(level)
+    return level
+
+
+def black_ratios(binary_img: np.ndarray):
+    """
+    Global and large-region black ratios (in %) of a binary image, with the
+    component areas summed in NumPy instead of a Python loop.
+    """
+    total_pixels = binary_img.size
+    black_pixels = total_pixels - cv2.countNonZero(binary_img)
+    global_black_ratio = (black_pixels / total_pixels) * 100
+
+    inverted = cv2.bitwise_not(binary_img)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(inverted, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    large_area = int(areas[areas > total_pixels * LARGE_REGION_FRACTION].sum())
+    large_black_ratio = (large_area / total_pixels) * 100
+
+    return global_black_ratio, large_black_ratio
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """
+    Variance of the Laplacian (sharpness). An 8-bit image's Laplacian fits in
+    int16, which is several times faster than the usual CV_64F result.
+    """
+    depth = cv2.CV_16S if gray.dtype == np.uint8 else cv2.CV_64F
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, depth))
+    return float(std[0, 0] ** 2)
+
+
+def otsu_threshold(gray: np.ndarray) -> float:
+    """
+    Otsu threshold of a grey image, computed from its 256-bin histogram.
+    """
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total, total_mean = weight[-1], mean[-1]
+    background = weight[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    if not valid.any():
+        return 0.0
+    between = np.zeros_like(background)
+    between[valid] = (total_mean * background[valid] - total * mean[:-1][valid]) ** 2 / (
+        background[valid] * foreground[valid])
+    return float(np.argmax(between))
+
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """
+    Standard deviation of additive noise (Immerkær, 1996), in grey levels.
+    """
+    h, w = gray.shape[:2]
+    if h < 3 or w < 3:
+        return 0.0
+    response = cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL)[1:-1, 1:-1]
+    return float(np.sqrt(np.pi / 2) * np.abs(response).sum() / (6 * (w - 2) * (h - 2)))
+
+
+def estimate_skew(binary_img: np.ndarray) -> float:
+    """
+    Dominant skew angle in degrees (-45..45) of the black (text) pixels,
+    from the minimum-area rectangle around them.
+    """
+    coords = cv2.findNonZero(cv2.bitwise_not(binary_img))
+    if coords is None or len(coords) < 10:
+        return 0.0
+    angle = cv2.minAreaRect(coords)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    return float(angle)
+
+
+def compute_image_metrics(image: np.ndarray, max_side: Optional[int] = METRICS_MAX_SIDE,
+                          ratios: bool = True) -> dict:
+    """
+    Compute all cheap quality metrics in one pass over a single downscaled
+    pyramid level of the cropped document. Sharpness is the exception: it is
+    measured on the crop itself, the resolution EARLY_EXIT_MIN_SHARPNESS was
+    tuned on (Laplacian variance drops with every pyramid level).
+
+    The level is binarized with the Otsu threshold of the full-resolution
+    histogram: the threshold of the (smoothed) level itself shifts by several
+    grey levels and skews the black ratios by a few percentage points.
+
+    Args:
+        - image: Cropped document (BGR or grayscale)
+        - max_side: Longest side of the pyramid level (None/0: full resolution)
+        - ratios: Also compute the black ratios; the "full" metrics engine
+          takes them from the OCR binarization instead
+
+    Returns a dict with:
+        - global_black_ratio, large_black_ratio (%), or None when `ratios` is off
+        - sharpness: variance of the Laplacian of the full-resolution crop
+        - contrast: RMS contrast (grey-level standard deviation)
+        - noise: estimated noise standard deviation
+        - skew_angle: estimated skew in degrees
+        - level_shape: (height, width) of the pyramid level used
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    level = pyramid_level(gray, max_side)
+
+    threshold = otsu_threshold(gray)
+    blurred = cv2.GaussianBlur(level, (3, 3), 0)
+    _, binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+    global_black_ratio, large_black_ratio = black_ratios(binary) if ratios else (None, None)
+
+    return {
+        "global_black_ratio": global_black_ratio,
+        "large_black_ratio": large_black_ratio,
+        "sharpness": laplacian_variance(gray),
+        "contrast": float(level.std()),
+        "noise": estimate_noise(level),
+        "skew_angle": estimate_skew(binary),
+        "level_shape": level.shape[:2],
+    }
+
+
+def accuracy_report(image: np.ndarray, max_side: Optional[int] = METRICS_MAX_SIDE) -> dict:
+    """
+    Compare the pyramid black ratios with the full-resolution numbers from
+    `assess_binarization_quality` (2x-upscaled binary image) for one crop.
+    The errors must stay within the tolerance checked in
+    tests/test_model/test_validation.py.
+    """
+    from api.quality.ocr_quality import preprocess_image, assess_binarization_quality
+
+    _, binary_img = preprocess_image(image, save=False)
+    full_global, full_large = assess_binarization_quality(binary_img)
+    fast = compute_image_metrics(image, max_side)
+    return {
+        "full": {"global_black_ratio": full_global, "large_black_ratio": full_large},
+        "pyramid": {"global_black_ratio": fast["global_black_ratio"],
+                    "large_black_ratio": fast["large_black_ratio"]},
+        "abs_error": {
+            "global_black_ratio": abs(fast["global_black_ratio"] - full_global),
+            "large_black_ratio": abs(fast["large_black_ratio"] - full_large),
+        },
+        "level_shape": fast["level_shape"],
+    }
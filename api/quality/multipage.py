@@ -0,0 +1,315 @@
+import asyncio
+import logging
+import threading
+from collections import Counter
+from io import BytesIO
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from api.config.settings import PDF_RENDER_DPI, PAGE_CONCURRENCY, MAX_PAGES, OCR_MODE
+from api.models.batching import locate_document
+from api.models.yolo_inference import crop_document
+from api.quality.pipeline import assess_detected_document, decode_image, image_size
+from api.quality.scoring import categorize_score
+from api.quality.stages import run_in_stage, get_memory_budget, estimate_request_bytes
+from api.schemas.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+_PDF_MAGIC = b"%PDF"
+_TIFF_MAGIC = (b"II*\x00", b"MM\x00*")
+
+# pdfium is not thread-safe: every call into it, from any document and any
+# stage thread, goes through this lock
+_pdfium_lock = threading.Lock()
+
+
+def detect_format(content: bytes) -> str:
+    """'pdf', 'tiff' or 'image', from the leading magic bytes."""
+    head = bytes(content[:4])
+    if head == _PDF_MAGIC:
+        return "pdf"
+    if head in _TIFF_MAGIC:
+        return "tiff"
+    return "image"
+
+
+def _iter_pdf_pages(content: bytes, dpi: int) -> Iterator[np.ndarray]:
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise ValueError("PDF input requires the 'pypdfium2' package.")
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(bytes(content))
+    try:
+        with _pdfium_lock:
+            n_pages = len(pdf)
+        for index in range(n_pages):
+            # Held per page only, so documents rasterize their pages in turn
+            with _pdfium_lock:
+                page = pdf[index]
+                try:
+                    pil_image = page.render(scale=dpi / 72).to_pil().convert("RGB")
+                finally:
+                    page.close()
+            yield cv2.cvtColor(np.asarray(pil_image), cv2.COLOR_RGB2BGR)
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+
+def _iter_tiff_pages(content: bytes) -> Iterator[np.ndarray]:
+    from PIL import Image, ImageSequence
+
+    with Image.open(BytesIO(content)) as im:
+        for frame in ImageSequence.Iterator(im):
+            yield cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def iter_pages(content: bytes, dpi: int = PDF_RENDER_DPI) -> Iterator[np.ndarray]:
+    """
+    Lazily rasterize the pages of a PDF, multi-page TIFF or single image as
+    BGR arrays; only the page being produced is held in memory.
+    """
+    fmt = detect_format(content)
+    if fmt == "pdf":
+        yield from _iter_pdf_pages(content, dpi)
+    elif fmt == "tiff":
+        yield from _iter_tiff_pages(content)
+    else:
+        yield decode_image(content)
+
+
+def count_pages(content: bytes) -> int:
+    """Number of pages of the document, without rasterizing any."""
+    fmt = detect_format(content)
+    if fmt == "pdf":
+        import pypdfium2 as pdfium
+
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(bytes(content))
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+    if fmt == "tiff":
+        from PIL import Image
+
+        with Image.open(BytesIO(content)) as im:
+            return getattr(im, "n_frames", 1)
+    return 1
+
+
+def page_sizes(content: bytes, dpi: int = PDF_RENDER_DPI,
+               max_pages: int = MAX_PAGES) -> List[Optional[Tuple[int, int]]]:
+    """
+    (width, height) of each page as `iter_pages` will rasterize it, read from
+    the document structure without rendering anything. None for a page (or
+    image) whose size can't be read.
+    """
+    fmt = detect_format(content)
+    if fmt == "pdf":
+        import pypdfium2 as pdfium
+
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(bytes(content))
+            try:
+                sizes = []
+                for index in range(min(len(pdf), max_pages)):
+                    width, height = pdf.get_page_size(index)
+                    sizes.append((int(width * dpi / 72), int(height * dpi / 72)))
+                return sizes
+            finally:
+                pdf.close()
+    if fmt == "tiff":
+        from PIL import Image, ImageSequence
+
+        with Image.open(BytesIO(content)) as im:
+            sizes = []
+            for frame in ImageSequence.Iterator(im):
+                if len(sizes) >= max_pages:
+                    break
+                sizes.append(frame.size)
+            return sizes
+    return [image_size(content)]
+
+
+def estimate_document_bytes(content: bytes, concurrency: int = PAGE_CONCURRENCY,
+                            max_pages: int = MAX_PAGES) -> int:
+    """
+    Rough peak memory of assessing a document: the upload plus the largest
+    `concurrency` pages in flight at once (see `estimate_request_bytes`).
+    """
+    try:
+        sizes = page_sizes(content, max_pages=max_pages)
+    except Exception:
+        sizes = [None] * concurrency
+    per_page = sorted((estimate_request_bytes(size) for size in sizes), reverse=True)
+    return len(content) + sum(per_page[:concurrency])
+
+
+async def assess_page(page: np.ndarray, mode: str = "full", ocr_mode: str = OCR_MODE):
+    """
+    detect -> binarize -> OCR -> score for one rasterized page.
+    """
+    location = await locate_document(page)
+    detection_result = crop_document(page, location)
+    return await assess_detected_document(detection_result, mode=mode, ocr_mode=ocr_mode)
+
+
+def aggregate_pages(scores: List[float], failed: int) -> dict:
+    """
+    Document-level summary of the per-page global scores.
+    """
+    if not scores:
+        return {"pages_assessed": 0, "pages_failed": failed, "global_score": None,
+                "min_score": None, "quality_category": None, "category_counts": {}}
+    mean_score = float(np.mean(scores))
+    return {
+        "pages_assessed": len(scores),
+        "pages_failed": failed,
+        "global_score": mean_score,
+        "min_score": float(min(scores)),
+        "quality_category": categorize_score(mean_score),
+        "category_counts": dict(Counter(categorize_score(s) for s in scores)),
+    }
+
+
+def _ndjson(record: dict) -> bytes:
+    return dumps(record) + b"\n"
+
+
+async def stream_document_assessment(content: bytes, mode: str = "full", ocr_mode: str = OCR_MODE,
+                                     concurrency: int = PAGE_CONCURRENCY,
+                                     max_pages: int = MAX_PAGES,
+                                     fields: Optional[Set[str]] = None) -> AsyncIterator[bytes]:
+    """
+    Assess the pages of a document in parallel and yield one NDJSON line per
+    page as soon as it finishes (in completion order, tagged with its page
+    index), followed by a document-level aggregate line.
+
+    At most `concurrency` pages are rasterized or being processed at any
+    time, so peak memory does not depend on the page count.
+
+    Only the first `max_pages` pages are assessed; the aggregate line reports
+    `total_pages` and `truncated: true` when the document had more.
+
+    `fields` restricts the page results to those fields (None keeps all).
+    """
+    pages = iter_pages(content)
+    exhausted = False
+    # Stopped before the last page: page limit reached or a page failed to rasterize
+    stopped_early = False
+    next_index = 0
+    pending = set()
+    # Rasterization running on the decode stage; the page iterator can't be
+    # closed while a thread is still inside it
+    rasterizing: Optional[asyncio.Future] = None
+    scores, failed = [], 0
+
+    async def run(index: int, page: np.ndarray) -> dict:
+        try:
+            result = await assess_page(page, mode, ocr_mode)
+            scores.append(result.global_score)
+            return {"type": "page", "page": index,
+                    "result": result.model_dump(include=fields, exclude_none=fields is not None)}
+        except Exception as e:
+            logger.warning(f"Page {index} assessment failed: {e}")
+            detail = getattr(e, "detail", None) or str(e)
+            return {"type": "page", "page": index, "error": str(detail)}
+
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                if next_index >= max_pages:
+                    exhausted = stopped_early = True
+                    break
+                rasterizing = asyncio.ensure_future(run_in_stage("decode", next, pages, None))
+                try:
+                    # Shielded: a cancelled stream waits for the page in `finally`
+                    page: Optional[np.ndarray] = await asyncio.shield(rasterizing)
+                except Exception as e:
+                    logger.error("Failed to rasterize page", exc_info=True)
+                    yield _ndjson({"type": "page", "page": next_index, "error": f"Failed to read page: {e}"})
+                    failed += 1
+                    exhausted = stopped_early = True
+                    break
+                if page is None:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(run(next_index, page)))
+                next_index += 1
+                del page
+
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                record = task.result()
+                if "result" not in record:
+                    failed += 1
+                yield _ndjson(record)
+
+        total_pages = next_index
+        if stopped_early:
+            try:
+                total_pages = await run_in_stage("decode", count_pages, content)
+            except Exception:
+                logger.warning("Failed to count the pages of a truncated document", exc_info=True)
+                total_pages = None
+        truncated = total_pages is None or total_pages > next_index
+        if truncated:
+            logger.warning(f"Document assessed on its first {next_index} of {total_pages} pages only.")
+        yield _ndjson({"type": "document", "pages": next_index, "total_pages": total_pages,
+                       "truncated": truncated, **aggregate_pages(scores, failed)})
+    finally:
+        # Client went away: don't keep working on its pages
+        for task in pending:
+            task.cancel()
+        if rasterizing is not None and not rasterizing.done():
+            await asyncio.wait([rasterizing])
+        pages.close()
+
+
+async def open_document_stream(content: bytes, mode: str = "full", ocr_mode: str = OCR_MODE,
+                               concurrency: int = PAGE_CONCURRENCY, max_pages: int = MAX_PAGES,
+                               fields: Optional[Set[str]] = None
+                               ) -> Tuple[AsyncIterator[bytes], Callable[[], Awaitable[None]]]:
+    """
+    Reserve the document's estimated memory (`estimate_document_bytes`) in
+    the in-flight budget and return the `stream_document_assessment` stream
+    with its release callback.
+
+    Admission happens before anything is streamed, so an exhausted budget is
+    a plain 503 response rather than an error inside a 200 stream. The
+    reservation is released when the stream ends or is closed; run the
+    callback as well (e.g. as the response's background task) for a stream
+    that may never be started. Releasing twice is a no-op.
+    """
+    budget = get_memory_budget()
+    estimate = 0
+    if budget is not None:
+        estimate = await run_in_stage("decode", estimate_document_bytes, content, concurrency, max_pages)
+        await budget.acquire(estimate)
+    held = budget is not None
+
+    async def release():
+        nonlocal held
+        if held:
+            held = False
+            await budget.release(estimate)
+
+    async def stream():
+        pages = stream_document_assessment(content, mode=mode, ocr_mode=ocr_mode, concurrency=concurrency,
+                                           max_pages=max_pages, fields=fields)
+        try:
+            async for line in pages:
+                yield line
+        finally:
+            await pages.aclose()
+            await release()
+
+    return stream(), release
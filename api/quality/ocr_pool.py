@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import multiprocessing
+from typing import Optional
+
+import numpy as np
+
+from api.config.settings import (
+    OCR_WORKERS, OCR_QUEUE_MAX, OCR_JOB_TIMEOUT_S, OCR_WORKER_STARTUP_TIMEOUT_S, OCR_USE_GPU,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OCRPoolSaturated(Exception):
+    """Raised when the bounded OCR queue is full."""
+
+
+class OCRJobTimeout(Exception):
+    """Raised when an OCR job exceeds its timeout; the worker running it is recycled."""
+
+
+def _worker_main(conn, lang: str, use_gpu: bool):
+    """
+    Entry point of an OCR worker process: owns one warmed-up PaddleOCR instance
+    and serves jobs sent over `conn` until it receives None.
+    """
+    from api.quality.ocr_quality import (
+        create_ocr_engine, warmup_ocr_engine, calculate_ocr_quality, estimate_ocr_quality,
+    )
+    from api.quality.ocr_profiles import DEFAULT_PROFILE, get_profile
+
+    # One engine per OCR profile; the default one is created and warmed up at
+    # start so the first real job doesn't pay for lazy initialisation
+    engines = {DEFAULT_PROFILE: create_ocr_engine(lang, use_gpu)}
+    warmup_ocr_engine(engines[DEFAULT_PROFILE])
+    conn.send(("ready", None))
+
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        image, kwargs = job
+        # quality_only=True: sampled quality-only OCR instead of full transcription
+        func = estimate_ocr_quality if kwargs.pop("quality_only", False) else calculate_ocr_quality
+        # The profile stays in kwargs: it also decides whether the angle classifier runs
+        profile = kwargs.setdefault("profile", DEFAULT_PROFILE)
+        try:
+            if profile not in engines:
+                engines[profile] = create_ocr_engine(lang, use_gpu, profile=get_profile(profile))
+            conn.send(("ok", func(image, engine=engines[profile], **kwargs)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, lang: str, use_gpu: bool):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, lang, use_gpu), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise OCRJobTimeout("OCR worker did not start in time.")
+        status, _ = self.conn.recv()
+        self.ready = status == "ready"
+
+    def run(self, payload: tuple, timeout: float, startup_timeout: float):
+        """Blocking round trip to the worker process (called from a thread)."""
+        self.wait_ready(startup_timeout)
+        self.conn.send(payload)
+        if not self.conn.poll(timeout):
+            raise OCRJobTimeout(f"OCR job exceeded {timeout}s.")
+        status, value = self.conn.recv()
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.reap()
+
+    def reap(self):
+        """Wait for the (killed) process to exit and close the pipe; blocking."""
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def shutdown(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class OCRWorkerPool:
+    """
+    Pool of OCR worker processes, each with its own PaddleOCR instance.
+
+    Jobs wait for an idle worker in a bounded queue: once `num_workers +
+    max_queue` jobs are in flight, new submissions fail fast with
+    `OCRPoolSaturated`. A job that times out (or whose caller goes away) has
+    its worker process killed and replaced, so no stale work keeps running.
+    """
+
+    def __init__(self, num_workers: int, max_queue: int, job_timeout: float = 120,
+                 startup_timeout: float = 300, lang: str = "ru", use_gpu: bool = OCR_USE_GPU):
+        self.num_workers = num_workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.lang = lang
+        self.use_gpu = use_gpu
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._pending = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.recycled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._idle is not None
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx, self.lang, self.use_gpu)
+        self._workers.append(worker)
+        return worker
+
+    def _recycle(self, worker: _Worker) -> _Worker:
+        # The signal is immediate; waiting for the process to exit is not, so
+        # it is reaped on a thread instead of blocking the event loop
+        worker.process.kill()
+        asyncio.get_running_loop().run_in_executor(None, worker.reap)
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if not self.running:
+            return worker
+        self.recycled += 1
+        return self._spawn()
+
+    async def start(self):
+        if self.running:
+            return
+        workers = [self._spawn() for _ in range(self.num_workers)]
+        try:
+            await asyncio.gather(*(asyncio.to_thread(w.wait_ready, self.startup_timeout) for w in workers))
+        except Exception:
+            await asyncio.gather(*(asyncio.to_thread(w.kill) for w in workers))
+            self._workers = []
+            raise
+        self._idle = asyncio.Queue()
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info(f"OCR worker pool started with {self.num_workers} workers (queue size {self.max_queue}).")
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._idle = None
+        await asyncio.gather(*(asyncio.to_thread(w.shutdown) for w in self._workers))
+        self._workers = []
+        logger.info("OCR worker pool stopped.")
+
+    async def submit(self, image: np.ndarray, timeout: Optional[float] = None, **kwargs):
+        """
+        Run `calculate_ocr_quality(image, **kwargs)` in a worker process, or
+        `estimate_ocr_quality` when `quality_only=True` is passed. `profile`
+        selects the worker's engine for that OCR profile.
+        """
+        if not self.running:
+            raise RuntimeError("OCR worker pool is not running.")
+        if self._pending >= self.num_workers + self.max_queue:
+            self.rejected += 1
+            raise OCRPoolSaturated()
+
+        idle = self._idle
+        self._pending += 1
+        try:
+            worker = await idle.get()
+            try:
+                result = await asyncio.to_thread(
+                    worker.run, (image, kwargs), timeout or self.job_timeout, self.startup_timeout
+                )
+                self.completed += 1
+                return result
+            except OCRJobTimeout:
+                self.timeouts += 1
+                worker = self._recycle(worker)
+                raise
+            except (EOFError, OSError, asyncio.CancelledError):
+                # Worker died or the caller went away mid-job: don't reuse it
+                self.failed += 1
+                worker = self._recycle(worker)
+                raise
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                idle.put_nowait(worker)
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {
+            "running": self.running,
+            "workers": self.num_workers,
+            "idle_workers": idle,
+            "in_flight": self._pending,
+            "queued": max(0, self._pending - (self.num_workers - idle)),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "recycled": self.recycled,
+        }
+
+
+_pool: Optional[OCRWorkerPool] = None
+
+
+async def start_ocr_pool():
+    global _pool
+    if OCR_WORKERS <= 0:
+        return
+    if _pool is None:
+        _pool = OCRWorkerPool(OCR_WORKERS, OCR_QUEUE_MAX, OCR_JOB_TIMEOUT_S, OCR_WORKER_STARTUP_TIMEOUT_S)
+    try:
+        await _pool.start()
+    except Exception:
+        # Not fatal: readiness reports the pool as down and OCR falls back to in-process
+        logger.error("Failed to start the OCR worker pool", exc_info=True)
+
+
+async def stop_ocr_pool():
+    if _pool is not None:
+        await _pool.stop()
+
+
+def get_ocr_pool() -> Optional[OCRWorkerPool]:
+    return _pool
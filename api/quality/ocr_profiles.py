@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Optional, Tuple
+
+from api.config.settings import OCR_PROFILES_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "default"
+
+
+@dataclass(frozen=True)
+class OCRProfile:
+    """
+    OCR settings for a family of document types.
+
+    Attributes:
+        - name: Profile name (key in the profiles config)
+        - upscale: Resize factor applied before binarization (1.0 keeps the crop size)
+        - use_angle_cls: Run the text-angle classifier (not needed for always-upright documents)
+        - det_limit_side_len: Side limit of the image fed to text detection
+        - det_limit_type: "max" caps the longest side, "min" raises the shortest one
+        - rec_batch_num: Text lines recognized per recognition batch
+    """
+    name: str = DEFAULT_PROFILE
+    upscale: float = 2.0
+    use_angle_cls: bool = True
+    det_limit_side_len: int = 960
+    det_limit_type: str = "max"
+    rec_batch_num: int = 6
+
+    def engine_kwargs(self) -> dict:
+        """Keyword arguments of the PaddleOCR constructor for this profile."""
+        kwargs = asdict(self)
+        del kwargs["name"], kwargs["upscale"]
+        return kwargs
+
+
+def load_profiles(path: Optional[str] = OCR_PROFILES_PATH) -> Tuple[Dict[str, OCRProfile], Dict[str, str]]:
+    """
+    Read the OCR profiles config: named profiles plus a mapping from YOLO
+    class name (doc_type) to profile name. Unknown keys are rejected; a
+    missing file or an empty path gives only the default profile.
+
+    Returns:
+        - Profiles by name (always contains "default")
+        - Profile name by doc_type
+    """
+    profiles = {DEFAULT_PROFILE: OCRProfile()}
+    doc_types: Dict[str, str] = {}
+    if not path:
+        return profiles, doc_types
+    try:
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"OCR profiles file {path} not found, using the default profile only.")
+        return profiles, doc_types
+
+    allowed = {f.name for f in fields(OCRProfile)} - {"name"}
+    for name, values in config.get("profiles", {}).items():
+        unknown = set(values) - allowed
+        if unknown:
+            raise ValueError(f"Unknown settings {sorted(unknown)} in OCR profile '{name}'.")
+        profiles[name] = OCRProfile(name=name, **values)
+    for doc_type, name in config.get("doc_types", {}).items():
+        if name not in profiles:
+            raise ValueError(f"doc_type '{doc_type}' refers to unknown OCR profile '{name}'.")
+        doc_types[doc_type] = name
+    return profiles, doc_types
+
+
+_profiles: Optional[Dict[str, OCRProfile]] = None
+_doc_types: Dict[str, str] = {}
+_fingerprint: Optional[str] = None
+
+
+def _ensure_loaded():
+    global _profiles, _doc_types
+    if _profiles is None:
+        _profiles, _doc_types = load_profiles()
+
+
+def get_profile(name: str = DEFAULT_PROFILE) -> OCRProfile:
+    """Profile by name (KeyError for an unknown name)."""
+    _ensure_loaded()
+    return _profiles[name]
+
+
+def profile_for(doc_type: Optional[str]) -> OCRProfile:
+    """Profile of a YOLO class name; the default profile for unmapped types."""
+    _ensure_loaded()
+    return _profiles[_doc_types.get(doc_type, DEFAULT_PROFILE)]
+
+
+def all_profiles() -> Dict[str, OCRProfile]:
+    _ensure_loaded()
+    return dict(_profiles)
+
+
+def profiles_fingerprint() -> str:
+    """Short hash of the loaded profiles and mapping (part of the result cache key)."""
+    global _fingerprint
+    if _fingerprint is None:
+        _ensure_loaded()
+        config = {"profiles": {name: asdict(p) for name, p in _profiles.items()}, "doc_types": _doc_types}
+        _fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+    return _fingerprint
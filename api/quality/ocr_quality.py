@@ -2,24 +2,79 @@ import cv2
 import numpy as np
 import os
 import logging
-from typing import Tuple
-from paddleocr import PaddleOCR
+from typing import Optional, Tuple, Union
+from uuid import uuid4
 import asyncio
 from fastapi import HTTPException
-from api.config.settings import NORMALISED_DIR
+from threading import Lock
+from functools import partial
+from statistics import NormalDist
+from api.config.settings import (
+    NORMALISED_DIR, SAVE_INTERMEDIATES, OCR_USE_GPU, OCR_RETRY_AFTER_S, OCR_WORKERS,
+    OCR_SAMPLE_LINES, OCR_SAMPLE_MIN_LINES, OCR_SAMPLE_MAX_CI_HALF_WIDTH, OCR_SAMPLE_CONFIDENCE_LEVEL,
+)
+from api.config.logging import VERBOSE
+from api.models.registry import registry
+from api.quality.ocr_pool import get_ocr_pool, OCRPoolSaturated, OCRJobTimeout
+from api.quality.metrics import black_ratios
+from api.quality.ocr_profiles import OCRProfile, DEFAULT_PROFILE, get_profile
 
 logger = logging.getLogger(__name__)
 
-# Initialize PaddleOCR once with GPU enabled and Russian language
-ocr = PaddleOCR(use_angle_cls=True, lang='ru', use_gpu=True)
+# The in-process PaddleOCR instances (Russian language, one per OCR profile) are
+# owned by the model registry. The default one is only loaded at startup when OCR
+# doesn't run in worker processes; the others on first use. The instances are not
+# safe for concurrent calls, so in-process use is serialized.
+_ocr_call_lock = Lock()
+
+
+def create_ocr_engine(lang: str = "ru", use_gpu: bool = OCR_USE_GPU,
+                      profile: Optional[OCRProfile] = None) -> "PaddleOCR":
+    from paddleocr import PaddleOCR
+
+    profile = profile or get_profile(DEFAULT_PROFILE)
+    return PaddleOCR(lang=lang, use_gpu=use_gpu, **profile.engine_kwargs())
+
+
+def warmup_ocr_engine(engine: "PaddleOCR"):
+    engine.ocr(np.full((64, 256, 3), 255, dtype=np.uint8), cls=getattr(engine, "use_angle_cls", True))
+
 
-def preprocess_image(img_input) -> Tuple[str, np.ndarray]:
+registry.register("ocr", create_ocr_engine, warmup=warmup_ocr_engine, eager=OCR_WORKERS <= 0)
+
+
+def get_ocr(profile: str = DEFAULT_PROFILE) -> "PaddleOCR":
+    """
+    Shared in-process PaddleOCR instance configured for an OCR profile.
+    """
+    if profile == DEFAULT_PROFILE:
+        return registry.get("ocr")
+    name = f"ocr:{profile}"
+    registry.register(name, partial(create_ocr_engine, profile=get_profile(profile)),
+                      warmup=warmup_ocr_engine, eager=False)
+    return registry.get(name)
+
+
+def save_intermediate(img: np.ndarray, suffix: str = "processed") -> str:
+    """
+    Persist an intermediate image under NORMALISED_DIR with a unique name
+    (debug/audit mode only).
+    """
+    save_path = os.path.join(str(NORMALISED_DIR), f"{uuid4().hex}_{suffix}.png")
+    cv2.imwrite(save_path, img)
+    return save_path
+
+
+def preprocess_image(img_input, save: bool = SAVE_INTERMEDIATES, upscale: float = 2.0) -> Tuple[Optional[str], np.ndarray]:
     """
     Preprocess the image using GPU-accelerated OpenCV (if built with CUDA).
     Handles both file paths and in-memory images (numpy.ndarray).
-    
+
+    The binary image stays in memory; it is only written to disk when `save`
+    is enabled (SAVE_INTERMEDIATES setting).
+
     Returns:
-        - Path to saved binary image
+        - Path to saved binary image, or None when nothing was saved
         - Binary image (np.ndarray)
     """
     if isinstance(img_input, np.ndarray):
@@ -31,13 +86,12 @@ def preprocess_image(img_input) -> Tuple[str, np.ndarray]:
     else:
         raise TypeError("Input should be either a numpy.ndarray or a file path (str).")
 
-    file_name = "processed_image"
-
     # Convert to grayscale
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-    # Resize image if necessary
-    gray = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    # Resize image if necessary (factor set by the document type's OCR profile)
+    if upscale != 1:
+        gray = cv2.resize(gray, None, fx=upscale, fy=upscale, interpolation=cv2.INTER_CUBIC)
 
     # Upload to GPU if available
     try:
@@ -55,28 +109,12 @@ def preprocess_image(img_input) -> Tuple[str, np.ndarray]:
 
     _, binary_img = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    save_path = os.path.join(str(NORMALISED_DIR), f"{file_name}_processed.jpg")
-    cv2.imwrite(save_path, binary_img)
+    save_path = save_intermediate(binary_img) if save else None
 
     return save_path, binary_img
 
 def assess_binarization_quality(binary_img: np.ndarray) -> Tuple[float, float]:
-    total_pixels = binary_img.size
-    black_pixels = total_pixels - cv2.countNonZero(binary_img)
-    global_black_ratio = (black_pixels / total_pixels) * 100
-
-    inverted = cv2.bitwise_not(binary_img)
-    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(inverted, connectivity=8)
-
-    area_threshold = total_pixels * 0.01
-    large_area = sum(
-        stats[i, cv2.CC_STAT_AREA]
-        for i in range(1, num_labels)
-        if stats[i, cv2.CC_STAT_AREA] > area_threshold
-    )
-    large_black_ratio = (large_area / total_pixels) * 100
-
-    return global_black_ratio, large_black_ratio
+    return black_ratios(binary_img)
 
 import time
 import numpy as np
@@ -84,31 +122,62 @@ from typing import Tuple
 import logging
 
 
-def calculate_ocr_quality(image_path: str, lang: str = "ru", max_retries: int = 3) -> Tuple[str, float, str]:
+def _describe(image: Union[str, np.ndarray]) -> str:
+    if isinstance(image, np.ndarray):
+        return f"<in-memory image {image.shape[1]}x{image.shape[0]}>"
+    return image
+
+
+def readability(average_conf: float) -> str:
+    """Readability label of an average OCR confidence (in %)."""
+    if average_conf >= 80:
+        return "Excellent readability"
+    elif average_conf >= 60:
+        return "Moderate readability"
+    return "Poor readability"
+
+
+def calculate_ocr_quality(image: Union[str, np.ndarray], lang: str = "ru", max_retries: int = 3,
+                          engine: Optional["PaddleOCR"] = None,
+                          profile: str = DEFAULT_PROFILE,
+                          use_angle_cls: Optional[bool] = None) -> Tuple[str, float, str]:
     """
     Perform OCR using PaddleOCR with GPU support.
     Retries up to 'max_retries' times if OCR result is out of range (incomplete or mismatch).
 
     Args:
-        - image_path: Path to the image for OCR processing
+        - image: In-memory image (np.ndarray, passed to PaddleOCR without any
+          encode/decode round trip) or path to the image for OCR processing
         - lang: Language for OCR (default is Russian "ru")
         - max_retries: Maximum number of retries in case of result mismatch or incomplete result
+        - engine: PaddleOCR instance owned by the caller (e.g. an OCR worker process);
+          defaults to the shared in-process instance
+        - profile: OCR profile: selects the shared instance (unless `engine` is
+          given) and whether the text-angle classifier runs
+        - use_angle_cls: Overrides the profile's angle-classifier setting
 
     Returns:
         - Extracted text
         - Average confidence
         - Quality label
     """
+    image_path = _describe(image)
+    if use_angle_cls is None:
+        use_angle_cls = get_profile(profile).use_angle_cls
     retries = 0
     while retries < max_retries:
         try:
             # Run OCR on the image
-            result = ocr.ocr(image_path, cls=True)
+            if engine is not None:
+                result = engine.ocr(image, cls=use_angle_cls)
+            else:
+                with _ocr_call_lock:
+                    result = get_ocr(profile).ocr(image, cls=use_angle_cls)
 
             # Check if the result has the expected structure
             if len(result) < 2:
                 logger.error(f"OCR result is incomplete for image {image_path}. Expected 2 elements, found {len(result)}.")
-                logger.error(f"OCR result: {result}")
+                logger.error("OCR result: %s", result, extra=VERBOSE)
                 retries += 1
                 logger.warning(f"Retrying OCR for image {image_path}... Attempt {retries}/{max_retries}")
                 time.sleep(1)  # Small delay before retrying
@@ -121,8 +190,8 @@ def calculate_ocr_quality(image_path: str, lang: str = "ru", max_retries: int =
             # Ensure that the number of detected boxes and OCR results match
             if len(dt_boxes) != len(rec_res):
                 logger.error(f"Mismatch in the number of detected boxes ({len(dt_boxes)}) vs OCR results ({len(rec_res)})")
-                logger.error(f"Detected Boxes: {dt_boxes}")
-                logger.error(f"Recognition Results: {rec_res}")
+                logger.error("Detected Boxes: %s", dt_boxes, extra=VERBOSE)
+                logger.error("Recognition Results: %s", rec_res, extra=VERBOSE)
                 retries += 1
                 logger.warning(f"Retrying OCR for image {image_path}... Attempt {retries}/{max_retries}")
                 time.sleep(1)  # Small delay before retrying
@@ -144,16 +213,11 @@ def calculate_ocr_quality(image_path: str, lang: str = "ru", max_retries: int =
             average_conf = np.mean(confidences) * 100 if confidences else 0.0
 
             # Determine readability quality based on average confidence
-            if average_conf >= 80:
-                quality = "Excellent readability"
-            elif average_conf >= 60:
-                quality = "Moderate readability"
-            else:
-                quality = "Poor readability"
+            quality = readability(average_conf)
 
             # Log the results for debugging and monitoring
             logger.info(f"OCR processing completed for {image_path} with average confidence: {average_conf:.2f}%")
-            logger.info(f"Text extracted: {text[:100]}...")  # Log the first 100 characters of the text as preview
+            logger.info("Text extracted: %s...", text[:100], extra=VERBOSE)  # Preview of the first 100 characters (sampled)
 
             return text, average_conf, quality
 
@@ -171,15 +235,28 @@ def calculate_ocr_quality(image_path: str, lang: str = "ru", max_retries: int =
     return "", 0.0, "OCR failed after multiple retries"
 
 
-async def safe_ocr_call(image_path: str, lang: str = 'ru', max_retries=3, timeout=120) -> Tuple[str, float, str]:
+async def _run_ocr_job(func, image: Union[str, np.ndarray], lang: str, max_retries: int, timeout: float,
+                       profile: str = DEFAULT_PROFILE, quality_only: bool = False):
+    pool = get_ocr_pool()
     retries = 0
     while retries < max_retries:
         try:
+            if pool is not None and pool.running:
+                # Timed-out jobs are cancelled by recycling their worker process
+                return await pool.submit(image, timeout=timeout, lang=lang, profile=profile,
+                                         quality_only=quality_only)
             result = await asyncio.wait_for(
-                asyncio.to_thread(calculate_ocr_quality, image_path, lang), timeout
+                asyncio.to_thread(func, image, lang, profile=profile), timeout
             )
             return result
-        except asyncio.TimeoutError:
+        except OCRPoolSaturated:
+            logger.warning("OCR worker pool is saturated, rejecting request.")
+            raise HTTPException(
+                status_code=503,
+                detail="OCR service is busy, please retry later.",
+                headers={"Retry-After": str(OCR_RETRY_AFTER_S)},
+            )
+        except (asyncio.TimeoutError, OCRJobTimeout):
             logger.warning(f"OCR processing timed out (attempt {retries + 1})")
         except Exception as e:
             logger.error(f"OCR failed with error: {e}")
@@ -188,4 +265,160 @@ async def safe_ocr_call(image_path: str, lang: str = 'ru', max_retries=3, timeou
         retries += 1
         await asyncio.sleep(2)
 
-    raise HTTPException(status_code=500, detail="OCR processing failed after multiple attempts.")
\ No newline at end of file
+    raise HTTPException(status_code=500, detail="OCR processing failed after multiple attempts.")
+
+
+async def safe_ocr_call(image: Union[str, np.ndarray], lang: str = 'ru', max_retries=3, timeout=120,
+                        profile: str = DEFAULT_PROFILE) -> Tuple[str, float, str]:
+    return await _run_ocr_job(calculate_ocr_quality, image, lang, max_retries, timeout, profile)
+
+
+async def safe_ocr_estimate(image: np.ndarray, lang: str = 'ru', max_retries=3, timeout=120,
+                            profile: str = DEFAULT_PROFILE) -> dict:
+    """
+    Quality-only OCR (`estimate_ocr_quality`) in the OCR worker pool, or on a
+    thread when the pool isn't running.
+    """
+    return await _run_ocr_job(estimate_ocr_quality, image, lang, max_retries, timeout, profile, quality_only=True)
+
+
+def _crop_text_box(image: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """
+    Perspective-crop one detected text box (4 points, clockwise from top-left)
+    into an upright line image, as PaddleOCR does before recognition.
+    """
+    points = np.asarray(box, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    width, height = max(width, 1), max(height, 1)
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(image, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE,
+                               flags=cv2.INTER_CUBIC)
+    if height / width >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def _stratified_sample(count: int, sample_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Indices of `sample_size` lines out of `count` (in reading order): one line
+    drawn at random from each of `sample_size` equal consecutive strata, so the
+    sample covers the whole page instead of clustering in one region.
+    """
+    strata = np.array_split(np.arange(count), sample_size)
+    return np.array([rng.choice(stratum) for stratum in strata])
+
+
+def estimate_ocr_quality(image: np.ndarray, lang: str = "ru", engine: Optional["PaddleOCR"] = None,
+                         sample_size: int = OCR_SAMPLE_LINES, min_lines: int = OCR_SAMPLE_MIN_LINES,
+                         max_ci_half_width: float = OCR_SAMPLE_MAX_CI_HALF_WIDTH,
+                         confidence_level: float = OCR_SAMPLE_CONFIDENCE_LEVEL,
+                         seed: Optional[int] = 0, profile: str = DEFAULT_PROFILE) -> dict:
+    """
+    Quality-only OCR: estimate the mean recognition confidence of the page
+    without transcribing it.
+
+    Text detection runs on the whole page, but only a stratified sample of
+    the detected lines is recognized. The mean confidence comes with a
+    normal-approximation confidence interval (with finite population
+    correction). When the interval is wider than `max_ci_half_width`
+    (confidence points), or can't be estimated (fewer than two lines kept),
+    the remaining lines are recognized too and the exact page mean is
+    returned. Pages with at most `min_lines` lines are always recognized in
+    full. No text is assembled.
+
+    As in full OCR, lines recognized below the engine's `drop_score` are
+    left out of the mean.
+
+    Args:
+        - image: Binarized page (grayscale or BGR)
+        - lang: Language for OCR (default is Russian "ru")
+        - engine: PaddleOCR instance owned by the caller (e.g. an OCR worker process);
+          defaults to the shared in-process instance
+        - sample_size: Number of lines recognized in the first pass
+        - min_lines: Pages with at most this many lines are not sampled
+        - max_ci_half_width: Widest acceptable interval half-width, in confidence points
+        - confidence_level: Coverage of the interval (e.g. 0.95)
+        - seed: Seed of the line sampling (None for a random sample)
+        - profile: OCR profile of the shared instance (ignored when `engine` is given)
+
+    Returns:
+        - Dict with `average_confidence` (%), `quality`, `confidence_interval`
+          ([low, high] in %), `lines_detected`, `lines_recognized` and
+          `fallback` (True when the whole page had to be recognized)
+    """
+    if engine is None:
+        # The shared in-process instance is not safe for concurrent calls
+        with _ocr_call_lock:
+            return estimate_ocr_quality(image, lang, get_ocr(profile), sample_size, min_lines,
+                                        max_ci_half_width, confidence_level, seed, profile=profile)
+    for component in ("text_detector", "text_recognizer"):
+        if not hasattr(engine, component):
+            # PaddleOCR build without the 2.x pipeline components: full-page OCR
+            _, average_conf, quality = calculate_ocr_quality(image, lang, engine=engine, profile=profile)
+            return {"average_confidence": average_conf, "quality": quality,
+                    "confidence_interval": [average_conf, average_conf],
+                    "lines_detected": None, "lines_recognized": None, "fallback": True}
+
+    page = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+    dt_boxes, _ = engine.text_detector(page)
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return {"average_confidence": 0.0, "quality": readability(0.0), "confidence_interval": [0.0, 0.0],
+                "lines_detected": 0, "lines_recognized": 0, "fallback": False}
+
+    # Reading order: top to bottom, then left to right
+    boxes = sorted(dt_boxes, key=lambda b: (b[0][1], b[0][0]))
+    count = len(boxes)
+
+    # engine.ocr() (full mode) drops these lines before averaging
+    drop_score = getattr(engine, "drop_score", 0.5)
+
+    def kept(confidences: np.ndarray) -> np.ndarray:
+        return confidences[confidences >= drop_score]
+
+    def recognize(indices) -> np.ndarray:
+        crops = [_crop_text_box(page, boxes[i]) for i in indices]
+        if getattr(engine, "use_angle_cls", False) and getattr(engine, "text_classifier", None) is not None:
+            crops, _, _ = engine.text_classifier(crops)
+        rec_res, _ = engine.text_recognizer(crops)
+        return np.array([conf for _, conf in rec_res], dtype=np.float64)
+
+    fallback = False
+    if count <= max(min_lines, sample_size):
+        confidences = recognize(range(count))
+        mean = half_width = None
+    else:
+        rng = np.random.default_rng(seed)
+        sampled = _stratified_sample(count, sample_size, rng)
+        confidences = recognize(sampled)
+        scores = kept(confidences)
+        mean, half_width = None, float("inf")
+        if len(scores) > 1:
+            mean = scores.mean() * 100
+            z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+            correction = np.sqrt(1 - len(sampled) / count)
+            half_width = z * scores.std(ddof=1) * 100 / np.sqrt(len(scores)) * correction
+        if half_width > max_ci_half_width:
+            logger.info(f"OCR sample interval too wide (+/-{half_width:.2f}, {len(scores)} lines kept), "
+                        f"recognizing the full page.")
+            rest = np.setdiff1d(np.arange(count), sampled)
+            confidences = np.concatenate([confidences, recognize(rest)])
+            mean = half_width = None
+            fallback = True
+
+    if mean is None:
+        # Every line recognized: exact page mean
+        scores = kept(confidences)
+        mean, half_width = (scores.mean() * 100 if len(scores) else 0.0), 0.0
+
+    logger.info(f"Quality-only OCR: {len(confidences)}/{count} lines recognized, "
+                f"mean confidence {mean:.2f} +/- {half_width:.2f}")
+    return {
+        "average_confidence": float(mean),
+        "quality": readability(mean),
+        "confidence_interval": [float(max(0.0, mean - half_width)), float(min(100.0, mean + half_width))],
+        "lines_detected": count,
+        "lines_recognized": int(len(confidences)),
+        "fallback": fallback,
+    }
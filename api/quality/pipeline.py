@@ -0,0 +1,348 @@
+import asyncio
+import json
+import logging
+from io import BytesIO
+from typing import Optional, Tuple
+import numpy as np
+import cv2
+from fastapi import HTTPException
+from api.models.batching import locate_document
+from api.models.yolo_inference import build_detection_result
+from api.quality.ocr_quality import preprocess_image, assess_binarization_quality, safe_ocr_call, safe_ocr_estimate
+from api.quality.scoring import calculate_global_score, categorize_score
+from api.quality.triage import cheap_tier_verdict, TIER_CHEAP, TIER_FULL, TIER_NEAR_DUPLICATE
+from api.quality.metrics import compute_image_metrics
+from api.config.settings import (
+    METRICS_ENGINE, METRICS_MAX_SIDE, DETECT_DECODE_MIN_SIDE, OCR_CROP_MIN_SIDE, OCR_MODE, NEAR_DUP_ACTION,
+)
+from api.schemas.quality import DocumentQualityResponse
+from api.monitoring.metrics import stage
+from api.quality.stages import run_in_stage
+from api.quality.ocr_profiles import profile_for, profiles_fingerprint
+from api.cache.phash_index import get_phash_index, image_hashes, format_hashes
+
+logger = logging.getLogger(__name__)
+
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def decode_image(content: bytes, reduction: int = 1) -> np.ndarray:
+    """
+    Decode raw upload bytes into a BGR image using OpenCV, optionally at
+    1/2, 1/4 or 1/8 resolution (native DCT scaling for JPEG).
+    """
+    img = cv2.imdecode(np.frombuffer(content, np.uint8), _REDUCED_FLAGS[reduction])
+    if img is None:
+        raise ValueError("Failed to load image from memory.")
+    return img
+
+
+def image_size(content: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) of the image as OpenCV decodes it (EXIF orientation
+    applied), read from the header only. None if the header can't be parsed.
+    `content` should be bytes: BytesIO shares them, but copies a bytearray.
+    """
+    try:
+        from PIL import Image
+
+        with Image.open(BytesIO(content)) as im:
+            width, height = im.size
+            # Orientations 5-8 are rotated by 90 degrees
+            if im.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def _pick_reduction(long_side: int, min_side: int) -> int:
+    for reduction in (8, 4, 2):
+        if min_side and long_side / reduction >= min_side:
+            return reduction
+    return 1
+
+
+def decode_for_detection(content: bytes) -> Tuple[np.ndarray, Optional[Tuple[int, int]]]:
+    """
+    Decode at the smallest resolution that still covers the detector's
+    letterbox. Returns the image and the full-resolution (width, height).
+    """
+    with stage("decode"):
+        size = image_size(content)
+        reduction = _pick_reduction(max(size), DETECT_DECODE_MIN_SIDE) if size else 1
+        img = decode_image(content, reduction)
+    if size is None:
+        size = (img.shape[1], img.shape[0])
+    return img, size
+
+
+def decode_region(content: bytes, box: Tuple[int, int, int, int], full_size: Tuple[int, int],
+                  min_side: int = OCR_CROP_MIN_SIDE, decoded: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Decode only as much resolution as OCR needs for `box` (full-resolution
+    coordinates) and return a compact copy of that region, so the decoded
+    page is released as soon as this returns.
+
+    `decoded` (the page as decoded for detection) is cropped directly when it
+    already has that resolution, e.g. for any page whose long side is below
+    2x OCR_CROP_MIN_SIDE, instead of decoding the same page twice.
+    """
+    x1, y1, x2, y2 = box
+    reduction = _pick_reduction(max(x2 - x1, y2 - y1), min_side)
+    if decoded is not None and round(full_size[0] / decoded.shape[1]) == reduction:
+        img = decoded
+    else:
+        img = decode_image(content, reduction)
+    fx, fy = img.shape[1] / full_size[0], img.shape[0] / full_size[1]
+    return img[int(y1 * fy):int(round(y2 * fy)), int(x1 * fx):int(round(x2 * fx))].copy()
+
+
+def scale_location(location: dict, image_shape: Tuple[int, ...], full_size: Tuple[int, int]) -> dict:
+    """
+    Map a location found on a reduced-resolution image back to full resolution.
+    """
+    fx, fy = full_size[0] / image_shape[1], full_size[1] / image_shape[0]
+    x1, y1, x2, y2 = location["box"]
+    box = (
+        max(0, int(x1 * fx)), max(0, int(y1 * fy)),
+        min(full_size[0], int(round(x2 * fx))), min(full_size[1], int(round(y2 * fy))),
+    )
+    return {**location, "box": box}
+
+
+def crop_from_bytes(content: bytes, location: dict, decoded: np.ndarray,
+                    full_size: Tuple[int, int]) -> dict:
+    """
+    Turn a detection on the reduced image `decoded` into the usual detection
+    result, with the crop at the resolution OCR needs (taken from `decoded`
+    itself when that is already the right resolution).
+    """
+    with stage("crop"):
+        full_location = scale_location(location, decoded.shape, full_size)
+        cropped = decode_region(content, full_location["box"], full_size, decoded=decoded)
+        return build_detection_result(full_location, cropped)
+
+
+async def detect_from_bytes(content: bytes) -> dict:
+    """
+    Reduced-resolution decode -> YOLO (through the micro-batcher) -> crop
+    decoded at the resolution OCR needs.
+    """
+    img, full_size = await run_in_stage("decode", decode_for_detection, content)
+    logger.info(f"Image decoded for detection at {img.shape[1]}x{img.shape[0]} (full size {full_size[0]}x{full_size[1]}).")
+    location = await locate_document(img)
+    return await run_in_stage("decode", crop_from_bytes, content, location, img, full_size)
+
+
+def _binarization_quality(large_black_ratio: float) -> str:
+    return (
+        f"High large-black region ratio ({large_black_ratio:.2f}%), potential quality issues."
+        if large_black_ratio > 20 else
+        f"Low large-black region ratio ({large_black_ratio:.2f}%), image quality acceptable."
+    )
+
+
+def _compute_metrics(cropped: np.ndarray) -> dict:
+    # The "full" engine takes the black ratios from the OCR binarization (`_binarize`)
+    with stage("metrics"):
+        return compute_image_metrics(cropped, max_side=METRICS_MAX_SIDE, ratios=METRICS_ENGINE != "full")
+
+
+def _binarize(cropped: np.ndarray, upscale: float = 2.0) -> Tuple[Optional[str], np.ndarray, Optional[Tuple[float, float]]]:
+    """
+    Binarize the crop for OCR (upscaled by the OCR profile's factor); with
+    METRICS_ENGINE="full" also returns the legacy black ratios of the
+    upscaled full-resolution binary image.
+    """
+    with stage("binarize"):
+        processed_path, binary_img = preprocess_image(cropped, upscale=upscale)
+    full_ratios = None
+    if METRICS_ENGINE == "full":
+        with stage("binarization_quality"):
+            full_ratios = assess_binarization_quality(binary_img)
+    return processed_path, binary_img, full_ratios
+
+
+async def assess_detected_document(detection_result: dict, mode: str = "full",
+                                   ocr_mode: str = OCR_MODE, use_index: bool = True) -> DocumentQualityResponse:
+    """
+    Run the post-detection part of the pipeline (binarization, OCR, scoring)
+    on a detection result (`crop_from_bytes` or `crop_document`).
+
+    In "tiered" mode OCR is skipped when the cheap metrics already show the
+    page is clearly unusable; `evaluation_tier` in the response tells which
+    tier decided the result.
+
+    With `ocr_mode="quality"` OCR only estimates the mean confidence from a
+    sample of the text lines (see `estimate_ocr_quality`); `text` is empty.
+
+    The crop is looked up in the near-duplicate index (unless `use_index` is
+    false): a near-identical earlier document of the same type is reported in
+    `near_duplicate_of` or, with NEAR_DUP_ACTION=reuse and the same settings,
+    its assessment (without the OCR text) is returned without running OCR.
+    """
+    index = get_phash_index() if use_index else None
+    if index is None:
+        return await _assess(detection_result, mode, ocr_mode)
+
+    doc_type = detection_result["doc_type"]
+    hashes = await run_in_stage("image", image_hashes, detection_result["cropped_asnumpy"])
+    perceptual_hash = format_hashes(hashes)
+    # Reused results must come from the same evaluation settings
+    variant = f"{mode}:{ocr_mode}:{METRICS_ENGINE}:{profiles_fingerprint()}"
+
+    with stage("near_duplicate"):
+        reuse = NEAR_DUP_ACTION == "reuse"
+        match = index.find(hashes, doc_type=doc_type, variant=variant if reuse else None)
+    if match is not None:
+        key, entry, distance = match
+        duplicate = dict(near_duplicate_of=key.split(":", 1)[0], near_duplicate_distance=distance)
+        logger.info(f"Near-duplicate of {duplicate['near_duplicate_of']} (distance {distance})")
+        if reuse and entry["payload"]:
+            # The OCR text of a different (if near-identical) document is not reused
+            previous = DocumentQualityResponse.model_validate({**json.loads(entry["payload"]), "text": ""})
+            return previous.model_copy(update=dict(
+                confidence=detection_result["confidence"],
+                evaluation_tier=TIER_NEAR_DUPLICATE,
+                perceptual_hash=perceptual_hash,
+                **duplicate,
+            ))
+    else:
+        duplicate = {}
+
+    response = await _assess(detection_result, mode, ocr_mode)
+    response.perceptual_hash = perceptual_hash
+    # The payload is only read back with NEAR_DUP_ACTION=reuse; the SQLite commit runs in a thread
+    payload = response.model_dump_json(exclude={"text"}) if reuse else None
+    await asyncio.to_thread(index.add, f"{perceptual_hash}:{variant}", hashes, doc_type=doc_type,
+                            variant=variant, payload=payload)
+    for name, value in duplicate.items():
+        setattr(response, name, value)
+    return response
+
+
+async def _assess(detection_result: dict, mode: str, ocr_mode: str) -> DocumentQualityResponse:
+    cropped = detection_result["cropped_asnumpy"]
+    doc_type = detection_result["doc_type"]
+    confidence = detection_result["confidence"]
+    logger.info(f"YOLO detected doc_type={doc_type} with confidence={confidence}")
+    # OCR settings (upscale, angle classifier, detection limits) for this document type
+    profile = profile_for(doc_type)
+
+    # Cheap metrics in one pass over a downscaled pyramid level
+    metrics = await run_in_stage("image", _compute_metrics, cropped)
+    global_black_ratio = metrics["global_black_ratio"]
+    large_black_ratio = metrics["large_black_ratio"]
+    binarized = None
+    if METRICS_ENGINE == "full":
+        # The cheap tier decides on the same black ratios the full tier scores with
+        binarized = await run_in_stage("image", _binarize, cropped, profile.upscale)
+        global_black_ratio, large_black_ratio = binarized[2]
+    sharpness, contrast = metrics["sharpness"], metrics["contrast"]
+    image_metrics = dict(
+        sharpness=sharpness,
+        contrast=contrast,
+        noise=metrics["noise"],
+        skew_angle=metrics["skew_angle"]
+    )
+
+    # Cheap tier: skip OCR when it cannot change the verdict
+    if mode == "tiered":
+        reason = cheap_tier_verdict(global_black_ratio, large_black_ratio, sharpness, contrast)
+        if reason is not None:
+            logger.info(f"Early exit after cheap tier: {reason}")
+            binarization_quality = _binarization_quality(large_black_ratio)
+            # Without OCR the score only carries the black-ratio penalties; clamp it
+            # at 0 and categorize it like any other score (always "Poor")
+            global_score, _ = calculate_global_score(
+                ocr_conf=0.0,
+                global_black_ratio=global_black_ratio,
+                large_black_ratio=large_black_ratio
+            )
+            global_score = max(global_score, 0.0)
+            quality_category = categorize_score(global_score)
+            return DocumentQualityResponse(
+                doc_type=doc_type,
+                confidence=confidence,
+                text="",
+                average_confidence=0.0,
+                ocr_quality_assessment=f"OCR skipped (early exit: {reason})",
+                global_black_ratio=f"{global_black_ratio:.2f}%",
+                large_black_region_ratio=f"{large_black_ratio:.2f}%",
+                global_black_percent=global_black_ratio,
+                large_black_region_percent=large_black_ratio,
+                binarization_quality=binarization_quality,
+                global_score=global_score,
+                quality_category=quality_category,
+                evaluation_tier=TIER_CHEAP,
+                **image_metrics
+            )
+
+    # Preprocess image (kept in memory; only saved in debug/audit mode)
+    if binarized is None:
+        binarized = await run_in_stage("image", _binarize, cropped, profile.upscale)
+    processed_path, binary_img, full_ratios = binarized
+    logger.info("Image successfully preprocessed.")
+    if processed_path:
+        logger.info(f"Preprocessed image saved to: {processed_path}")
+
+    if full_ratios is not None:
+        global_black_ratio, large_black_ratio = full_ratios
+    binarization_quality = _binarization_quality(large_black_ratio)
+
+    # OCR quality (using PaddleOCR)
+    try:
+        ocr_details = {}
+        with stage("ocr"):
+            if ocr_mode == "quality":
+                estimate = await safe_ocr_estimate(binary_img, lang="ru", profile=profile.name)
+                text, average_conf, ocr_quality = "", estimate["average_confidence"], estimate["quality"]
+                ocr_details = dict(
+                    ocr_confidence_interval=estimate["confidence_interval"],
+                    ocr_lines_detected=estimate["lines_detected"],
+                    ocr_lines_recognized=estimate["lines_recognized"],
+                )
+            else:
+                text, average_conf, ocr_quality = await safe_ocr_call(binary_img, lang="ru", profile=profile.name)
+        logger.info(f"OCR processing complete, average confidence: {average_conf:.2f}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("OCR processing failed", exc_info=True)
+        raise HTTPException(status_code=500, detail="OCR processing failed.")
+
+    # Global score
+    with stage("score"):
+        global_score, quality_category = calculate_global_score(
+            ocr_conf=average_conf,
+            global_black_ratio=global_black_ratio,
+            large_black_ratio=large_black_ratio
+        )
+
+    logger.info(f"Global score calculated: {global_score}")
+
+    return DocumentQualityResponse(
+        doc_type=doc_type,
+        confidence=confidence,
+        text=text,
+        average_confidence=average_conf,
+        ocr_quality_assessment=ocr_quality,
+        global_black_ratio=f"{global_black_ratio:.2f}%",
+        large_black_region_ratio=f"{large_black_ratio:.2f}%",
+        global_black_percent=global_black_ratio,
+        large_black_region_percent=large_black_ratio,
+        binarization_quality=binarization_quality,
+        global_score=global_score,
+        quality_category=quality_category,
+        evaluation_tier=TIER_FULL,
+        ocr_profile=profile.name,
+        **image_metrics,
+        **ocr_details
+    )
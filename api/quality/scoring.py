@@ -1,5 +1,8 @@
 from typing import Tuple
 
+# Bump whenever the scoring formula or its weights change (invalidates cached results)
+SCORING_VERSION = "2"
+
 def calculate_global_score(ocr_conf: float, global_black_ratio: float, large_black_ratio: float,
                            alpha: float = 1.0, beta: float = 0.5, gamma: float = 1.0) -> Tuple[float, str]:
     """
@@ -15,12 +18,15 @@ def calculate_global_score(ocr_conf: float, global_black_ratio: float, large_bla
         with quality_category based on defined thresholds.
     """
     score = alpha * ocr_conf - beta * global_black_ratio - gamma * large_black_ratio
+    return score, categorize_score(score)
+
 
+def categorize_score(score: float) -> str:
+    """
+    Map a global score to its quality category.
+    """
     if score >= 64:
-        quality_category = "Excellent"
+        return "Excellent"
     elif score >= 50:
-        quality_category = "Moderate"
-    else:
-        quality_category = "Poor"
-    
-    return score, quality_category
+        return "Moderate"
+    return "Poor"
@@ -0,0 +1,264 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from api.config.settings import (
+    STAGE_EXECUTORS_ENABLED, STAGE_DECODE_THREADS, STAGE_DETECT_THREADS, STAGE_IMAGE_THREADS,
+    STAGE_QUEUE_MAX, INFLIGHT_MEMORY_BUDGET_MB, ADMISSION_MAX_WAIT_S, ADMISSION_RETRY_AFTER_S,
+    BATCH_ADMISSION_SHARE, OCR_CROP_MIN_SIDE,
+)
+from api.monitoring.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# Stages with their own executor. OCR is not listed: it already runs in the
+# OCR worker pool (or on a thread when OCR_WORKERS=0).
+#   - decode: JPEG/PNG decoding at detection resolution and of the OCR crop
+#   - detect: YOLO forward passes (micro-batches or whole batch requests)
+#   - image:  cheap metrics, binarization and black-ratio analysis
+STAGE_THREADS = {
+    "decode": STAGE_DECODE_THREADS,
+    "detect": STAGE_DETECT_THREADS,
+    "image": STAGE_IMAGE_THREADS,
+}
+
+
+class StageExecutor:
+    """
+    A sized thread pool for one pipeline stage with a bounded queue in front.
+
+    At most `threads + queue_max` calls are submitted to the pool; further
+    callers wait (as coroutines, holding no thread) until a slot frees up, so
+    a slow stage pushes back on the stages before it instead of piling up
+    work. Different requests run in different stages at the same time, so
+    decode, detection, image processing and OCR overlap.
+    """
+
+    def __init__(self, name: str, threads: int, queue_max: int):
+        self.name = name
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"stage-{name}")
+        self._slots = asyncio.Semaphore(threads + queue_max)
+        self._lock = Lock()
+        self.submitted = 0
+        self.active = 0
+        self.waiting = 0
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` on this stage's threads. The time spent
+        waiting for a slot and a thread is recorded as the "<stage>_wait" stage.
+        """
+        # Keep the request's context (Server-Timing timings) inside the worker thread
+        context = contextvars.copy_context()
+        queued_at = time.perf_counter()
+
+        def call():
+            observe_stage(f"{self.name}_wait", time.perf_counter() - queued_at)
+            with self._lock:
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            self.submitted += 1
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, context.run, call)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"threads": self.threads, "active": self.active,
+                "waiting": self.waiting, "submitted": self.submitted}
+
+
+_executors: Dict[str, StageExecutor] = {}
+# Executors are bound to the event loop that created them (semaphores)
+_executors_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_stage_executor(name: str) -> StageExecutor:
+    global _executors_loop
+    loop = asyncio.get_running_loop()
+    if _executors_loop is not loop:
+        stop_stage_executors()
+        _executors_loop = loop
+    if name not in _executors:
+        _executors[name] = StageExecutor(name, STAGE_THREADS[name], STAGE_QUEUE_MAX)
+    return _executors[name]
+
+
+async def run_in_stage(name: str, fn: Callable, *args, **kwargs):
+    """
+    Run a blocking call on the executor of stage `name` instead of the event
+    loop. With STAGE_EXECUTORS_ENABLED=false the call runs inline (the old
+    behaviour, kept for comparison).
+    """
+    if not STAGE_EXECUTORS_ENABLED:
+        return fn(*args, **kwargs)
+    return await get_stage_executor(name).run(fn, *args, **kwargs)
+
+
+def stop_stage_executors():
+    global _executors_loop
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
+    _executors_loop = None
+
+
+def stage_stats() -> dict:
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def estimate_request_bytes(full_size: Optional[Tuple[int, int]], content_length: int = 0) -> int:
+    """
+    Rough peak memory of one request through the pipeline: the upload, then,
+    at the reduced resolution the OCR crop is decoded at (`decode_region`,
+    OCR_CROP_MIN_SIDE), the decoded page and the BGR crop (2 x 3 bytes/px)
+    and the grayscale, blurred and binary images of the 2x-upscaled crop
+    (3 x 4 bytes/px). The whole page is taken as the crop (upper bound).
+    """
+    from api.quality.pipeline import _pick_reduction
+
+    if not full_size:
+        # Unknown size (header not parsed): assume a 12 MP photo
+        full_size = (4000, 3000)
+    reduction = _pick_reduction(max(full_size), OCR_CROP_MIN_SIDE)
+    pixels = (full_size[0] // reduction) * (full_size[1] // reduction)
+    return content_length + pixels * (6 + 12)
+
+
+def admission_chunks(estimates: Dict[int, int]) -> List[List[int]]:
+    """
+    Split the items of a batch (key -> estimated bytes, in order) into
+    consecutive chunks of at most BATCH_ADMISSION_SHARE of the memory budget
+    each, to be admitted one after the other; a single item over that share
+    gets a chunk of its own. Without a budget, everything is one chunk.
+    """
+    budget = get_memory_budget()
+    if budget is None:
+        return [list(estimates)] if estimates else []
+    limit = budget.budget_bytes * BATCH_ADMISSION_SHARE
+    chunks, chunk, total = [], [], 0
+    for key, nbytes in estimates.items():
+        if chunk and total + nbytes > limit:
+            chunks.append(chunk)
+            chunk, total = [], 0
+        chunk.append(key)
+        total += nbytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class MemoryBudget:
+    """
+    Admission control on the estimated memory of in-flight requests.
+
+    A request reserves its estimate before any decoding happens and releases
+    it when done. When the budget is exhausted, new requests wait up to
+    `max_wait_s` and are then rejected with 503 and Retry-After, instead of
+    letting concurrent large images drive the worker out of memory. A single
+    request larger than the whole budget is admitted only when nothing else
+    is in flight.
+    """
+
+    def __init__(self, budget_bytes: int, max_wait_s: float = 0.5, retry_after_s: int = 2):
+        self.budget_bytes = budget_bytes
+        self.max_wait_s = max_wait_s
+        self.retry_after_s = retry_after_s
+        self.in_flight_bytes = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._released: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.in_flight == 0 or self.in_flight_bytes + nbytes <= self.budget_bytes
+
+    async def acquire(self, nbytes: int):
+        """Reserve `nbytes`, waiting up to `max_wait_s`; 503 when it doesn't fit by then."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Conditions are bound to one event loop (tests create several)
+            self._released, self._loop = asyncio.Condition(), loop
+        async with self._released:
+            try:
+                if not self._fits(nbytes):
+                    await asyncio.wait_for(self._released.wait_for(lambda: self._fits(nbytes)), self.max_wait_s)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning(f"Memory budget exhausted ({self.in_flight_bytes} bytes in flight), rejecting request.")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is busy, please retry later.",
+                    headers={"Retry-After": str(self.retry_after_s)},
+                )
+            self.in_flight_bytes += nbytes
+            self.in_flight += 1
+            self.admitted += 1
+
+    async def release(self, nbytes: int):
+        async with self._released:
+            self.in_flight_bytes -= nbytes
+            self.in_flight -= 1
+            self._released.notify_all()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            await self.release(nbytes)
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "in_flight_bytes": self.in_flight_bytes,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+_budget: Optional[MemoryBudget] = None
+
+
+def get_memory_budget() -> Optional[MemoryBudget]:
+    """Process-wide admission budget; None when INFLIGHT_MEMORY_BUDGET_MB is 0."""
+    global _budget
+    if _budget is None and INFLIGHT_MEMORY_BUDGET_MB > 0:
+        _budget = MemoryBudget(INFLIGHT_MEMORY_BUDGET_MB * 1024 * 1024, ADMISSION_MAX_WAIT_S, ADMISSION_RETRY_AFTER_S)
+    return _budget
+
+
+@asynccontextmanager
+async def admit(nbytes: int):
+    """Reserve `nbytes` of the in-flight memory budget (no-op when disabled)."""
+    budget = get_memory_budget()
+    if budget is None:
+        yield
+        return
+    async with budget.reserve(nbytes):
+        yield
@@ -0,0 +1,39 @@
+from typing import Optional
+
+from api.config.settings import (
+    EARLY_EXIT_MAX_GLOBAL_BLACK, EARLY_EXIT_MAX_LARGE_BLACK,
+    EARLY_EXIT_MIN_SHARPNESS, EARLY_EXIT_MIN_CONTRAST,
+)
+from api.quality.scoring import calculate_global_score
+
+# Tier names reported in DocumentQualityResponse.evaluation_tier
+TIER_CHEAP = "cheap"
+TIER_FULL = "full"
+TIER_NEAR_DUPLICATE = "near_duplicate"
+
+
+def cheap_tier_verdict(global_black_ratio: float, large_black_ratio: float,
+                       sharpness: float, contrast: float) -> Optional[str]:
+    """
+    Decide from cheap metrics alone whether a page is clearly unusable.
+
+    Returns the reason when the cheap tier is decisive, otherwise None
+    (meaning OCR is needed to score the page).
+    """
+    # Even a perfect OCR confidence could not lift the page out of "Poor"
+    best_score, best_category = calculate_global_score(
+        ocr_conf=100.0,
+        global_black_ratio=global_black_ratio,
+        large_black_ratio=large_black_ratio
+    )
+    if best_category == "Poor":
+        return f"score cannot exceed {best_score:.2f} even with perfect OCR"
+    if global_black_ratio > EARLY_EXIT_MAX_GLOBAL_BLACK:
+        return f"global black ratio {global_black_ratio:.2f}% above {EARLY_EXIT_MAX_GLOBAL_BLACK}%"
+    if large_black_ratio > EARLY_EXIT_MAX_LARGE_BLACK:
+        return f"large black region ratio {large_black_ratio:.2f}% above {EARLY_EXIT_MAX_LARGE_BLACK}%"
+    if sharpness < EARLY_EXIT_MIN_SHARPNESS:
+        return f"sharpness {sharpness:.2f} below {EARLY_EXIT_MIN_SHARPNESS}"
+    if contrast < EARLY_EXIT_MIN_CONTRAST:
+        return f"contrast {contrast:.2f} below {EARLY_EXIT_MIN_CONTRAST}"
+    return None
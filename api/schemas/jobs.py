@@ -0,0 +1,14 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+from api.schemas.quality import DocumentQualityResponse
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier used to poll the job.")
+    status: str = Field(..., description="queued, running, done or failed.")
+    attempts: int = Field(..., description="Number of processing attempts so far.")
+    created_at: float = Field(..., description="Submission time (Unix seconds).")
+    updated_at: float = Field(..., description="Time of the last state change (Unix seconds).")
+    callback_status: str = Field(..., description="Delivery of the result to 1C: none, pending, delivered or failed.")
+    result: Optional[DocumentQualityResponse] = Field(None, description="Quality assessment, once the job is done.")
+    error: Optional[str] = Field(None, description="Last error message, if any.")
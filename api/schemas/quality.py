@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class DocumentQualityResponse(BaseModel):
@@ -8,6 +9,31 @@ class DocumentQualityResponse(BaseModel):
     ocr_quality_assessment: str = Field(..., description="Qualitative assessment of OCR readability.")
     global_black_ratio: str = Field(..., description="Global percentage of black pixels in the image.")
     large_black_region_ratio: str = Field(..., description="Percentage of large black regions in the image.")
+    global_black_percent: Optional[float] = Field(None, description="Global percentage of black pixels, unrounded (input of the global score).")
+    large_black_region_percent: Optional[float] = Field(None, description="Percentage of large black regions, unrounded (input of the global score).")
     binarization_quality: str = Field(..., description="Overall binarization quality assessment.")
     global_score: float = Field(..., description="Aggregated global quality score.")
     quality_category: str = Field(..., description="Global quality category: Excellent, Moderate, or Poor.")
+    evaluation_tier: str = Field("full", description="Tier that decided the result: 'full' (OCR ran), 'cheap' (early exit, OCR skipped) or 'near_duplicate' (earlier assessment reused).")
+    sharpness: Optional[float] = Field(None, description="Variance of the Laplacian of the cropped document (at the resolution of the crop).")
+    contrast: Optional[float] = Field(None, description="RMS contrast (grey-level standard deviation) of the cropped document.")
+    noise: Optional[float] = Field(None, description="Estimated noise standard deviation, in grey levels.")
+    skew_angle: Optional[float] = Field(None, description="Estimated skew of the text, in degrees.")
+    ocr_profile: Optional[str] = Field(None, description="OCR profile used for this document type.")
+    ocr_confidence_interval: Optional[List[float]] = Field(None, description="Quality-only OCR: confidence interval [low, high] of the average confidence.")
+    ocr_lines_detected: Optional[int] = Field(None, description="Quality-only OCR: number of text lines detected on the page.")
+    ocr_lines_recognized: Optional[int] = Field(None, description="Quality-only OCR: number of text lines actually recognized.")
+    perceptual_hash: Optional[str] = Field(None, description="Perceptual hash (pHash + dHash, hex) of the cropped document.")
+    near_duplicate_of: Optional[str] = Field(None, description="Perceptual hash of an earlier, near-identical document, if any.")
+    near_duplicate_distance: Optional[int] = Field(None, description="Hamming distance (pHash bits) to that earlier document.")
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the file in the submitted batch.")
+    filename: Optional[str] = Field(None, description="Original name of the uploaded file.")
+    result: Optional[DocumentQualityResponse] = Field(None, description="Quality assessment, if it succeeded.")
+    error: Optional[str] = Field(None, description="Error message, if the assessment failed.")
+
+
+class BatchQualityResponse(BaseModel):
+    items: List[BatchItemResult] = Field(..., description="Per-file results, in input order.")
@@ -0,0 +1,13 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data) -> bytes:
+    """JSON bytes of plain data: orjson when installed, else the standard library."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
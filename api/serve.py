@@ -0,0 +1,158 @@
+"""
+Multi-worker serving with model weights shared across workers.
+
+Usage:
+    python -m api.serve --workers 4 [--host 0.0.0.0] [--port 8000] [--measure-after 60]
+    python -m api.serve --report-pids PID [PID ...]
+
+`uvicorn --workers N` starts N independent processes and each one loads its
+own copy of YOLO and PaddleOCR. Here the parent process loads every model
+once, without running any inference, then forks the workers. Weight buffers
+are never written after loading, so their pages stay shared copy-on-write.
+`gc.freeze()` keeps the garbage collector from dirtying the pages that hold
+the inherited objects. Each worker then runs its own warm-up, because
+inference thread pools (OpenMP/MKL) must not be started before a fork.
+
+OCR runs in-process in every worker against the shared PaddleOCR instance
+(OCR_WORKERS is forced to 0). Separate OCR worker processes would each load
+their own copy of the weights again.
+
+`--measure-after` prints RSS/PSS/shared memory for the parent and every
+worker once the workers have warmed up. `--report-pids` prints the same
+numbers for any running processes, e.g. the workers of a
+`uvicorn --workers N` deployment, for comparison.
+"""
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+
+def memory_report(pids: List[int]) -> Dict[int, dict]:
+    """
+    Memory of each process from /proc/<pid>/smaps_rollup, in MB.
+    PSS divides shared pages between the processes mapping them, so the sum
+    of PSS is the real footprint of the whole group.
+    """
+    report = {}
+    for pid in pids:
+        fields = {}
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) >= 3 and parts[2] == "kB":
+                        fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+        except OSError:
+            continue
+        report[pid] = {
+            "rss_mb": fields.get("Rss", 0.0),
+            "pss_mb": fields.get("Pss", 0.0),
+            "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+            "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+        }
+    return report
+
+
+def _print_report(pids: List[int]):
+    report = memory_report(pids)
+    totals = {key: sum(r[key] for r in report.values()) for key in ("rss_mb", "pss_mb")}
+    print(json.dumps({"processes": report, "total": totals}, indent=2), flush=True)
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str):
+    import uvicorn
+
+    # The lifespan runs registry.load_all(), which now only performs the warm-up
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(workers: int, host: str, port: int, log_level: str = "info", measure_after: float = 0):
+    os.environ["OCR_WORKERS"] = "0"
+
+    from api.app import app
+    from api.config.logging import stop_logging
+    from api.models.registry import registry
+
+    if not registry.load_all(warmup=False):
+        print(f"Some models failed to load before fork: {registry.status()}", file=sys.stderr)
+
+    import torch
+    torch.set_grad_enabled(False)
+
+    sock = _bind_socket(host, port)
+
+    # Move every object created so far into the permanent generation so the
+    # collector never touches (and un-shares) their pages in the workers
+    gc.collect()
+    gc.freeze()
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, log_level)
+            finally:
+                # os._exit skips atexit: flush this worker's queued log records
+                stop_logging()
+                os._exit(0)
+        children.append(pid)
+    print(f"Started {workers} workers: {children}", flush=True)
+
+    def _shutdown(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    if measure_after > 0:
+        time.sleep(measure_after)
+        _print_report([os.getpid()] + children)
+
+    for child in children:
+        try:
+            os.waitpid(child, 0)
+        except ChildProcessError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with forked workers sharing model memory.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--measure-after", type=float, default=0,
+                        help="Print per-process memory this many seconds after start.")
+    parser.add_argument("--report-pids", type=int, nargs="+",
+                        help="Only print the memory report for these processes and exit.")
+    args = parser.parse_args()
+
+    if args.report_pids:
+        _print_report(args.report_pids)
+        return
+    serve(args.workers, args.host, args.port, args.log_level, args.measure_after)
+
+
+if __name__ == "__main__":
+    main()
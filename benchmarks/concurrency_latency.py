@@ -0,0 +1,127 @@
+"""
+Latency of concurrent requests with and without the staged pipeline executor.
+
+Usage:
+    python -m benchmarks.concurrency_latency [--heavy 4] [--light 16] [--rounds 3]
+        [--modes staged,inline] [--output benchmarks/results/concurrency.json]
+
+Sends a mix of heavy (12 MP phone photos) and light (A4 at 150 dpi) synthetic
+documents to /quality-assessment/ at the same time, in-process through the
+ASGI app (lifespan included). It reports the latency percentiles of each kind
+of request and the event-loop lag, i.e. how late a 10 ms timer fires while the
+requests run. When blocking work runs on the event loop, the light requests
+and the timer wait behind every heavy decode; with the stage executors they
+don't.
+
+Each mode runs in its own interpreter, because STAGE_EXECUTORS_ENABLED is read
+at import time ("staged" = true, "inline" = false).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import RESOLUTIONS, generate_document, encode_jpeg
+
+MODES = {"staged": "true", "inline": "false"}
+
+
+def _percentiles(values) -> dict:
+    if not values:
+        return {}
+    values = np.array(values) * 1000
+    return {
+        "count": int(values.size),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "max_ms": float(values.max()),
+    }
+
+
+async def _measure(heavy: int, light: int, rounds: int) -> dict:
+    import httpx
+    from api.app import app
+
+    heavy_doc = encode_jpeg(generate_document(*RESOLUTIONS["phone_12mp"], noise=8.0, seed=1))
+    light_doc = encode_jpeg(generate_document(*RESOLUTIONS["a4_150dpi"], seed=2))
+    url = "/quality-assessment/?use_cache=false"
+
+    latencies = {"heavy": [], "light": []}
+    statuses = {}
+    lags = []
+
+    async def send(client, kind, content):
+        start = time.perf_counter()
+        response = await client.post(url, files={"image": (f"{kind}.jpg", content, "image/jpeg")})
+        latencies[kind].append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def ticker(stop: asyncio.Event, interval: float = 0.01):
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - start - interval))
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            await send(client, "light", light_doc)  # warm-up
+            latencies["light"].clear()
+            for _ in range(rounds):
+                stop = asyncio.Event()
+                tick = asyncio.create_task(ticker(stop))
+                requests = [send(client, "heavy", heavy_doc) for _ in range(heavy)]
+                requests += [send(client, "light", light_doc) for _ in range(light)]
+                await asyncio.gather(*requests)
+                stop.set()
+                await tick
+
+    return {
+        "heavy": _percentiles(latencies["heavy"]),
+        "light": _percentiles(latencies["light"]),
+        "event_loop_lag": _percentiles(lags),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-request latency, staged vs inline execution.")
+    parser.add_argument("--heavy", type=int, default=4, help="Heavy requests per round.")
+    parser.add_argument("--light", type=int, default=16, help="Light requests per round.")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--modes", default="staged,inline")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "concurrency.json"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_measure(args.heavy, args.light, args.rounds))))
+        return
+
+    report = {"config": {"heavy": args.heavy, "light": args.light, "rounds": args.rounds}, "modes": {}}
+    for mode in args.modes.split(","):
+        env = {**os.environ, "STAGE_EXECUTORS_ENABLED": MODES[mode]}
+        cmd = [sys.executable, "-m", "benchmarks.concurrency_latency", "--child",
+               "--heavy", str(args.heavy), "--light", str(args.light), "--rounds", str(args.rounds)]
+        print(f"Measuring {mode}...", file=sys.stderr)
+        result = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True)
+        report["modes"][mode] = json.loads(result.stdout.strip().splitlines()[-1])
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for mode, result in report["modes"].items():
+        print(f"{mode:<8} light p95 {result['light'].get('p95_ms', 0):>8.1f} ms  "
+              f"heavy p95 {result['heavy'].get('p95_ms', 0):>8.1f} ms  "
+              f"loop lag max {result['event_loop_lag'].get('max_ms', 0):>8.1f} ms  "
+              f"status {result['status_codes']}")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Epoch time of the sharded training dataset against decoding JPEGs every epoch.
+
+Usage:
+    python -m benchmarks.dataset_epoch [--images 256] [--image-size 640] [--workers 2]
+        [--batch-size 16] [--epochs 2] [--workdir /tmp/dq-dataset-bench]
+        [--output benchmarks/results/dataset_epoch.json]
+
+Generates a labelled synthetic dataset (phone-photo sized JPEGs, one document
+box each), builds the shards once (timed separately) and then iterates full
+epochs, with the same augmentation and DataLoader settings, over:
+
+  - decode: every sample is read from disk, JPEG-decoded and letterboxed in
+    the DataLoader workers (the baseline)
+  - shards: every sample is read from the memory-mapped shards
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from torch.utils.data import DataLoader, Dataset
+
+from benchmarks.synthetic import generate_document, encode_jpeg
+from model.data.augmentation import Augmenter
+from model.data.dataset import append_shards, collate_batch, make_loader, _seed_worker
+from model.data.preprocessing import list_samples, load_sample
+
+# Photo sizes cycled through by the synthetic dataset
+SIZES = [(3024, 4032), (2480, 3508), (1240, 1754)]
+
+
+class DecodeDataset(Dataset):
+    """Baseline: decode and letterbox the JPEG of every sample on every access."""
+
+    def __init__(self, image_dir: str, label_dir: str, image_size: int, transform=None):
+        self.samples = list_samples(image_dir, label_dir)
+        self.image_size = image_size
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        _, image_path, label_path = self.samples[i]
+        image, labels = load_sample(image_path, label_path, self.image_size)
+        if self.transform is not None:
+            image, labels = self.transform(image, labels)
+        return image, labels
+
+
+def generate_dataset(root: str, count: int):
+    image_dir, label_dir = os.path.join(root, "images"), os.path.join(root, "labels")
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(label_dir, exist_ok=True)
+    for i in range(count):
+        width, height = SIZES[i % len(SIZES)]
+        image = generate_document(width, height, noise=4.0, seed=i)
+        with open(os.path.join(image_dir, f"doc{i:05d}.jpg"), "wb") as f:
+            f.write(encode_jpeg(image))
+        # The synthetic page covers the central 80% of the photo
+        with open(os.path.join(label_dir, f"doc{i:05d}.txt"), "w") as f:
+            f.write(f"{i % 3} 0.5 0.5 0.8 0.8\n")
+    return image_dir, label_dir
+
+
+def time_epochs(loader, epochs: int) -> list:
+    times = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for images, targets in loader:
+            pass
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Epoch time: memory-mapped shards vs decode per epoch.")
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--image-size", type=int, default=640)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--workdir", default=os.path.join("/tmp", "dq-dataset-bench"))
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "dataset_epoch.json"))
+    args = parser.parse_args()
+
+    shutil.rmtree(args.workdir, ignore_errors=True)
+    image_dir, label_dir = generate_dataset(args.workdir, args.images)
+    shard_dir = os.path.join(args.workdir, "shards")
+
+    start = time.perf_counter()
+    append_shards(image_dir, label_dir, shard_dir, args.image_size, workers=args.workers)
+    build_s = time.perf_counter() - start
+
+    baseline = DataLoader(
+        DecodeDataset(image_dir, label_dir, args.image_size, transform=Augmenter()),
+        batch_size=args.batch_size, shuffle=True, num_workers=args.workers, collate_fn=collate_batch,
+        worker_init_fn=_seed_worker, persistent_workers=args.workers > 0,
+    )
+    sharded = make_loader(shard_dir, batch_size=args.batch_size, workers=args.workers)
+
+    results = {"decode": time_epochs(baseline, args.epochs), "shards": time_epochs(sharded, args.epochs)}
+    report = {
+        "config": vars(args),
+        "shard_build_s": build_s,
+        "epochs_s": results,
+        "mean_epoch_s": {name: float(np.mean(times)) for name, times in results.items()},
+    }
+    report["speedup"] = report["mean_epoch_s"]["decode"] / report["mean_epoch_s"]["shards"]
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, mean in report["mean_epoch_s"].items():
+        print(f"{name:<7} {mean:>8.2f} s/epoch ({args.images / mean:.0f} images/s)")
+    print(f"shard build {build_s:.2f} s, speedup {report['speedup']:.1f}x")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
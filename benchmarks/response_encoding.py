@@ -0,0 +1,160 @@
+"""
+CPU time and bytes on the wire of one quality-assessment response, and the
+cost of the OCR logging on the request path.
+
+Usage:
+    python -m benchmarks.response_encoding [--requests 2000] [--text-lines 60]
+        [--output benchmarks/results/response_encoding.json]
+
+Responses: a representative DocumentQualityResponse (a page of OCR text) is
+encoded the way the endpoints used to (model returned to FastAPI:
+response_model validation, jsonable_encoder, json.dumps) and once per
+`fields` setting through `api.endpoints.responses`, with and without gzip.
+
+Logging: the log calls of one `calculate_ocr_quality` run (including the
+verbose ones) through a synchronous FileHandler, as before, and through the
+queue handler of `api.config.logging`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from api.config import logging as log_config
+from api.endpoints.responses import parse_fields, quality_response
+from api.schemas.quality import DocumentQualityResponse
+
+
+def sample_response(text_lines: int) -> DocumentQualityResponse:
+    line = "ДОГОВОР ПОСТАВКИ No 1250 от 15.03.2024 ПОСТАВЩИК ООО Ромашка ИНН 7701234567"
+    return DocumentQualityResponse(
+        doc_type="contract", confidence=0.93, text="\n".join([line] * text_lines),
+        average_confidence=91.37, ocr_quality_assessment="Good readability",
+        global_black_ratio="7.42%", large_black_region_ratio="1.08%",
+        global_black_percent=7.4213, large_black_region_percent=1.0811,
+        binarization_quality="Low large-black region ratio (1.08%), image quality acceptable.",
+        global_score=86.58, quality_category="Excellent", sharpness=412.5, contrast=61.2,
+        noise=3.1, skew_angle=0.4, ocr_profile="default", perceptual_hash="f" * 32,
+    )
+
+
+def bench_responses(requests: int, text_lines: int) -> dict:
+    response = sample_response(text_lines)
+    app = FastAPI()
+
+    @app.get("/default", response_model=DocumentQualityResponse)
+    async def default():
+        return response
+
+    # What FastAPI does with a returned model: validate it against the
+    # response_model, jsonable_encoder, then json.dumps in JSONResponse
+    field = app.routes[-1].response_field
+    loop = asyncio.new_event_loop()
+
+    def encode_default():
+        content = loop.run_until_complete(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+
+    def encode_fast(fields, accept_encoding):
+        selected = parse_fields(fields)
+
+        def encode():
+            return loop.run_until_complete(quality_response(response, selected, accept_encoding)).body
+        return encode
+
+    variants = {
+        "default": encode_default,
+        "fast_full": encode_fast("full", ""),
+        "fast_full_gzip": encode_fast("full", "gzip"),
+        "fast_lean": encode_fast("lean", ""),
+    }
+    results = {}
+    for name, encode in variants.items():
+        for _ in range(50):
+            encode()
+        start = time.process_time()
+        for _ in range(requests):
+            body = encode()
+        cpu = time.process_time() - start
+        results[name] = {"cpu_us_per_request": cpu / requests * 1e6, "bytes_on_wire": len(body)}
+    loop.close()
+    return results
+
+
+def _ocr_log_calls(logger: logging.Logger, text: str, boxes: list):
+    # The calls made by one calculate_ocr_quality run, with a mismatch retry
+    logger.error("Mismatch in the number of detected boxes (60) vs OCR results (59)")
+    logger.error("Detected Boxes: %s", boxes, extra=log_config.VERBOSE)
+    logger.error("Recognition Results: %s", boxes, extra=log_config.VERBOSE)
+    logger.info("OCR processing completed for <ndarray 2480x3508> with average confidence: 91.37%")
+    logger.info("Text extracted: %s...", text[:100], extra=log_config.VERBOSE)
+
+
+def bench_logging(calls: int, text: str) -> dict:
+    import numpy as np
+
+    boxes = [np.arange(8, dtype=np.float32).reshape(4, 2) for _ in range(60)]
+    results = {}
+    directory = tempfile.mkdtemp()
+    root = logging.getLogger()
+
+    # Before: synchronous FileHandler formatting every payload
+    handler = logging.FileHandler(os.path.join(directory, "sync.log"))
+    handler.setFormatter(logging.Formatter(log_config.LOG_FORMAT))
+    root.handlers, root.level = [handler], logging.INFO
+    logger = logging.getLogger("bench.sync")
+    start = time.perf_counter()
+    for _ in range(calls):
+        _ocr_log_calls(logger, text, boxes)
+    results["sync_file_handler_us"] = (time.perf_counter() - start) / calls * 1e6
+    handler.close()
+
+    # After: queue handler, verbose payloads sampled, file written by a thread
+    root.handlers = []
+    log_config.setup_logging(os.path.join(directory, "queued.log"))
+    # Console output of the listener would dominate the measurement
+    log_config._listener.handlers = tuple(h for h in log_config._listener.handlers
+                                          if isinstance(h, logging.FileHandler))
+    logger = logging.getLogger("bench.queued")
+    start = time.perf_counter()
+    for _ in range(calls):
+        _ocr_log_calls(logger, text, boxes)
+    results["queue_handler_us"] = (time.perf_counter() - start) / calls * 1e6
+    log_config.stop_logging()
+    results.update(log_config.logging_stats())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization and logging cost per request.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--text-lines", type=int, default=60)
+    parser.add_argument("--log-calls", type=int, default=2000)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "response_encoding.json"))
+    args = parser.parse_args()
+
+    report = {
+        "config": vars(args),
+        "responses": bench_responses(args.requests, args.text_lines),
+        "logging": bench_logging(args.log_calls, sample_response(args.text_lines).text),
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, stats in report["responses"].items():
+        print(f"{name:<16} {stats['cpu_us_per_request']:>8.0f} us CPU/request  {stats['bytes_on_wire']:>6} bytes")
+    logs = report["logging"]
+    print(f"OCR logging per call: sync FileHandler {logs['sync_file_handler_us']:.0f} us, "
+          f"queue handler {logs['queue_handler_us']:.0f} us")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Offline benchmark suite for every stage of the quality pipeline.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--stages decode,letterbox,...] [--runs 10]
+        [--resolutions a4_150dpi,a4_300dpi] [--noise clean,noisy]
+        [--output benchmarks/results/latest.json]
+        [--compare benchmarks/baseline.json] [--tolerance 0.2] [--write-baseline]
+
+Inputs are synthetic documents generated locally (benchmarks/synthetic.py), so
+runs are reproducible without any sample data. Every stage reports throughput,
+latency percentiles and the tracemalloc peak of one call to JSON. Stages whose
+models are not installed (YOLO, OCR, end-to-end) are reported as skipped.
+
+`--compare` exits with status 1 when a stage is slower, or uses more memory,
+than the baseline by more than `--tolerance` (relative). `--write-baseline`
+stores the current report as the new baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import RESOLUTIONS, NOISE_LEVELS, generate_corpus
+
+STAGES = ["decode", "letterbox", "yolo", "metrics", "ocr", "ocr_quality", "scoring", "end_to_end"]
+
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "latest.json")
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+
+class StageSkipped(Exception):
+    """Raised while preparing a stage whose dependencies are not available."""
+
+
+def summarize(latencies_s: List[float], peak_bytes: int) -> dict:
+    latencies = np.array(latencies_s) * 1000
+    return {
+        "runs": int(latencies.size),
+        "throughput_per_s": float(latencies.size / (latencies.sum() / 1000)) if latencies.sum() else 0.0,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p90_ms": float(np.percentile(latencies, 90)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "peak_memory_mb": peak_bytes / 2 ** 20,
+    }
+
+
+def measure(fn: Callable[[], object], runs: int, warmup: int) -> dict:
+    """
+    Time `runs` calls of `fn` after `warmup` untimed calls, then measure the
+    tracemalloc peak of one more call (kept out of the timed runs, since
+    tracing slows allocations down).
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"latencies": latencies, "peak": peak}
+
+
+def _page_crop(image: np.ndarray) -> np.ndarray:
+    # The synthetic page covers the central 80% of the photo; used as the crop
+    # so the stages after detection don't depend on the detector being installed.
+    h, w = image.shape[:2]
+    return image[h // 10:h - h // 10, w // 10:w - w // 10]
+
+
+def _stage_functions(stage: str, item: dict) -> Callable[[], object]:
+    """
+    Build the zero-argument callable benchmarked for `stage` on one corpus item.
+    Raises StageSkipped when the stage can't run in this environment.
+    """
+    content = item["content"]
+
+    if stage == "decode":
+        from api.quality.pipeline import decode_for_detection
+        return lambda: decode_for_detection(content)
+
+    if stage == "letterbox":
+        from api.models.preprocess import letterbox_batch
+        from api.quality.pipeline import decode_for_detection
+        image, _ = decode_for_detection(content)
+        return lambda: letterbox_batch([image])
+
+    if stage == "yolo":
+        from api.models.yolo_inference import get_detector, locate_documents
+        from api.quality.pipeline import decode_for_detection
+        try:
+            get_detector()
+        except Exception as e:
+            raise StageSkipped(f"detector unavailable: {e}")
+        image, _ = decode_for_detection(content)
+        return lambda: locate_documents([image])
+
+    if stage == "metrics":
+        from api.config.settings import METRICS_ENGINE, METRICS_MAX_SIDE
+        from api.quality.metrics import compute_image_metrics
+        from api.quality.ocr_quality import preprocess_image, assess_binarization_quality
+        from api.quality.pipeline import decode_image
+        crop = _page_crop(decode_image(content))
+        ratios = METRICS_ENGINE != "full"
+
+        def run_metrics():
+            compute_image_metrics(crop, max_side=METRICS_MAX_SIDE, ratios=ratios)
+            _, binary_img = preprocess_image(crop, save=False)
+            if METRICS_ENGINE == "full":
+                assess_binarization_quality(binary_img)
+        return run_metrics
+
+    if stage in ("ocr", "ocr_quality"):
+        from api.quality.ocr_quality import calculate_ocr_quality, estimate_ocr_quality, get_ocr, preprocess_image
+        from api.quality.pipeline import decode_image
+        try:
+            engine = get_ocr()
+        except Exception as e:
+            raise StageSkipped(f"OCR engine unavailable: {e}")
+        _, binary_img = preprocess_image(_page_crop(decode_image(content)), save=False)
+        if stage == "ocr_quality":
+            return lambda: estimate_ocr_quality(binary_img, engine=engine)
+        return lambda: calculate_ocr_quality(binary_img, engine=engine)
+
+    if stage == "scoring":
+        from api.quality.metrics import compute_image_metrics
+        from api.quality.scoring import calculate_global_score
+        from api.quality.pipeline import decode_image
+        metrics = compute_image_metrics(_page_crop(decode_image(content)))
+        return lambda: calculate_global_score(
+            ocr_conf=85.0,
+            global_black_ratio=metrics["global_black_ratio"],
+            large_black_ratio=metrics["large_black_ratio"],
+        )
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def bench_stage(stage: str, corpus: List[dict], runs: int, warmup: int) -> dict:
+    all_latencies, peak, by_input = [], 0, {}
+    for item in corpus:
+        try:
+            fn = _stage_functions(stage, item)
+        except StageSkipped as e:
+            return {"skipped": str(e)}
+        result = measure(fn, runs, warmup)
+        by_input[item["name"]] = summarize(result["latencies"], result["peak"])
+        all_latencies.extend(result["latencies"])
+        peak = max(peak, result["peak"])
+    return {"overall": summarize(all_latencies, peak), "by_input": by_input}
+
+
+def _parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, params = entry.partition(";")
+        if params.startswith("dur="):
+            timings[name] = float(params[4:])
+    return timings
+
+
+def bench_end_to_end(corpus: List[dict], runs: int, warmup: int, mode: str = "full") -> dict:
+    """
+    POST every document to /quality-assessment/ through the ASGI app in-process
+    (lifespan included, so models, batcher and OCR pool are real). Also averages
+    the per-stage Server-Timing breakdown returned by the service.
+    """
+    from fastapi.testclient import TestClient
+    from api.app import app
+
+    url = f"/quality-assessment/?use_cache=false&mode={mode}"
+    with TestClient(app) as client:
+        probe = client.post(url, files={"image": ("probe.jpg", corpus[0]["content"], "image/jpeg")})
+        if probe.status_code != 200:
+            return {"skipped": f"endpoint returned {probe.status_code}: {probe.text[:200]}"}
+
+        all_latencies, peak, by_input = [], 0, {}
+        stage_totals: Dict[str, List[float]] = {}
+        for item in corpus:
+            files = {"image": ("document.jpg", item["content"], "image/jpeg")}
+
+            def post():
+                response = client.post(url, files=files)
+                for name, ms in _parse_server_timing(response.headers.get("Server-Timing", "")).items():
+                    stage_totals.setdefault(name, []).append(ms)
+                return response
+
+            result = measure(post, runs, warmup)
+            by_input[item["name"]] = summarize(result["latencies"], result["peak"])
+            all_latencies.extend(result["latencies"])
+            peak = max(peak, result["peak"])
+
+    return {
+        "overall": summarize(all_latencies, peak),
+        "by_input": by_input,
+        "server_timing_mean_ms": {name: float(np.mean(values)) for name, values in stage_totals.items()},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def environment() -> dict:
+    from api.config import settings
+
+    return {
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "settings": {
+            name: getattr(settings, name, None)
+            for name in ("DETECTOR_BACKEND", "METRICS_ENGINE", "METRICS_MAX_SIDE", "OCR_WORKERS",
+                         "MICROBATCH_ENABLED", "DETECT_DECODE_MIN_SIDE", "OCR_CROP_MIN_SIDE")
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Regressions of `report` against `baseline`: p95 latency and peak memory
+    more than `tolerance` higher, or throughput more than `tolerance` lower.
+    Latency changes smaller than `min_delta_ms` are ignored, so sub-millisecond
+    stages don't fail the check on timer noise.
+    """
+    regressions = []
+    for stage, current in report["stages"].items():
+        reference = baseline.get("stages", {}).get(stage, {})
+        if "overall" not in current or "overall" not in reference:
+            continue
+        cur, ref = current["overall"], reference["overall"]
+        if cur["p95_ms"] > ref["p95_ms"] * (1 + tolerance) and cur["p95_ms"] - ref["p95_ms"] > min_delta_ms:
+            regressions.append(f"{stage}: p95 {cur['p95_ms']:.1f} ms vs baseline {ref['p95_ms']:.1f} ms")
+        if (cur["throughput_per_s"] < ref["throughput_per_s"] * (1 - tolerance)
+                and cur["mean_ms"] - ref["mean_ms"] > min_delta_ms):
+            regressions.append(f"{stage}: throughput {cur['throughput_per_s']:.2f}/s "
+                               f"vs baseline {ref['throughput_per_s']:.2f}/s")
+        if cur["peak_memory_mb"] > ref["peak_memory_mb"] * (1 + tolerance) and cur["peak_memory_mb"] - ref["peak_memory_mb"] > 1:
+            regressions.append(f"{stage}: peak memory {cur['peak_memory_mb']:.1f} MB "
+                               f"vs baseline {ref['peak_memory_mb']:.1f} MB")
+    return regressions
+
+
+def _write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the quality pipeline.")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--resolutions", default=",".join(RESOLUTIONS))
+    parser.add_argument("--noise", default=",".join(NOISE_LEVELS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", default="full", choices=["full", "tiered"],
+                        help="Evaluation mode used by the end-to-end benchmark.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help="Baseline report to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="Ignore latency differences smaller than this.")
+    parser.add_argument("--write-baseline", nargs="?", const=DEFAULT_BASELINE, default=None)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.resolutions.split(","), args.noise.split(","), seed=args.seed)
+    report = {
+        "environment": environment(),
+        "config": {"runs": args.runs, "warmup": args.warmup, "seed": args.seed,
+                   "inputs": [item["name"] for item in corpus]},
+        "stages": {},
+    }
+    for stage in args.stages.split(","):
+        print(f"Benchmarking {stage}...", file=sys.stderr)
+        if stage == "end_to_end":
+            report["stages"][stage] = bench_end_to_end(corpus, args.runs, args.warmup, args.mode)
+        else:
+            report["stages"][stage] = bench_stage(stage, corpus, args.runs, args.warmup)
+
+    _write_json(args.output, report)
+    for stage, result in report["stages"].items():
+        if "skipped" in result:
+            print(f"{stage:<12} skipped ({result['skipped']})")
+        else:
+            o = result["overall"]
+            print(f"{stage:<12} {o['throughput_per_s']:>9.2f}/s  p50 {o['p50_ms']:>9.2f} ms  "
+                  f"p95 {o['p95_ms']:>9.2f} ms  peak {o['peak_memory_mb']:>8.1f} MB")
+    print(f"Report written to {args.output}")
+
+    if args.write_baseline:
+        _write_json(args.write_baseline, report)
+        print(f"Baseline written to {args.write_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("inputs") != report["config"]["inputs"]:
+            print("Warning: baseline was measured on different inputs; comparison is approximate.")
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Synthetic scanned documents for the benchmark suite.
+
+Every page is generated locally and deterministically from a seed: a white
+page with text lines, a table and a stamp, placed on a darker background
+(so the detector has a document to crop), then degraded with Gaussian noise,
+blur and skew and JPEG-encoded like a phone photo or scanner upload.
+"""
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+# (width, height) of the whole photo/scan
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "a4_150dpi": (1240, 1754),
+    "a4_300dpi": (2480, 3508),
+    "phone_12mp": (3024, 4032),
+}
+
+# Standard deviation of the additive Gaussian noise, in grey levels
+NOISE_LEVELS: Dict[str, float] = {
+    "clean": 0.0,
+    "noisy": 8.0,
+    "very_noisy": 20.0,
+}
+
+_WORDS = ["ACT", "INVOICE", "No", "DATE", "TOTAL", "VAT", "AMOUNT", "CONTRACT",
+          "SUPPLIER", "BUYER", "2024", "15.03", "RUB", "1 250,00", "SIGNATURE"]
+
+
+def _draw_page(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    page = np.full((height, width, 3), 250, dtype=np.uint8)
+    scale = width / 1240
+    margin = int(90 * scale)
+    line_height = int(38 * scale)
+    font_scale = 0.9 * scale
+    thickness = max(1, int(round(2 * scale)))
+
+    y = margin + line_height
+    table_top = int(height * 0.45)
+    table_bottom = int(height * 0.65)
+    while y < height - margin:
+        if table_top <= y <= table_bottom:
+            y = table_bottom + line_height
+            continue
+        text = " ".join(rng.choice(_WORDS, size=rng.integers(3, 9)))
+        cv2.putText(page, text, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale,
+                    (20, 20, 20), thickness, cv2.LINE_AA)
+        y += line_height
+
+    # Table grid
+    for row in np.linspace(table_top, table_bottom, 6).astype(int):
+        cv2.line(page, (margin, row), (width - margin, row), (30, 30, 30), thickness)
+    for col in np.linspace(margin, width - margin, 5).astype(int):
+        cv2.line(page, (col, table_top), (col, table_bottom), (30, 30, 30), thickness)
+
+    # Stamp
+    center = (int(width * 0.7), int(height * 0.85))
+    cv2.circle(page, center, int(110 * scale), (160, 60, 40), max(2, thickness * 2))
+    return page
+
+
+def generate_document(width: int, height: int, noise: float = 0.0, blur: int = 0,
+                      skew: float = 0.0, seed: int = 0) -> np.ndarray:
+    """
+    Generate one BGR photo of a document.
+
+    Args:
+        - width, height: Size of the whole photo in pixels
+        - noise: Standard deviation of the additive Gaussian noise
+        - blur: Gaussian blur kernel size (0 disables blurring)
+        - skew: Rotation of the page in degrees
+        - seed: Seed of the random generator (same seed, same image)
+
+    Returns:
+        - BGR image (np.ndarray, uint8)
+    """
+    rng = np.random.default_rng(seed)
+    photo = np.full((height, width, 3), (70, 85, 95), dtype=np.uint8)
+
+    page_w, page_h = int(width * 0.8), int(height * 0.8)
+    page = _draw_page(rng, page_w, page_h)
+    top, left = (height - page_h) // 2, (width - page_w) // 2
+    photo[top:top + page_h, left:left + page_w] = page
+
+    if skew:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        photo = cv2.warpAffine(photo, matrix, (width, height), borderValue=(70, 85, 95))
+    if blur:
+        photo = cv2.GaussianBlur(photo, (blur | 1, blur | 1), 0)
+    if noise:
+        noisy = photo.astype(np.float32) + rng.normal(0, noise, photo.shape).astype(np.float32)
+        photo = np.clip(noisy, 0, 255).astype(np.uint8)
+    return photo
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 90) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Failed to encode synthetic document")
+    return buffer.tobytes()
+
+
+def generate_corpus(resolutions: List[str] = None, noise_levels: List[str] = None,
+                    seed: int = 0) -> List[dict]:
+    """
+    One JPEG-encoded document per (resolution, noise level) combination.
+
+    Returns:
+        - List of dicts with `name`, `resolution`, `noise`, `width`, `height` and `content` (bytes)
+    """
+    corpus = []
+    for res_name in resolutions or list(RESOLUTIONS):
+        width, height = RESOLUTIONS[res_name]
+        for noise_name in noise_levels or list(NOISE_LEVELS):
+            image = generate_document(width, height, noise=NOISE_LEVELS[noise_name],
+                                      blur=3 if noise_name != "clean" else 0,
+                                      skew=1.5, seed=seed + len(corpus))
+            corpus.append({
+                "name": f"{res_name}/{noise_name}",
+                "resolution": res_name,
+                "noise": noise_name,
+                "width": width,
+                "height": height,
+                "content": encode_jpeg(image),
+            })
+    return corpus
@@ -1 +1,115 @@
-#augmentation if needed 
\ No newline at end of file
+"""
+Augmentation of letterboxed detector samples (images from the dataset shards,
+labels normalized to the canvas). Photometric changes mimic phone photos and
+scanner uploads; the geometric one (scale + translation) moves the labels too.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class AugmentationConfig:
+    """
+    Probabilities and ranges of each augmentation (probability 0 disables it).
+
+    Attributes:
+        - brightness, contrast: Max relative change of brightness and contrast
+        - brightness_contrast_p: Probability of a brightness/contrast change
+        - noise_std: Max standard deviation of additive Gaussian noise (grey levels)
+        - noise_p: Probability of adding noise
+        - blur_p: Probability of a Gaussian blur (3x3 or 5x5)
+        - jpeg_quality: Lowest JPEG quality of the re-encoding
+        - jpeg_p: Probability of a JPEG re-encoding
+        - scale: Max relative zoom in or out
+        - translate: Max shift, as a fraction of the canvas
+        - affine_p: Probability of the scale/translation
+    """
+    brightness: float = 0.25
+    contrast: float = 0.25
+    brightness_contrast_p: float = 0.8
+    noise_std: float = 12.0
+    noise_p: float = 0.3
+    blur_p: float = 0.2
+    jpeg_quality: int = 40
+    jpeg_p: float = 0.3
+    scale: float = 0.2
+    translate: float = 0.1
+    affine_p: float = 0.5
+
+
+def brightness_contrast(image: np.ndarray, brightness: float, contrast: float) -> np.ndarray:
+    """out = image * contrast + brightness (both as factors around 1 / offsets in grey levels)."""
+    return cv2.convertScaleAbs(image, alpha=contrast, beta=brightness)
+
+
+def gaussian_noise(image: np.ndarray, std: float, rng: np.random.Generator) -> np.ndarray:
+    noisy = image.astype(np.int16) + rng.normal(0, std, image.shape).astype(np.int16)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def jpeg_roundtrip(image: np.ndarray, quality: int) -> np.ndarray:
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR) if ok else image
+
+
+def scale_translate(image: np.ndarray, labels: np.ndarray, scale: float, dx: float,
+                    dy: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Zoom around the centre and shift the image by (dx, dy) (fractions of the
+    canvas). Boxes are clipped to the canvas; boxes left with less than 2 px
+    are dropped.
+    """
+    h, w = image.shape[:2]
+    matrix = np.array([[scale, 0, (1 - scale) * w / 2 + dx * w],
+                       [0, scale, (1 - scale) * h / 2 + dy * h]], dtype=np.float32)
+    out = cv2.warpAffine(image, matrix, (w, h), borderValue=(114, 114, 114))
+
+    if not len(labels):
+        return out, labels
+    cx = labels[:, 1] * scale + (1 - scale) / 2 + dx
+    cy = labels[:, 2] * scale + (1 - scale) / 2 + dy
+    bw, bh = labels[:, 3] * scale, labels[:, 4] * scale
+    x1, x2 = np.clip(cx - bw / 2, 0, 1), np.clip(cx + bw / 2, 0, 1)
+    y1, y2 = np.clip(cy - bh / 2, 0, 1), np.clip(cy + bh / 2, 0, 1)
+    moved = np.stack([labels[:, 0], (x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+    keep = (moved[:, 3] * w >= 2) & (moved[:, 4] * h >= 2)
+    return out, moved[keep].astype(np.float32)
+
+
+class Augmenter:
+    """
+    Random augmentation of one (image, labels) sample. Picklable, so it runs
+    inside DataLoader worker processes; each worker seeds its own generator
+    (see `seed`).
+    """
+
+    def __init__(self, config: AugmentationConfig = AugmentationConfig(), seed: Optional[int] = None):
+        self.config = config
+        self.rng = np.random.default_rng(seed)
+
+    def seed(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, image: np.ndarray, labels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        c, rng = self.config, self.rng
+        if rng.random() < c.affine_p:
+            image, labels = scale_translate(
+                image, labels,
+                scale=1 + rng.uniform(-c.scale, c.scale),
+                dx=rng.uniform(-c.translate, c.translate),
+                dy=rng.uniform(-c.translate, c.translate),
+            )
+        if rng.random() < c.brightness_contrast_p:
+            image = brightness_contrast(image, brightness=rng.uniform(-c.brightness, c.brightness) * 255,
+                                        contrast=1 + rng.uniform(-c.contrast, c.contrast))
+        if rng.random() < c.blur_p:
+            k = int(rng.choice([3, 5]))
+            image = cv2.GaussianBlur(image, (k, k), 0)
+        if rng.random() < c.noise_p:
+            image = gaussian_noise(image, rng.uniform(0, c.noise_std), rng)
+        if rng.random() < c.jpeg_p:
+            image = jpeg_roundtrip(image, rng.integers(c.jpeg_quality, 96))
+        return image, labels
@@ -0,0 +1,252 @@
+"""
+Memory-mapped, sharded detector dataset.
+
+Usage:
+    python -m model.data.dataset --images data/images --labels data/labels --output data/shards
+        [--image-size 640] [--shard-size 1024] [--workers 2]
+
+Labelled crops (YOLO label files) are decoded and letterboxed once, with the
+same geometry as inference, and stored in shards under `--output`:
+
+    index.json                 image size, shards and the source names in each
+    shard-00000.images.npy     (N, S, S, 3) uint8 letterboxed images
+    shard-00000.labels.npy     (M, 5) float32 labels of all images, concatenated
+    shard-00000.offsets.npy    (N + 1,) int64 start of each image's labels
+
+Running the command again appends only the images not in the index yet, as
+new shards, so production samples (see `retraining.update_dataset`) join the
+dataset without rebuilding it. `ShardedDataset` reads images straight from
+the memory-mapped shards; `make_loader` wraps it in a DataLoader whose worker
+processes run the augmentation.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from model.data.augmentation import AugmentationConfig, Augmenter
+from model.data.preprocessing import list_samples, load_sample
+
+logger = logging.getLogger(__name__)
+
+INDEX = "index.json"
+INDEX_VERSION = 1
+
+
+def load_index(root: str) -> Optional[dict]:
+    path = os.path.join(root, INDEX)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_index(root: str, index: dict):
+    path = os.path.join(root, INDEX)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(path + ".tmp", path)
+
+
+def _save_npy(path: str, array: np.ndarray):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def _load_sample(args):
+    return load_sample(*args)
+
+
+def _write_shard(root: str, name: str, samples: List[Tuple[str, str, str]], image_size: int,
+                 pool) -> Tuple[int, List[str], int]:
+    """
+    Decode, letterbox and write one shard. Unreadable images are skipped
+    (their rows stay unused at the end of the images file).
+
+    Returns:
+        - (images written, their source names, labels written)
+    """
+    images_path = os.path.join(root, f"{name}.images.npy")
+    images = np.lib.format.open_memmap(images_path + ".tmp", mode="w+", dtype=np.uint8,
+                                       shape=(len(samples), image_size, image_size, 3))
+    jobs = [(image_path, label_path, image_size) for _, image_path, label_path in samples]
+    results = pool.imap(_load_sample, jobs, chunksize=8) if pool is not None else map(_load_sample, jobs)
+
+    labels, offsets, sources = [], [0], []
+    for (source, image_path, _), result in zip(samples, results):
+        if result is None:
+            logger.warning(f"Skipping unreadable image {image_path}")
+            continue
+        images[len(sources)] = result[0]
+        labels.append(result[1])
+        offsets.append(offsets[-1] + len(result[1]))
+        sources.append(source)
+    images.flush()
+    del images
+    os.replace(images_path + ".tmp", images_path)
+
+    all_labels = np.concatenate(labels) if labels else np.zeros((0, 5), dtype=np.float32)
+    _save_npy(os.path.join(root, f"{name}.labels.npy"), all_labels.astype(np.float32))
+    _save_npy(os.path.join(root, f"{name}.offsets.npy"), np.array(offsets, dtype=np.int64))
+    return len(sources), sources, len(all_labels)
+
+
+def append_shards(image_dir: str, label_dir: str, root: str, image_size: int = 640,
+                  shard_size: int = 1024, workers: int = 0) -> dict:
+    """
+    Add the images of `image_dir` that aren't in the dataset yet as new shards
+    (creating the dataset on first use). The index is rewritten after every
+    shard, so an interrupted run keeps the shards already written.
+
+    Args:
+        - image_dir, label_dir: Images and YOLO label files of the same stem
+        - root: Dataset directory
+        - image_size: Letterbox size (must match an existing dataset)
+        - shard_size: Images per shard
+        - workers: Decoding processes (0 decodes in this process)
+
+    Returns:
+        - Counts of added and already present images, and shards written
+    """
+    os.makedirs(root, exist_ok=True)
+    index = load_index(root) or {"version": INDEX_VERSION, "image_size": image_size, "shards": []}
+    if index["image_size"] != image_size:
+        raise ValueError(f"Dataset {root} is letterboxed to {index['image_size']}, not {image_size}.")
+
+    known = {source for shard in index["shards"] for source in shard["sources"]}
+    samples = [s for s in list_samples(image_dir, label_dir) if s[0] not in known]
+    report = {"added": 0, "present": len(known), "shards": 0}
+
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 0 and samples else None
+    try:
+        for start in range(0, len(samples), shard_size):
+            name = f"shard-{len(index['shards']):05d}"
+            count, sources, label_count = _write_shard(root, name, samples[start:start + shard_size],
+                                                       image_size, pool)
+            index["shards"].append({"name": name, "count": count, "labels": label_count, "sources": sources})
+            _save_index(root, index)
+            report["added"] += count
+            report["shards"] += 1
+            logger.info(f"Wrote {name} with {count} images.")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return report
+
+
+class ShardedDataset(Dataset):
+    """
+    Samples of a sharded dataset as (HxWx3 uint8 image, (N, 5) labels).
+
+    Images are views into the memory-mapped shards (no decoding, no copy
+    until the transform or the collate function needs one). Shards are
+    opened lazily in each process, so the dataset can be sent to DataLoader
+    workers.
+    """
+
+    def __init__(self, root: str, transform=None):
+        index = load_index(root)
+        if index is None:
+            raise FileNotFoundError(f"No dataset index in {root}.")
+        self.root = root
+        self.transform = transform
+        self.image_size = index["image_size"]
+        self._names = [shard["name"] for shard in index["shards"]]
+        self._ends = np.cumsum([shard["count"] for shard in index["shards"]])
+        self._shards = None
+
+    def __len__(self) -> int:
+        return int(self._ends[-1]) if len(self._ends) else 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
+
+    def _open(self):
+        self._shards = [
+            (
+                np.load(os.path.join(self.root, f"{name}.images.npy"), mmap_mode="r"),
+                np.load(os.path.join(self.root, f"{name}.labels.npy")),
+                np.load(os.path.join(self.root, f"{name}.offsets.npy")),
+            )
+            for name in self._names
+        ]
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._shards is None:
+            self._open()
+        shard = int(np.searchsorted(self._ends, i, side="right"))
+        row = i - (int(self._ends[shard - 1]) if shard else 0)
+        images, labels, offsets = self._shards[shard]
+        image, sample_labels = images[row], labels[offsets[row]:offsets[row + 1]]
+        if self.transform is not None:
+            image, sample_labels = self.transform(image, sample_labels)
+        return image, sample_labels
+
+
+def collate_batch(batch) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Stack samples into a (B, 3, S, S) uint8 tensor (BGR, converted to float on
+    the training device) and a (K, 6) targets tensor of
+    [image index in batch, class, cx, cy, w, h].
+    """
+    images = torch.from_numpy(np.stack([image for image, _ in batch])).permute(0, 3, 1, 2)
+    targets = [
+        np.concatenate([np.full((len(labels), 1), i, dtype=np.float32), labels], axis=1)
+        for i, (_, labels) in enumerate(batch)
+    ]
+    return images, torch.from_numpy(np.concatenate(targets) if targets else np.zeros((0, 6), np.float32))
+
+
+def _seed_worker(worker_id: int):
+    info = torch.utils.data.get_worker_info()
+    transform = info.dataset.transform
+    if hasattr(transform, "seed"):
+        transform.seed(info.seed % 2 ** 32)
+
+
+def make_loader(root: str, batch_size: int = 16, workers: int = 2, augment: bool = True, shuffle: bool = True,
+                config: AugmentationConfig = AugmentationConfig()) -> DataLoader:
+    """
+    DataLoader over a sharded dataset; with `augment`, each worker process
+    augments its samples with its own random generator.
+    """
+    dataset = ShardedDataset(root, transform=Augmenter(config) if augment else None)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=shuffle,
+        num_workers=workers,
+        collate_fn=collate_batch,
+        worker_init_fn=_seed_worker,
+        persistent_workers=workers > 0,
+        pin_memory=torch.cuda.is_available(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or extend a memory-mapped, sharded detector dataset.")
+    parser.add_argument("--images", required=True)
+    parser.add_argument("--labels", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--image-size", type=int, default=640)
+    parser.add_argument("--shard-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = append_shards(args.images, args.labels, args.output, args.image_size, args.shard_size, args.workers)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,70 @@
-# for image resizing, or normalization. we will discuss the need of those steps later 
\ No newline at end of file
+"""
+Preprocessing of labelled detector samples: YOLO label files and letterboxing
+with the same geometry as inference (`api.models.preprocess.letterbox`).
+"""
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from api.models.preprocess import letterbox
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+
+
+def read_yolo_labels(path: str) -> np.ndarray:
+    """
+    Read a YOLO label file ("class cx cy w h" per line, coordinates normalized
+    to the image size). A missing or empty file means no objects.
+
+    Returns:
+        - float32 array of shape (N, 5)
+    """
+    if not os.path.exists(path):
+        return np.zeros((0, 5), dtype=np.float32)
+    labels = np.loadtxt(path, dtype=np.float32, ndmin=2)
+    return labels.reshape(-1, 5)
+
+
+def letterbox_labels(labels: np.ndarray, image_shape: Tuple[int, ...], scale: float,
+                     left: int, top: int, target_size: int) -> np.ndarray:
+    """
+    Map normalized labels of the original image to normalized coordinates of
+    the letterboxed canvas.
+    """
+    h, w = image_shape[:2]
+    out = labels.copy()
+    out[:, 1] = (labels[:, 1] * w * scale + left) / target_size
+    out[:, 2] = (labels[:, 2] * h * scale + top) / target_size
+    out[:, 3] = labels[:, 3] * w * scale / target_size
+    out[:, 4] = labels[:, 4] * h * scale / target_size
+    return out
+
+
+def load_sample(image_path: str, label_path: str, target_size: int = 640) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Decode an image and its labels and letterbox both to `target_size`.
+
+    Returns:
+        - (letterboxed HxWx3 uint8 image, (N, 5) labels), or None if the image can't be read
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    padded, scale, left, top = letterbox(image, target_size)
+    labels = letterbox_labels(read_yolo_labels(label_path), image.shape, scale, left, top, target_size)
+    return padded, labels
+
+
+def list_samples(image_dir: str, label_dir: str):
+    """
+    (name, image path, label path) of every image of `image_dir`, sorted by
+    name; the label is the .txt file of the same stem in `label_dir`.
+    """
+    samples = []
+    for name in sorted(os.listdir(image_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in IMAGE_EXTENSIONS:
+            samples.append((name, os.path.join(image_dir, name), os.path.join(label_dir, stem + ".txt")))
+    return samples
@@ -0,0 +1,78 @@
+"""
+Latency comparison of the detector backends on CPU.
+
+Usage:
+    python -m model.evaluation.compare_backends [--batch-sizes 1,4,8] [--runs 20] [--onnx path ...]
+
+Every backend gets the same letterboxed batches; reports mean/p50/p95 latency
+per batch and per image, plus the top-1 agreement with the PyTorch backend.
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from api.models.detector_backends import TorchDetector, OnnxDetector
+from api.models.preprocess import letterbox_batch
+
+
+def _load_images(paths, count):
+    images = [cv2.imread(p) for p in paths]
+    images = [img for img in images if img is not None]
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (1754, 1240, 3), dtype=np.uint8)]
+    return [images[i % len(images)] for i in range(count)]
+
+
+def time_backend(detector, batch: np.ndarray, runs: int, warmup: int = 3) -> dict:
+    for _ in range(warmup):
+        detector.predict(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        detector.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    return {
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "per_image_ms": float(timings.mean() / len(batch)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backend latency.")
+    parser.add_argument("--images", nargs="*", default=["tests/test_api/sample_image.jpg"])
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--onnx", nargs="*", default=["model/weights/yolov8.onnx"],
+                        help="ONNX models to compare (e.g. FP32 and INT8).")
+    args = parser.parse_args()
+
+    backends = {"torch": TorchDetector()}
+    for path in args.onnx:
+        backends[f"onnx:{path}"] = OnnxDetector(path)
+
+    report = {}
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        batch, _ = letterbox_batch(_load_images(args.images, batch_size))
+        reference = backends["torch"].predict(batch)
+        report[batch_size] = {}
+        for name, detector in backends.items():
+            stats = time_backend(detector, batch, args.runs)
+            predictions = detector.predict(batch)
+            stats["top1_class_agreement"] = float(np.mean([
+                len(p) > 0 and len(r) > 0 and int(p[0, 5]) == int(r[0, 5])
+                for p, r in zip(predictions, reference)
+            ]))
+            report[batch_size][name] = stats
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
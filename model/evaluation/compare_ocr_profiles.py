@@ -0,0 +1,140 @@
+"""
+Accuracy vs speed of the OCR profiles on a local sample set.
+
+Usage:
+    python -m model.evaluation.compare_ocr_profiles --samples path/to/samples
+        [--profiles default,upright_large_text] [--config api/config/ocr_profiles.json]
+        [--max-cer-increase 0.01] [--max-conf-drop 2.0] [--output report.json]
+
+Sample layout: one directory per YOLO class name holding cropped documents,
+each optionally with a ground-truth transcription next to it:
+
+    samples/<doc_type>/<name>.jpg
+    samples/<doc_type>/<name>.txt
+
+Every image goes through binarization (with the profile's upscale factor)
+and OCR with each profile. Reports per doc_type and profile: latency, mean
+OCR confidence and, where ground truth exists, the character error rate
+(CER). Recommends for each doc_type the fastest profile whose CER is at most
+`--max-cer-increase` above the default profile's (or, without ground truth,
+whose mean confidence is at most `--max-conf-drop` points below), and prints
+the matching "doc_types" mapping for the profiles config.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+from api.quality.ocr_profiles import DEFAULT_PROFILE, OCRProfile, load_profiles
+from api.quality.ocr_quality import create_ocr_engine, warmup_ocr_engine, calculate_ocr_quality, preprocess_image
+from model.evaluation.metrics import character_error_rate
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+
+
+def load_samples(root: str) -> Dict[str, List[dict]]:
+    """Samples by doc_type: dicts with `path` and the ground truth `text` (or None)."""
+    samples = {}
+    for doc_type in sorted(os.listdir(root)):
+        directory = os.path.join(root, doc_type)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in IMAGE_EXTENSIONS:
+                continue
+            truth_path = os.path.join(directory, stem + ".txt")
+            truth = None
+            if os.path.exists(truth_path):
+                with open(truth_path, encoding="utf-8") as f:
+                    truth = f.read()
+            samples.setdefault(doc_type, []).append({"path": os.path.join(directory, name), "text": truth})
+    return samples
+
+
+def evaluate_profile(profile: OCRProfile, samples: List[dict], engine) -> dict:
+    latencies, confidences, cers = [], [], []
+    for sample in samples:
+        image = cv2.imread(sample["path"])
+        if image is None:
+            continue
+        start = time.perf_counter()
+        _, binary_img = preprocess_image(image, save=False, upscale=profile.upscale)
+        text, average_conf, _ = calculate_ocr_quality(binary_img, engine=engine,
+                                                      use_angle_cls=profile.use_angle_cls)
+        latencies.append((time.perf_counter() - start) * 1000)
+        confidences.append(average_conf)
+        if sample["text"] is not None:
+            cers.append(character_error_rate(sample["text"], text))
+    if not latencies:
+        return {"images": 0}
+    return {
+        "images": len(latencies),
+        "mean_ms": float(np.mean(latencies)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_confidence": float(np.mean(confidences)),
+        "mean_cer": float(np.mean(cers)) if cers else None,
+        "images_with_ground_truth": len(cers),
+    }
+
+
+def recommend(results: Dict[str, dict], max_cer_increase: float, max_conf_drop: float) -> str:
+    """Fastest profile that stays within tolerance of the default profile."""
+    reference = results[DEFAULT_PROFILE]
+    candidates = []
+    for name, stats in results.items():
+        if not stats.get("images"):
+            continue
+        if reference.get("mean_cer") is not None and stats.get("mean_cer") is not None:
+            acceptable = stats["mean_cer"] <= reference["mean_cer"] + max_cer_increase
+        else:
+            acceptable = stats["mean_confidence"] >= reference["mean_confidence"] - max_conf_drop
+        if acceptable:
+            candidates.append((stats["mean_ms"], name))
+    return min(candidates)[1] if candidates else DEFAULT_PROFILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OCR profiles on a local sample set.")
+    parser.add_argument("--samples", required=True)
+    parser.add_argument("--config", default=None, help="OCR profiles config (defaults to OCR_PROFILES_PATH).")
+    parser.add_argument("--profiles", default=None, help="Comma-separated profile names (default: all).")
+    parser.add_argument("--lang", default="ru")
+    parser.add_argument("--cpu", action="store_true", help="Run OCR on CPU.")
+    parser.add_argument("--max-cer-increase", type=float, default=0.01)
+    parser.add_argument("--max-conf-drop", type=float, default=2.0)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    profiles, _ = load_profiles(args.config) if args.config else load_profiles()
+    names = args.profiles.split(",") if args.profiles else list(profiles)
+    if DEFAULT_PROFILE not in names:
+        names.insert(0, DEFAULT_PROFILE)
+    samples = load_samples(args.samples)
+
+    report = {"doc_types": {}, "recommended": {}}
+    for name in names:
+        profile = profiles[name]
+        engine = create_ocr_engine(args.lang, use_gpu=not args.cpu, profile=profile)
+        warmup_ocr_engine(engine)
+        for doc_type, items in samples.items():
+            report["doc_types"].setdefault(doc_type, {})[name] = evaluate_profile(profile, items, engine)
+        del engine
+
+    for doc_type, results in report["doc_types"].items():
+        report["recommended"][doc_type] = recommend(results, args.max_cer_increase, args.max_conf_drop)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print("\nSuggested \"doc_types\" mapping for the profiles config:")
+    print(json.dumps({k: v for k, v in report["recommended"].items() if v != DEFAULT_PROFILE}, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+def edit_distance(reference: str, hypothesis: str) -> int:
+    """Levenshtein distance between two strings (insertions, deletions, substitutions)."""
+    if len(reference) < len(hypothesis):
+        reference, hypothesis = hypothesis, reference
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char)))
+        previous = current
+    return previous[-1]
+
+
+def _normalize(text: str) -> str:
+    # Line breaks and repeated spaces depend on line segmentation, not recognition
+    return " ".join(text.split())
+
+
+def character_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Character error rate of an OCR transcription against the ground truth,
+    after whitespace normalization (0 is perfect; can exceed 1).
+    """
+    reference, hypothesis = _normalize(reference), _normalize(hypothesis)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return edit_distance(reference, hypothesis) / len(reference)
+
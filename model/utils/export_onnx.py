@@ -0,0 +1,52 @@
+"""
+Export the YOLOv8 document detector to ONNX for the ONNX Runtime backend.
+
+Usage:
+    python -m model.utils.export_onnx [--weights model/weights/yolov8.pt] [--int8]
+
+The FP32 model is written next to the weights (yolov8.onnx); with --int8 a
+dynamically quantized copy (yolov8.int8.onnx) is written as well. Point
+ONNX_MODEL_PATH at the file to use and set DETECTOR_BACKEND=onnx.
+"""
+import argparse
+import os
+
+from ultralytics import YOLO
+
+
+def export_onnx(weights_path: str, imgsz: int = 640, opset: int = 17) -> str:
+    """
+    Export with a dynamic batch axis so the micro-batcher can send any batch size.
+    """
+    model = YOLO(weights_path)
+    return model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, opset=opset)
+
+
+def quantize_int8(onnx_path: str) -> str:
+    """
+    Dynamic INT8 weight quantization (no calibration set needed).
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    root, ext = os.path.splitext(onnx_path)
+    int8_path = f"{root}.int8{ext}"
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the document detector to ONNX.")
+    parser.add_argument("--weights", default=os.path.join("model", "weights", "yolov8.pt"))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--int8", action="store_true", help="Also write an INT8-quantized model.")
+    args = parser.parse_args()
+
+    onnx_path = export_onnx(args.weights, args.imgsz, args.opset)
+    print(f"ONNX model written to: {onnx_path}")
+    if args.int8:
+        print(f"INT8 model written to: {quantize_int8(onnx_path)}")
+
+
+if __name__ == "__main__":
+    main()
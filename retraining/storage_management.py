@@ -1 +1,139 @@
-# logic for storing/retreiving datasets
\ No newline at end of file
+# logic for storing/retreiving datasets
+"""
+Retention of stored images (e.g. the document crops kept for retraining).
+
+A directory is trimmed by age, then by file count and total size, always
+deleting the least recently used files first (mtime; the crop writer touches
+a file again when the same crop is seen).
+
+Usage:
+    python -m retraining.storage_management --dir api/static/cropped_docs
+        [--max-age-days 30] [--max-gb 5] [--max-files 100000] [--dry-run]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits for a storage directory; 0 disables a limit."""
+    max_age_s: float = 0
+    max_bytes: int = 0
+    max_files: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age_s or self.max_bytes or self.max_files)
+
+
+def scan_directory(directory: str) -> List[Tuple[str, int, float]]:
+    """
+    List the regular files of `directory` (non-recursive).
+
+    Returns:
+        - List of (path, size in bytes, mtime), oldest first
+    """
+    files = []
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return files
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False) and not entry.name.endswith(".tmp"):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((entry.path, stat.st_size, stat.st_mtime))
+            except FileNotFoundError:
+                continue  # deleted concurrently
+    files.sort(key=lambda f: f[2])
+    return files
+
+
+def disk_usage(directory: str) -> dict:
+    """
+    File count, total size and age of the oldest file in `directory`.
+    """
+    files = scan_directory(directory)
+    return {
+        "files": len(files),
+        "bytes": sum(size for _, size, _ in files),
+        "oldest_age_s": time.time() - files[0][2] if files else 0.0,
+    }
+
+
+def enforce_retention(directory: str, policy: RetentionPolicy, dry_run: bool = False) -> dict:
+    """
+    Delete files of `directory` until it satisfies `policy`.
+
+    Args:
+        - directory: Directory to trim
+        - policy: Age, size and count limits
+        - dry_run: Only report what would be deleted
+
+    Returns:
+        - Dict with the number of removed files/bytes and the remaining usage
+    """
+    files = scan_directory(directory)
+    total_bytes = sum(size for _, size, _ in files)
+    now = time.time()
+    removed_files = removed_bytes = 0
+
+    # Files that could not be deleted stay, and keep counting against the limits
+    undeletable = []
+    keep_from = len(files)
+    for i, (path, size, mtime) in enumerate(files):
+        expired = policy.max_age_s and now - mtime > policy.max_age_s
+        too_many = policy.max_files and len(files) - removed_files > policy.max_files
+        too_big = policy.max_bytes and total_bytes - removed_bytes > policy.max_bytes
+        if not (expired or too_many or too_big):
+            keep_from = i
+            break
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not delete {path}: {e}")
+                undeletable.append(files[i])
+                continue
+        removed_files += 1
+        removed_bytes += size
+
+    remaining = undeletable + files[keep_from:]
+    if removed_files:
+        logger.info(f"Retention removed {removed_files} files ({removed_bytes} bytes) from {directory}")
+    return {
+        "removed_files": removed_files,
+        "removed_bytes": removed_bytes,
+        "files": len(remaining),
+        "bytes": total_bytes - removed_bytes,
+        "oldest_age_s": now - remaining[0][2] if remaining else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a retention policy to a storage directory.")
+    parser.add_argument("--dir", required=True)
+    parser.add_argument("--max-age-days", type=float, default=0)
+    parser.add_argument("--max-gb", type=float, default=0)
+    parser.add_argument("--max-files", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    policy = RetentionPolicy(max_age_s=args.max_age_days * 86400,
+                             max_bytes=int(args.max_gb * 1024 ** 3),
+                             max_files=args.max_files)
+    print(json.dumps(enforce_retention(args.dir, policy, dry_run=args.dry_run), indent=2))
+
+
+if __name__ == "__main__":
+    main()
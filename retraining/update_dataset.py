@@ -1 +1,133 @@
-# the script to update the dataset with new data
\ No newline at end of file
+"""
+Add new images to a training dataset, skipping near-duplicates.
+
+Usage:
+    python -m retraining.update_dataset --source api/static/cropped_docs --dataset data/new_docs
+        [--max-distance 6] [--dhash-max-distance 10] [--dry-run] [--shards data/shards]
+
+Images of `--source` (e.g. the crops stored by the API) are copied into
+`--dataset`/images, together with a YOLO label file of the same name when one
+exists next to the image. An image is skipped when its perceptual hash is
+within the distance thresholds of an image already in the dataset or copied
+earlier in the same run, so re-uploads and rescans of one document don't end
+up as many training samples. The dataset's hashes are kept in
+`--dataset`/phash_index.sqlite3 and only new images are hashed on later runs.
+
+With `--shards`, the images added are also appended to that memory-mapped
+training dataset (see `model.data.dataset`) as new shards.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+
+import cv2
+
+from api.cache.phash_index import PerceptualIndex, image_hashes, format_hashes
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp")
+
+
+def _images(directory: str):
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            yield name
+
+
+def update_dataset(source: str, dataset: str, max_distance: int = 6, dhash_max_distance: int = 10,
+                   dry_run: bool = False) -> dict:
+    """
+    Copy the images of `source` that are not near-duplicates into `dataset`.
+
+    Args:
+        - source: Directory of candidate images
+        - dataset: Dataset root (images go to <dataset>/images, labels to <dataset>/labels)
+        - max_distance: pHash Hamming distance (bits) up to which images are duplicates
+        - dhash_max_distance: dHash Hamming distance that must also hold
+        - dry_run: Only report what would be copied
+
+    Returns:
+        - Counts of added, duplicate and unreadable images, and the duplicates found
+    """
+    images_dir = os.path.join(dataset, "images")
+    labels_dir = os.path.join(dataset, "labels")
+    if not dry_run:
+        os.makedirs(images_dir, exist_ok=True)
+        os.makedirs(labels_dir, exist_ok=True)
+
+    index_path = None if dry_run else os.path.join(dataset, "phash_index.sqlite3")
+    index = PerceptualIndex(max_distance=max_distance, dhash_max_distance=dhash_max_distance,
+                            max_entries=2 ** 31, sqlite_path=index_path)
+    # Images copied in by other means are hashed once and then remembered;
+    # images deleted from the dataset are forgotten
+    present = set(_images(images_dir))
+    known = set(index.keys())
+    for name in known - present:
+        index.remove(name)
+    for name in sorted(present):
+        if name not in known:
+            image = cv2.imread(os.path.join(images_dir, name))
+            if image is not None:
+                index.add(name, image_hashes(image))
+
+    report = {"added": 0, "duplicates": 0, "unreadable": 0, "duplicate_of": {}}
+    for name in _images(source):
+        path = os.path.join(source, name)
+        image = cv2.imread(path)
+        if image is None:
+            report["unreadable"] += 1
+            continue
+        hashes = image_hashes(image)
+        match = index.find(hashes)
+        if match is not None:
+            report["duplicates"] += 1
+            report["duplicate_of"][name] = match[0]
+            continue
+
+        target = name
+        if os.path.exists(os.path.join(images_dir, target)):
+            # Same name, different content: keep both
+            stem, ext = os.path.splitext(name)
+            target = f"{stem}_{format_hashes(hashes)[:8]}{ext}"
+        index.add(target, hashes)
+        report["added"] += 1
+        if dry_run:
+            continue
+        shutil.copy2(path, os.path.join(images_dir, target))
+        label = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(label):
+            shutil.copy2(label, os.path.join(labels_dir, os.path.splitext(target)[0] + ".txt"))
+
+    index.close()
+    logger.info(f"Added {report['added']} images, skipped {report['duplicates']} near-duplicates.")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new images to a dataset, skipping near-duplicates.")
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--dataset", required=True)
+    parser.add_argument("--max-distance", type=int, default=6)
+    parser.add_argument("--dhash-max-distance", type=int, default=10)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--shards", default=None, help="Sharded training dataset to append the new images to.")
+    parser.add_argument("--image-size", type=int, default=640)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    report = update_dataset(args.source, args.dataset, args.max_distance, args.dhash_max_distance, args.dry_run)
+    if args.shards and not args.dry_run and report["added"]:
+        from model.data.dataset import append_shards
+
+        report["shards"] = append_shards(os.path.join(args.dataset, "images"), os.path.join(args.dataset, "labels"),
+                                         args.shards, image_size=args.image_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Test for memory-budget admission control
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from api.quality import stages
+from api.quality.stages import MemoryBudget, admission_chunks
+
+MB = 1024 * 1024
+
+
+def test_request_over_budget_gets_503_after_max_wait():
+    async def run():
+        budget = MemoryBudget(100 * MB, max_wait_s=0.05, retry_after_s=7)
+        await budget.acquire(80 * MB)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        with pytest.raises(HTTPException) as rejected:
+            await budget.acquire(30 * MB)
+        return budget, loop.time() - started, rejected.value
+
+    budget, waited, error = asyncio.run(run())
+    assert error.status_code == 503 and error.headers["Retry-After"] == "7"
+    assert waited >= 0.05
+    assert budget.rejected == 1 and budget.in_flight_bytes == 80 * MB
+
+
+def test_waiting_request_is_admitted_once_memory_is_released():
+    async def run():
+        budget = MemoryBudget(100 * MB, max_wait_s=1)
+        await budget.acquire(80 * MB)
+        waiting = asyncio.create_task(budget.acquire(30 * MB))
+        await asyncio.sleep(0.01)
+        await budget.release(80 * MB)
+        await waiting
+        return budget
+
+    budget = asyncio.run(run())
+    assert budget.in_flight_bytes == 30 * MB and budget.rejected == 0
+
+
+def test_oversized_request_is_admitted_only_when_idle():
+    async def run():
+        budget = MemoryBudget(100 * MB, max_wait_s=0.01)
+        async with budget.reserve(500 * MB):
+            assert budget.in_flight_bytes == 500 * MB
+            with pytest.raises(HTTPException):
+                await budget.acquire(500 * MB)
+        return budget
+
+    budget = asyncio.run(run())
+    assert budget.in_flight == 0 and budget.in_flight_bytes == 0
+
+
+def test_batch_is_admitted_in_chunks_of_a_budget_share(monkeypatch):
+    monkeypatch.setattr(stages, "_budget", MemoryBudget(100 * MB))
+    monkeypatch.setattr(stages, "BATCH_ADMISSION_SHARE", 0.25)
+    estimates = {0: 10 * MB, 1: 10 * MB, 2: 10 * MB, 3: 40 * MB, 4: 5 * MB}
+    assert admission_chunks(estimates) == [[0, 1], [2], [3], [4]]
@@ -0,0 +1,45 @@
+# Test for rescoring stored bulk-scoring records
+import pytest
+
+from api.bulk_score import rescore, rescore_record, write_chunk
+from api.quality.scoring import SCORING_VERSION
+
+RECORD = {
+    "average_confidence": 90.0,
+    "global_black_ratio": "20.00%",
+    "large_black_region_ratio": "5.00%",
+    "global_black_percent": 20.004,
+    "large_black_region_percent": 5.004,
+    "global_score": 75.0,
+    "quality_category": "Excellent",
+}
+
+
+def test_rescore_uses_raw_percentages_and_new_weights():
+    rescored = rescore_record(RECORD, {"alpha": 1.0, "beta": 1.0, "gamma": 2.0})
+    assert rescored["global_score"] == pytest.approx(90.0 - 20.004 - 2 * 5.004)
+    assert rescored["quality_category"] == "Moderate"
+    assert rescored["scoring_version"] == SCORING_VERSION
+    assert rescored["average_confidence"] == 90.0 and RECORD["global_score"] == 75.0
+
+
+def test_rescore_old_records_errors_and_cheap_tier():
+    old = {k: v for k, v in RECORD.items() if not k.endswith("_percent")}
+    assert rescore_record(old, {})["global_score"] == pytest.approx(90.0 - 0.5 * 20.0 - 5.0)
+
+    failed = {"path": "a.jpg", "error": "unreadable"}
+    assert rescore_record(failed, {}) is failed
+
+    cheap = rescore_record({**RECORD, "evaluation_tier": "cheap"}, {})
+    assert cheap["quality_category"] == "Poor"
+
+
+def test_rescore_run_counts_changed_categories(tmp_path):
+    source, output = tmp_path / "run", tmp_path / "rescored"
+    source.mkdir()
+    write_chunk([RECORD, {"path": "a.jpg", "error": "unreadable"}], str(source), 0, "jsonl")
+    summary = rescore(str(source), str(output), {"alpha": 0.5})
+    assert summary["records"] == 2 and summary["chunks"] == 1
+    # 45 - 10 - 5 = 30: Excellent -> Poor
+    assert summary["changed_category"] == 1
+    assert (output / "part-00000.jsonl").exists()
@@ -0,0 +1,44 @@
+# Test for the queued logging setup
+import logging
+import os
+
+import pytest
+
+from api.config import logging as log_config
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+@pytest.fixture
+def queued_log(tmp_path):
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    log_config.stop_logging()
+    log_config._listener = None
+    path = tmp_path / "app.log"
+    log_config.setup_logging(str(path))
+    yield path
+    log_config.stop_logging()
+    root.handlers, root.level = saved
+
+
+def test_forked_child_records_are_written(queued_log):
+    logger = logging.getLogger("tests.logging")
+    logger.info("record from parent")
+    pid = os.fork()
+    if pid == 0:
+        # Never return into pytest from the child
+        code = 2
+        try:
+            logger.info("record from child %d", os.getpid())
+            log_config.stop_logging()
+            code = 0 if log_config.logging_stats() == {"queued": 0, "dropped": 0} else 1
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    log_config.stop_logging()
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    text = queued_log.read_text()
+    assert "record from parent" in text
+    assert f"record from child {pid}" in text
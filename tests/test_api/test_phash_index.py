@@ -0,0 +1,43 @@
+# Test for the near-duplicate perceptual-hash index
+from api.cache.phash_index import PerceptualIndex
+
+
+def _flip(value: int, *bits: int) -> int:
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+P = 0x0123456789ABCDEF
+D = 0xFEDCBA9876543210
+
+
+def test_match_within_hamming_radius():
+    index = PerceptualIndex(max_distance=6, dhash_max_distance=10)
+    index.add("page", (P, D), doc_type="passport")
+    # Six flipped bits spread over all four 16-bit chunks
+    key, _, distance = index.find((_flip(P, 0, 17, 33, 34, 49, 63), D), doc_type="passport")
+    assert key == "page" and distance == 6
+
+
+def test_no_match_beyond_radius_or_across_filters():
+    index = PerceptualIndex(max_distance=6, dhash_max_distance=10)
+    index.add("page", (P, D), doc_type="passport", variant="full")
+    assert index.find((_flip(P, *range(7)), D)) is None
+    assert index.find((P, _flip(D, *range(11)))) is None
+    assert index.find((P, D), doc_type="invoice") is None
+    assert index.find((P, D), variant="tiered") is None
+    assert index.find((P, D), doc_type="passport", variant="full")[0] == "page"
+
+
+def test_closest_entry_wins_and_lru_bound(tmp_path):
+    index = PerceptualIndex(max_distance=6, max_entries=2, sqlite_path=str(tmp_path / "index.sqlite3"))
+    index.add("far", (_flip(P, 1, 2, 3), D))
+    index.add("near", (_flip(P, 1), D))
+    assert index.find((P, D))[0] == "near"
+    index.add("third", (~P & (2 ** 64 - 1), D))
+    assert set(index.keys()) == {"near", "third"} and index.stats()["evictions"] == 1
+    index.close()
+
+    # The persisted entries (and only those) come back
+    assert set(PerceptualIndex(max_entries=2, sqlite_path=str(tmp_path / "index.sqlite3")).keys()) == {"near", "third"}
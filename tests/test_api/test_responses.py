@@ -0,0 +1,47 @@
+# Test for response encoding
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+from api.endpoints.responses import accepts_gzip
+from api.schemas.quality import BatchItemResult, BatchQualityResponse
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("x-gzip", True),
+    ("*", True),
+    ("", False),
+    ("identity", False),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("*;q=0", False),
+    ("gzip;q=0, *", False),
+    ("deflate, *;q=0.5", True),
+])
+def test_accepts_gzip_honours_q_values(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_large_bodies_are_gzipped_off_the_loop(monkeypatch):
+    from api.endpoints import responses
+
+    threads = []
+    compress = responses._gzip
+
+    def recording_gzip(body):
+        threads.append(threading.current_thread())
+        return compress(body)
+
+    monkeypatch.setattr(responses, "RESPONSE_GZIP_THREAD_MIN_BYTES", 1024)
+    monkeypatch.setattr(responses, "_gzip", recording_gzip)
+    batch = BatchQualityResponse(items=[BatchItemResult(index=i, error="x" * 100) for i in range(50)])
+    response = asyncio.run(responses.batch_response(batch, None, "gzip"))
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(json.loads(gzip.decompress(response.body))["items"]) == 50
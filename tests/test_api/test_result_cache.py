@@ -0,0 +1,46 @@
+# Test for the result cache
+import time
+
+from api.cache import result_cache
+from api.cache.result_cache import ResultCache
+from api.schemas.quality import DocumentQualityResponse
+
+
+def _response(score: float = 70.0) -> DocumentQualityResponse:
+    return DocumentQualityResponse(
+        doc_type="passport", confidence=0.9, text="", average_confidence=score,
+        ocr_quality_assessment="Moderate readability", global_black_ratio="5.00%",
+        large_black_region_ratio="1.00%", binarization_quality="ok",
+        global_score=score, quality_category="Excellent",
+    )
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now)
+    cache = ResultCache(ttl_s=60, sqlite_path=str(tmp_path / "results.sqlite3"))
+    cache.put("key", _response())
+    assert cache.get("key").global_score == 70.0
+
+    # Expired in memory and in the persistent tier alike
+    now += 61
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 1
+
+
+def test_persistent_tier_serves_a_new_process(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    ResultCache(sqlite_path=path).put("key", _response(55.0))
+    reopened = ResultCache(sqlite_path=path)
+    assert reopened.get("key").global_score == 55.0
+    assert reopened.stats()["persistent_hits"] == 1
+
+
+def test_key_depends_on_content_and_variant(monkeypatch):
+    key = ResultCache.make_key(b"page", variant="full")
+    assert ResultCache.make_key(b"page", variant="full") == key
+    assert ResultCache.make_key(b"page", variant="tiered") != key
+    assert ResultCache.make_key(b"other page", variant="full") != key
+    # Results of another metrics engine are never served
+    monkeypatch.setattr(result_cache, "METRICS_ENGINE", "pyramid" if result_cache.METRICS_ENGINE == "full" else "full")
+    assert ResultCache.make_key(b"page", variant="full") != key
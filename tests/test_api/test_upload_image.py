@@ -1 +1,52 @@
-# Test for image uppload endpoint
\ No newline at end of file
+# Test for image uppload endpoint
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from api.models import utils
+from api.models.utils import UploadLimitMiddleware, read_upload_limited, request_body_limit
+
+# Uploads that reached the handler
+handled = []
+
+app = FastAPI()
+app.add_middleware(UploadLimitMiddleware)
+
+
+@app.post("/upload/")
+async def upload(image: UploadFile = File(...)):
+    handled.append(image.filename)
+    content = await read_upload_limited(image)
+    return {"bytes": len(content)}
+
+
+def _multipart(size: int):
+    return {"image": ("page.jpg", b"\xff" * size, "image/jpeg")}
+
+
+def test_upload_within_limit(monkeypatch):
+    monkeypatch.setattr(utils, "MAX_UPLOAD_BYTES", 1000)
+    response = TestClient(app).post("/upload/", files=_multipart(1000))
+    assert response.status_code == 200
+    assert response.json() == {"bytes": 1000}
+
+
+def test_oversized_content_length_rejected_before_parsing(monkeypatch):
+    monkeypatch.setattr(utils, "MAX_UPLOAD_BYTES", 1000)
+    handled.clear()
+    response = TestClient(app).post("/upload/", files=_multipart(request_body_limit("/upload/")))
+    assert response.status_code == 413
+    assert handled == []
+
+
+def test_oversized_chunked_body_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(utils, "MAX_UPLOAD_BYTES", 1000)
+    handled.clear()
+    boundary = "limit-test"
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="page.jpg"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + b"\xff" * 200_000 + f"\r\n--{boundary}--\r\n".encode()
+    chunks = (body[i:i + 4096] for i in range(0, len(body), 4096))
+    response = TestClient(app).post(
+        "/upload/", content=chunks, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    )
+    assert response.status_code == 413
+    assert handled == []
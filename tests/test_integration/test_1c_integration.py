@@ -1 +1,153 @@
-# test 1c integration
\ No newline at end of file
+# test 1c integration
+import asyncio
+import importlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+integration = importlib.import_module("1c_integration.integration")
+from api.jobs.store import JobStore, DONE, CALLBACK_PENDING, CALLBACK_DELIVERED, CALLBACK_FAILED
+from api.jobs.worker import callback_item
+
+# pid recorded as the owner of claimed jobs
+WORKER = 1000
+
+
+class _StubOneC(BaseHTTPRequestHandler):
+    """Local 1C stub: fails the first `fail_first` requests with 503, then accepts."""
+    fail_first = 0
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append({"headers": dict(self.headers), "body": body})
+        status = 503 if len(type(self).requests) <= type(self).fail_first else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    _StubOneC.requests = []
+    _StubOneC.fail_first = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOneC)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/1c", _StubOneC
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "payloads"))
+    yield store
+    store.close()
+
+
+def _send(url, items, **kwargs):
+    async def run():
+        client = integration.OneCClient(base_url=url, backoff_s=0.01, **kwargs)
+        try:
+            return await client.send_results(items)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_client_retries_and_sends_stable_idempotency_key(stub_server):
+    url, stub = stub_server
+    stub.fail_first = 2
+    items = [{"job_id": "b", "idempotency_key": "b"}, {"job_id": "a", "idempotency_key": "a"}]
+
+    assert _send(url, items, max_retries=3)
+    assert len(stub.requests) == 3
+    keys = {r["headers"]["Idempotency-Key"] for r in stub.requests}
+    assert keys == {integration.batch_idempotency_key(["a", "b"])}
+    assert stub.requests[-1]["body"]["results"] == items
+
+
+def test_client_gives_up_after_max_retries(stub_server):
+    url, stub = stub_server
+    stub.fail_first = 10
+
+    assert not _send(url, [{"idempotency_key": "x"}], max_retries=1)
+    assert len(stub.requests) == 2
+
+
+def test_job_store_survives_reopen_and_is_idempotent(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "payloads"))
+    job, created = store.submit(b"data", "a.jpg", "full", callback_url=None, idempotency_key="k1")
+    again, created_again = store.submit(b"data", "a.jpg", "full", callback_url=None, idempotency_key="k1")
+    assert created and not created_again and again["id"] == job["id"]
+    assert store.claim_next(WORKER, 60)["id"] == job["id"]
+    store.close()
+
+    # A job left running by a crash goes back to the queue
+    reopened = JobStore(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "payloads"))
+    assert reopened.requeue_running(WORKER) == 1
+    claimed = reopened.claim_next(WORKER, 60)
+    assert claimed["id"] == job["id"] and claimed["attempts"] == 2
+    assert reopened.read_payload(claimed) == b"data"
+    reopened.close()
+
+
+def test_finished_job_is_delivered_to_stub(store, stub_server):
+    url, stub = stub_server
+    job, _ = store.submit(b"data", "a.jpg", "full", callback_url=url)
+    store.claim_next(WORKER, 60)
+    store.complete(job["id"], {"global_score": 70.0})
+
+    due = store.due_callbacks(10)
+    assert [j["id"] for j in due] == [job["id"]] and due[0]["status"] == DONE
+    assert due[0]["callback_status"] == CALLBACK_PENDING
+
+    assert _send(url, [callback_item(j) for j in due])
+    store.mark_callbacks_delivered([job["id"]])
+    assert store.get(job["id"])["callback_status"] == CALLBACK_DELIVERED
+    assert stub.requests[0]["body"]["results"][0]["result"] == {"global_score": 70.0}
+
+
+def test_callback_marked_failed_after_max_attempts(store):
+    job, _ = store.submit(b"data", None, "full", callback_url="http://unused")
+    store.claim_next(WORKER, 60)
+    store.fail(job["id"], "bad input", retry=False)
+
+    store.reschedule_callbacks([job["id"]], delay_s=0, max_attempts=2)
+    assert store.get(job["id"])["callback_status"] == CALLBACK_PENDING
+    store.reschedule_callbacks([job["id"]], delay_s=0, max_attempts=2)
+    assert store.get(job["id"])["callback_status"] == CALLBACK_FAILED
+
+
+def test_retried_job_waits_for_its_backoff(store):
+    job, _ = store.submit(b"data", None, "full", callback_url=None)
+    store.claim_next(WORKER, 60)
+    store.fail(job["id"], "1C unavailable", retry=True, delay_s=60)
+    assert store.get(job["id"])["status"] == "queued"
+    assert store.claim_next(WORKER, 60) is None
+
+    store.fail(job["id"], "1C unavailable", retry=True, delay_s=0)
+    assert store.claim_next(WORKER, 60)["id"] == job["id"]
+
+
+def test_requeue_leaves_live_siblings_jobs_alone(store):
+    mine, _ = store.submit(b"data", None, "full", callback_url=None)
+    sibling, _ = store.submit(b"data", None, "full", callback_url=None)
+    store.claim_next(WORKER, 60)
+    store.claim_next(WORKER + 1, 60)
+    assert store.requeue_running(WORKER) == 1
+    assert store.get(mine["id"])["status"] == "queued"
+    assert store.get(sibling["id"])["status"] == "running"
+
+    # A sibling that stops renewing its lease is treated as crashed
+    store.renew_leases(WORKER + 1, -1)
+    assert store.requeue_running(WORKER, expired_only=True) == 1
+    assert store.get(sibling["id"])["status"] == "queued"
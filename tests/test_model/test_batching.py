@@ -0,0 +1,51 @@
+# Test for the detection micro-batcher
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")
+
+from api.models.batching import MicroBatcher
+
+
+def _echo_batches(batches):
+    # Records every batch and returns one result per image
+    def infer(images):
+        batches.append(list(images))
+        return [{"image": image} for image in images]
+    return infer
+
+
+def test_full_batch_is_dispatched_without_waiting():
+    batches = []
+
+    async def run():
+        batcher = MicroBatcher(_echo_batches(batches), max_batch_size=4, max_wait_ms=10_000)
+        await batcher.start()
+        try:
+            return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), 2)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(run())
+    assert results == [{"image": i} for i in range(4)]
+    assert batches == [[0, 1, 2, 3]]
+
+
+def test_partial_batch_is_dispatched_after_max_wait():
+    batches = []
+
+    async def run():
+        batcher = MicroBatcher(_echo_batches(batches), max_batch_size=8, max_wait_ms=50)
+        await batcher.start()
+        try:
+            first = await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+            second = await batcher.submit("c")
+            return first, second, batcher.stats()
+        finally:
+            await batcher.stop()
+
+    first, second, stats = asyncio.run(run())
+    assert first == [{"image": "a"}, {"image": "b"}] and second == {"image": "c"}
+    assert batches == [["a", "b"], ["c"]]
+    assert stats["batch_size_histogram"] == {1: 1, 2: 1}
@@ -0,0 +1,67 @@
+# Test for the memory-mapped sharded detector dataset
+import cv2
+import numpy as np
+import pytest
+
+from model.data.dataset import ShardedDataset, append_shards, collate_batch, load_index
+from model.data.preprocessing import load_sample
+
+SIZE = 64
+
+
+def _write_sample(image_dir, label_dir, stem, shape, labels):
+    rng = np.random.default_rng(len(stem) + shape[0])
+    cv2.imwrite(str(image_dir / f"{stem}.png"), rng.integers(0, 256, (*shape, 3), dtype=np.uint8))
+    if labels:
+        (label_dir / f"{stem}.txt").write_text("\n".join(" ".join(map(str, row)) for row in labels))
+
+
+@pytest.fixture
+def sources(tmp_path):
+    image_dir, label_dir = tmp_path / "images", tmp_path / "labels"
+    image_dir.mkdir()
+    label_dir.mkdir()
+    _write_sample(image_dir, label_dir, "a", (40, 80), [[0, 0.5, 0.5, 0.2, 0.4]])
+    _write_sample(image_dir, label_dir, "b", (90, 30), [[0, 0.3, 0.3, 0.1, 0.1], [1, 0.7, 0.6, 0.2, 0.3]])
+    _write_sample(image_dir, label_dir, "c", (64, 64), [])
+    return image_dir, label_dir
+
+
+def _assert_round_trip(dataset, image_dir, label_dir, names):
+    assert len(dataset) == len(names)
+    for i, name in enumerate(names):
+        image, labels = dataset[i]
+        expected_image, expected_labels = load_sample(str(image_dir / f"{name}.png"),
+                                                      str(label_dir / f"{name}.txt"), SIZE)
+        assert isinstance(image, np.memmap)
+        np.testing.assert_array_equal(image, expected_image)
+        np.testing.assert_allclose(labels, expected_labels)
+
+
+def test_append_and_read_back(sources, tmp_path):
+    image_dir, label_dir = sources
+    root = tmp_path / "dataset"
+    report = append_shards(str(image_dir), str(label_dir), str(root), image_size=SIZE, shard_size=2)
+    assert report == {"added": 3, "present": 0, "shards": 2}
+    assert [shard["sources"] for shard in load_index(str(root))["shards"]] == [["a.png", "b.png"], ["c.png"]]
+    _assert_round_trip(ShardedDataset(str(root)), image_dir, label_dir, ["a", "b", "c"])
+
+    images, targets = collate_batch([ShardedDataset(str(root))[i] for i in range(3)])
+    assert images.shape == (3, 3, SIZE, SIZE) and targets.shape == (3, 6)
+    assert targets[:, 0].tolist() == [0, 1, 1]
+
+
+def test_append_only_adds_new_images(sources, tmp_path):
+    image_dir, label_dir = sources
+    root = tmp_path / "dataset"
+    append_shards(str(image_dir), str(label_dir), str(root), image_size=SIZE, shard_size=2)
+
+    _write_sample(image_dir, label_dir, "d", (50, 70), [[2, 0.5, 0.5, 0.5, 0.5]])
+    (image_dir / "e.png").write_bytes(b"not an image")
+    report = append_shards(str(image_dir), str(label_dir), str(root), image_size=SIZE, shard_size=2)
+    assert report == {"added": 1, "present": 3, "shards": 1}
+    assert load_index(str(root))["shards"][-1]["sources"] == ["d.png"]
+    _assert_round_trip(ShardedDataset(str(root)), image_dir, label_dir, ["a", "b", "c", "d"])
+
+    with pytest.raises(ValueError):
+        append_shards(str(image_dir), str(label_dir), str(root), image_size=SIZE * 2)
@@ -1 +1,62 @@
-# Test for model inference
\ No newline at end of file
+# Test for model inference
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("torch")
+
+from api.config.settings import DETECTOR_WEIGHTS_PATH, ONNX_MODEL_PATH
+from api.models.preprocess import letterbox_batch
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(__file__), "..", "test_api", "sample_image.jpg")
+
+requires_weights = pytest.mark.skipif(
+    not (os.path.exists(DETECTOR_WEIGHTS_PATH) and os.path.exists(ONNX_MODEL_PATH)),
+    reason="detector weights and exported ONNX model are required",
+)
+
+
+def _box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+@requires_weights
+def test_onnx_backend_matches_torch_backend():
+    pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    from api.models.detector_backends import TorchDetector, OnnxDetector
+
+    image = cv2.imread(SAMPLE_IMAGE)
+    batch, _ = letterbox_batch([image, cv2.flip(image, 1)])
+
+    torch_detector = TorchDetector()
+    onnx_detector = OnnxDetector()
+    assert onnx_detector.names == torch_detector.names
+
+    for expected, actual in zip(torch_detector.predict(batch), onnx_detector.predict(batch)):
+        assert len(expected) > 0 and len(actual) > 0
+        assert int(actual[0, 5]) == int(expected[0, 5])
+        assert actual[0, 4] == pytest.approx(expected[0, 4], abs=0.02)
+        assert _box_iou(actual[0, :4], expected[0, :4]) > 0.95
+
+
+def test_postprocess_keeps_best_box_per_class():
+    from api.models.detector_backends import postprocess_yolov8
+
+    # Two overlapping anchors of class 0 and one of class 1 (4 box coords + 2 class scores)
+    output = np.zeros((1, 6, 3), dtype=np.float32)
+    output[0, :4, 0] = [100, 100, 50, 50]
+    output[0, :4, 1] = [102, 102, 50, 50]
+    output[0, :4, 2] = [102, 102, 50, 50]
+    output[0, 4, 0], output[0, 4, 1] = 0.9, 0.8
+    output[0, 5, 2] = 0.7
+
+    detections = postprocess_yolov8(output, conf_threshold=0.25, iou_threshold=0.7)[0]
+    assert detections[:, 5].tolist() == [0, 1]
+    assert detections[0, 4] == pytest.approx(0.9)
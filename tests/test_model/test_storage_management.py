@@ -0,0 +1,51 @@
+# Test for the retention of stored crops
+import os
+import time
+
+from retraining import storage_management
+from retraining.storage_management import RetentionPolicy, enforce_retention
+
+
+def _make_files(directory, ages_s):
+    # One 10-byte file per age, oldest first
+    now = time.time()
+    paths = []
+    for i, age in enumerate(ages_s):
+        path = os.path.join(directory, f"crop_{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        os.utime(path, (now - age, now - age))
+        paths.append(path)
+    return paths
+
+
+def test_age_cutoff_removes_only_expired_files(tmp_path):
+    paths = _make_files(tmp_path, [500, 400, 300, 20, 10])
+    report = enforce_retention(str(tmp_path), RetentionPolicy(max_age_s=100))
+    assert report["removed_files"] == 3 and report["removed_bytes"] == 30
+    assert report["files"] == 2 and report["bytes"] == 20
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(p) for p in paths[3:]]
+
+
+def test_count_cutoff_keeps_the_newest_files(tmp_path):
+    paths = _make_files(tmp_path, [50, 40, 30, 20, 10])
+    report = enforce_retention(str(tmp_path), RetentionPolicy(max_files=2))
+    assert report["removed_files"] == 3 and report["files"] == 2
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(p) for p in paths[3:]]
+
+
+def test_undeletable_file_still_counts_against_the_limit(tmp_path, monkeypatch):
+    paths = _make_files(tmp_path, [50, 40, 30, 20, 10])
+    remove = os.remove
+
+    def failing_remove(path):
+        if path == paths[0]:
+            raise PermissionError("read-only")
+        remove(path)
+
+    monkeypatch.setattr(storage_management.os, "remove", failing_remove)
+    report = enforce_retention(str(tmp_path), RetentionPolicy(max_files=2))
+    assert report["removed_files"] == 3
+    assert report["files"] == len(os.listdir(tmp_path)) == 2
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(paths[0]), os.path.basename(paths[4])]
+    assert report["oldest_age_s"] >= 50
@@ -0,0 +1,47 @@
+# Test for the image metrics against the full-resolution numbers
+import os
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from api.config.settings import METRICS_MAX_SIDE
+from api.quality.metrics import compute_image_metrics
+from api.quality.ocr_quality import preprocess_image, assess_binarization_quality
+
+SAMPLE_IMAGE = os.path.join(os.path.dirname(__file__), "..", "test_api", "sample_image.jpg")
+
+# Largest difference (percentage points) from assess_binarization_quality
+# accepted for the black ratios that go into scoring
+RATIO_TOLERANCE = 1.0
+
+
+@pytest.fixture(scope="module")
+def sample():
+    image = cv2.imread(SAMPLE_IMAGE)
+    # The sample as delivered and at a typical phone-photo crop size
+    return [image, cv2.resize(image, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)]
+
+
+def test_pyramid_ratios_within_tolerance(sample):
+    for image in sample:
+        _, binary_img = preprocess_image(image, save=False)
+        full = assess_binarization_quality(binary_img)
+        fast = compute_image_metrics(image, max_side=METRICS_MAX_SIDE)
+        pyramid = (fast["global_black_ratio"], fast["large_black_ratio"])
+        assert pyramid == pytest.approx(full, abs=RATIO_TOLERANCE), f"level {fast['level_shape']}"
+
+
+def test_full_engine_scores_with_full_resolution_ratios(sample, monkeypatch):
+    from api.quality import pipeline
+
+    monkeypatch.setattr(pipeline, "METRICS_ENGINE", "full")
+    for image in sample:
+        _, binary_img = preprocess_image(image, save=False)
+        assert pipeline._binarize(image)[2] == assess_binarization_quality(binary_img)
+
+
+def test_sharpness_is_measured_at_crop_resolution(sample):
+    for image in sample:
+        full = compute_image_metrics(image, max_side=None)["sharpness"]
+        assert compute_image_metrics(image, max_side=256)["sharpness"] == pytest.approx(full)